@@ -1,7 +1,10 @@
 from django.contrib import admin
 from .models import Fundacion, Mascota, Adopcion
 from django.contrib.auth.admin import UserAdmin
-from .models import Usuario, Fundacion, Mascota, Adopcion
+from django.core.paginator import Paginator
+from django.db import DatabaseError, connections, router
+from django.utils.functional import cached_property
+from .models import Usuario, Fundacion, Mascota, Adopcion, AdopcionArchivada
 
 
 
@@ -24,15 +27,105 @@ class CustomUserAdmin(UserAdmin):
     search_fields = ('username', 'email')
     ordering = ('username',)
 
+class PaginadorEstimado(Paginator):
+    """Paginador que no hace COUNT(*) de la tabla completa.
+
+    Sin filtros usa una estimación barata (estadísticas de PostgreSQL o las
+    de ANALYZE en SQLite) cuando la tabla supera ``UMBRAL``; con filtros, o
+    sin estadísticas, cuenta de verdad. Si la estimación se pasa y la página
+    pedida sale vacía, cuenta y devuelve la última página real.
+    """
+
+    UMBRAL = 10000
+
+    @cached_property
+    def count(self):
+        consulta = self.object_list.query
+        if not consulta.where:
+            estimado = self._estimar(self.object_list.model)
+            if estimado is not None and estimado > self.UMBRAL:
+                self._estimado = True
+                return estimado
+        return super().count
+
+    def page(self, number):
+        pagina = super().page(number)
+        if getattr(self, '_estimado', False) and pagina.number > 1 and not pagina.object_list:
+            # Filas borradas o archivadas desde las últimas estadísticas
+            self._estimado = False
+            self.__dict__['count'] = super().count
+            self.__dict__.pop('num_pages', None)
+            pagina = super().page(min(pagina.number, self.num_pages))
+        return pagina
+
+    @staticmethod
+    def _estimar(modelo):
+        tabla = modelo._meta.db_table
+        with connections[router.db_for_read(modelo)].cursor() as cursor:
+            if cursor.db.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass', [tabla])
+                fila = cursor.fetchone()
+                return fila[0] if fila and fila[0] and fila[0] > 0 else None
+            if cursor.db.vendor != 'sqlite':
+                return None
+            # sqlite_stat1 la crea ANALYZE (``archivar_adopciones`` la
+            # refresca); la primera cifra de ``stat`` son las filas de cada
+            # índice. MAX(pk) no sirve: tras archivar o borrar se pasa mucho
+            try:
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s', [tabla])
+            except DatabaseError:
+                return None
+            filas = [int(stat.split()[0]) for stat, in cursor.fetchall() if stat]
+        return max(filas) if filas and max(filas) > 0 else None
+
+
+class AdminTablaGrande(admin.ModelAdmin):
+    """Opciones comunes para listados con muchas filas."""
+
+    paginator = PaginadorEstimado
+    show_full_result_count = False
+    list_per_page = 50
+
+
 @admin.register(Fundacion)
-class FundacionAdmin(admin.ModelAdmin):
-    list_display = ('nombre', 'telefono', 'email', 'capacidad')
+class FundacionAdmin(AdminTablaGrande):
+    list_display = ('nombre', 'telefono', 'email', 'capacidad', 'total_mascotas', 'mascotas_disponibles')
+    readonly_fields = ('total_mascotas', 'mascotas_disponibles', 'mascotas_adoptadas')
+    search_fields = ('nombre',)
+
 
 @admin.register(Mascota)
-class MascotaAdmin(admin.ModelAdmin):
+class MascotaAdmin(AdminTablaGrande):
     list_display = ('nombre', 'especie', 'fundacion', 'disponible')
+    list_select_related = ('fundacion',)
+    # Columnas cubiertas por mascota_fundacion_disp_idx y mascota_especie_disp_idx
+    list_filter = ('disponible', 'especie', 'fundacion')
+    search_fields = ('nombre',)
+    autocomplete_fields = ('fundacion',)
+
 
 @admin.register(Adopcion)
-class AdopcionAdmin(admin.ModelAdmin):
-    list_display = ('mascota', 'usuario', 'fundacion', 'fecha_adopcion')
+class AdopcionAdmin(AdminTablaGrande):
+    list_display = ('mascota', 'usuario', 'fundacion', 'fecha_adopcion', 'activa')
+    list_select_related = ('mascota', 'usuario', 'fundacion')
+    # Columnas cubiertas por adopcion_fecha_idx y adopcion_fundacion_fecha_idx
+    date_hierarchy = 'fecha_adopcion'
+    list_filter = ('activa', 'fundacion')
+    ordering = ('-fecha_adopcion', '-id')
+    autocomplete_fields = ('mascota', 'usuario', 'fundacion')
+
+
+@admin.register(AdopcionArchivada)
+class AdopcionArchivadaAdmin(AdminTablaGrande):
+    # Solo consulta: el archivo lo escribe `archivar_adopciones`
+    list_display = ('id', 'mascota', 'usuario', 'fundacion', 'fecha_adopcion', 'activa', 'archivada')
+    list_select_related = ('mascota', 'usuario', 'fundacion')
+    date_hierarchy = 'fecha_adopcion'
+    list_filter = ('activa', 'fundacion')
+    ordering = ('-fecha_adopcion', '-id')
+
+    def has_add_permission(self, request):
+        return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
@@ -0,0 +1,100 @@
+import gzip
+import hashlib
+import os
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+try:
+    import brotli
+except ImportError:  # opcional: sin él solo se generan los .gz
+    brotli = None
+
+# Formatos que ya vienen comprimidos: recomprimirlos no ahorra nada
+SIN_COMPRIMIR = ('.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.woff', '.woff2', '.zip', '.gz', '.br')
+# Por debajo de este tamaño la cabecera Content-Encoding cuesta más de lo que ahorra
+TAMANO_MINIMO_COMPRESION = 256
+
+
+def hash_contenido(contenido):
+    """SHA-256 hexadecimal de un archivo de Django, leído por trozos."""
+    digest = hashlib.sha256()
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    for trozo in contenido.chunks():
+        digest.update(trozo)
+    if hasattr(contenido, 'seek'):
+        contenido.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class AlmacenamientoDeduplicado(FileSystemStorage):
+    """Guarda cada archivo con el hash de su contenido como nombre.
+
+    Subir dos veces la misma imagen (``husky.jpg`` y ``husky_zS2mrpP.jpg``)
+    reutiliza el archivo existente en lugar de crear una copia.
+    """
+
+    LONGITUD_HASH = 32
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        directorio, original = os.path.split(name)
+        extension = os.path.splitext(original)[1].lower()
+        digest = hash_contenido(content)[:self.LONGITUD_HASH]
+        nombre = os.path.join(directorio, f'{digest}{extension}')
+        if self.exists(nombre):
+            return nombre
+        return super().save(nombre, content, max_length=max_length)
+
+
+class AlmacenamientoEstatico(ManifestStaticFilesStorage):
+    """Estáticos con hash de contenido en el nombre y copias precomprimidas.
+
+    ``collectstatic`` escribe ``base.3f2a9c1e7b4d.css`` junto a
+    ``base.3f2a9c1e7b4d.css.gz`` (y ``.br`` si está instalado ``brotli``),
+    que ``core.estaticos.EstaticosMiddleware`` sirve con cache inmutable.
+    """
+
+    def stored_name(self, name):
+        # Sin collectstatic (desarrollo, pruebas) no hay manifiesto: se
+        # enlazan los nombres originales en lugar de fallar
+        if not self.hashed_files:
+            return name
+        return super().stored_name(name)
+
+    def post_process(self, paths, dry_run=False, **options):
+        generados = {}
+        for nombre, nombre_hash, procesado in super().post_process(paths, dry_run, **options):
+            if nombre_hash and not isinstance(procesado, Exception):
+                generados[nombre] = nombre_hash
+            yield nombre, nombre_hash, procesado
+        if dry_run:
+            return
+        for nombre, nombre_hash in generados.items():
+            for ruta in {nombre, nombre_hash}:
+                self.comprimir(ruta)
+
+    def comprimir(self, nombre):
+        """Escribe ``nombre.gz`` y ``nombre.br`` si reducen el archivo."""
+        if nombre.lower().endswith(SIN_COMPRIMIR):
+            return []
+        ruta = self.path(nombre)
+        with open(ruta, 'rb') as origen:
+            datos = origen.read()
+        if len(datos) < TAMANO_MINIMO_COMPRESION:
+            return []
+        compresores = {'.gz': lambda d: gzip.compress(d, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            compresores['.br'] = lambda d: brotli.compress(d, quality=11)
+        escritos = []
+        for extension, comprimir in compresores.items():
+            comprimido = comprimir(datos)
+            if len(comprimido) < len(datos) * 0.95:
+                with open(ruta + extension, 'wb') as destino:
+                    destino.write(comprimido)
+                escritos.append(nombre + extension)
+        return escritos
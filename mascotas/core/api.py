@@ -0,0 +1,142 @@
+import hashlib
+from datetime import datetime, timezone
+from functools import wraps
+
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, set_response_etag
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET
+from django.views.decorators.vary import vary_on_cookie
+
+from . import fragmentos, historial
+from .forms import FiltroMascotasForm
+from .models import Fundacion, Mascota
+from .paginacion import paginar_por_cursor
+
+# API de solo lectura en JSON. Con una cache compartida entre workers
+# (fragmentos.compartida) cada respuesta lleva ETag y Last-Modified
+# derivados del sello de versión de core.fragmentos, que cambia con cada
+# modificación de la fundación, sus mascotas o sus adopciones: un cliente
+# que repite la petición con If-None-Match recibe un 304 sin tocar la base.
+# Con la cache por proceso (locmem, la de por defecto) los sellos de un
+# worker no ven las invalidaciones de otro, así que el ETag se calcula del
+# contenido: el 304 ahorra la transferencia, no las consultas.
+
+RESULTADOS_POR_PAGINA = 50
+
+CAMPOS_FUNDACION = (
+    'id', 'nombre', 'direccion', 'telefono', 'email', 'descripcion',
+    'capacidad', 'total_mascotas', 'mascotas_disponibles',
+)
+CAMPOS_MASCOTA = ('id', 'nombre', 'especie', 'edad', 'disponible', 'fundacion_id', 'foto')
+CAMPOS_ADOPCION = (
+    'id', 'fecha_adopcion', 'activa',
+    'mascota_id', 'mascota__nombre', 'mascota__especie',
+    'fundacion_id', 'fundacion__nombre',
+)
+
+
+def _ambito_mascotas(request):
+    fundacion = request.GET.get('fundacion', '')
+    return fragmentos.ambito_fundacion(fundacion) if fundacion.isdigit() else fragmentos.GLOBAL
+
+
+def _etag(ambito, request):
+    # La consulta forma parte de la representación (filtros, cursor)
+    consulta = hashlib.md5(request.GET.urlencode().encode(), usedforsecurity=False).hexdigest()[:8]
+    return f'{fragmentos.version(ambito)}-{consulta}'
+
+
+def _con_sello(ambito_de):
+    """ETag/Last-Modified desde el sello del ámbito; responde 304 si no cambió.
+
+    Sin cache compartida el ETag sale del contenido de la respuesta.
+    """
+    def etag(request, *args, **kwargs):
+        return _etag(ambito_de(request), request)
+
+    def ultima_modificacion(request, *args, **kwargs):
+        return _ultima_modificacion(ambito_de(request))
+
+    sello = condition(etag_func=etag, last_modified_func=ultima_modificacion)
+
+    def decorador(vista):
+        con_sello = sello(vista)
+
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if fragmentos.compartida():
+                return con_sello(request, *args, **kwargs)
+            return _con_etag_de_contenido(request, vista(request, *args, **kwargs))
+        return envoltura
+    return decorador
+
+
+def _con_etag_de_contenido(request, respuesta):
+    if respuesta.status_code != 200:
+        return respuesta
+    set_response_etag(respuesta)
+    return get_conditional_response(request, etag=respuesta['ETag'], response=respuesta)
+
+
+def _ultima_modificacion(ambito):
+    return datetime.fromtimestamp(int(fragmentos.modificado(ambito)), tz=timezone.utc)
+
+
+def _pagina(request, queryset, orden):
+    pagina = paginar_por_cursor(
+        queryset, cursor=request.GET.get('cursor'), orden=orden, tamano=RESULTADOS_POR_PAGINA,
+    )
+    return {'resultados': list(pagina), 'siguiente': pagina.siguiente}
+
+
+@require_GET
+@cache_control(max_age=0, must_revalidate=True)
+@_con_sello(lambda request: fragmentos.GLOBAL)
+def fundaciones(request):
+    """Fundaciones con sus contadores de mascotas."""
+    return JsonResponse(_pagina(request, Fundacion.objects.activas().values(*CAMPOS_FUNDACION), ('id',)))
+
+
+@require_GET
+@cache_control(max_age=0, must_revalidate=True)
+@_con_sello(_ambito_mascotas)
+def mascotas(request):
+    """Mascotas filtradas por ``fundacion``, ``especie``, ``edad_min``, ``edad_max`` y ``disponible``."""
+    queryset = FiltroMascotasForm(request.GET).filtrar(Mascota.objects.activas())
+    fundacion = request.GET.get('fundacion', '')
+    if fundacion.isdigit():
+        queryset = queryset.filter(fundacion_id=fundacion)
+    datos = _pagina(request, queryset.values(*CAMPOS_MASCOTA), ('id',))
+    almacenamiento = Mascota._meta.get_field('foto').storage
+    for mascota in datos['resultados']:
+        mascota['foto'] = almacenamiento.url(mascota['foto']) if mascota['foto'] else None
+    return JsonResponse(datos)
+
+
+def _ambito_usuario(request):
+    return fragmentos.ambito_usuario(request.user.pk)
+
+
+def _solo_autenticados(vista):
+    # Un cliente de API espera un 401, no una redirección al formulario de login
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Autenticación requerida'}, status=401)
+        return vista(request, *args, **kwargs)
+    return envoltura
+
+
+@require_GET
+@_solo_autenticados
+@vary_on_cookie
+@cache_control(private=True, max_age=0, must_revalidate=True)
+@_con_sello(_ambito_usuario)
+def mis_adopciones(request):
+    """Adopciones del usuario autenticado, de la más reciente a la más antigua."""
+    # Incluye las archivadas (core.historial)
+    pagina = historial.paginar(
+        request.user, cursor=request.GET.get('cursor'), tamano=RESULTADOS_POR_PAGINA, campos=CAMPOS_ADOPCION,
+    )
+    return JsonResponse({'resultados': list(pagina), 'siguiente': pagina.siguiente})
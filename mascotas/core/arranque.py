@@ -0,0 +1,55 @@
+import os
+import time
+from importlib import import_module
+
+from django.apps import apps
+from django.conf import settings
+from django.template import TemplateSyntaxError
+from django.template.loader import get_template
+
+# Extensiones que se tratan como plantillas al precargar
+EXTENSIONES_PLANTILLA = ('.html', '.txt', '.xml')
+
+
+def plantillas_de(etiquetas_apps):
+    """Nombres de las plantillas en ``<app>/templates`` de cada app indicada."""
+    nombres = []
+    for etiqueta in etiquetas_apps:
+        raiz = os.path.join(apps.get_app_config(etiqueta).path, 'templates')
+        for directorio, _, archivos in os.walk(raiz):
+            for archivo in archivos:
+                if archivo.endswith(EXTENSIONES_PLANTILLA):
+                    ruta = os.path.join(directorio, archivo)
+                    nombres.append(os.path.relpath(ruta, raiz).replace(os.sep, '/'))
+    return sorted(nombres)
+
+
+def precargar_plantillas(etiquetas_apps=('core',)):
+    """Compila las plantillas para que queden en la cache del cached.Loader.
+
+    Devuelve ``(tiempos, errores)``: milisegundos por plantilla y los
+    errores de sintaxis encontrados, por nombre.
+    """
+    tiempos, errores = {}, {}
+    for nombre in plantillas_de(etiquetas_apps):
+        inicio = time.perf_counter()
+        try:
+            get_template(nombre)
+        except TemplateSyntaxError as error:
+            errores[nombre] = str(error)
+            continue
+        tiempos[nombre] = round((time.perf_counter() - inicio) * 1000, 3)
+    return tiempos, errores
+
+
+def preparar_worker():
+    """Trabajo previo a la primera petición (lo llaman wsgi.py y asgi.py).
+
+    Con ``PRECARGAR_PLANTILLAS`` importa las URLs (y con ellas las vistas) y
+    compila las plantillas de core, así la primera petición de un worker
+    recién arrancado no paga ese coste. Con ``gunicorn --preload`` se hace
+    una sola vez en el proceso maestro y los workers lo heredan.
+    """
+    if getattr(settings, 'PRECARGAR_PLANTILLAS', False):
+        import_module(settings.ROOT_URLCONF)
+        precargar_plantillas()
@@ -1,18 +1,127 @@
 # core/backends.py
+import ipaddress
+
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.core.exceptions import PermissionDenied
+from . import limites
 from .models import Usuario
 
+
+def clave_usuario(user_id):
+    return f'usuario:datos:{user_id}'
+
+
+def _timeout():
+    return getattr(settings, 'USUARIO_CACHE_TIMEOUT', 60)
+
+
+def _campos_cacheados():
+    # Todo menos el hash de la contraseña, que no sale de la base de datos
+    return [campo.attname for campo in Usuario._meta.concrete_fields if campo.name != 'password']
+
+
+def _a_cache(user):
+    return {
+        'campos': [getattr(user, campo) for campo in _campos_cacheados()],
+        # Lo que compara django.contrib.auth con la sesión en cada petición
+        'hash_sesion': user.get_session_auth_hash(),
+    }
+
+
+def _desde_cache(datos):
+    # ``password`` queda diferido: si algo lo necesita se lee de la base, y
+    # save() sin update_fields no lo sobrescribe
+    user = Usuario.from_db('default', _campos_cacheados(), datos['campos'])
+    user._hash_sesion = datos['hash_sesion']
+    return user
+
+
+def invalidar_usuario(user_id):
+    cache.delete(clave_usuario(user_id))
+
+
+def ip_cliente(request):
+    """IP del cliente, atravesando solo los ``IP_CLIENTE_PROXIES`` de confianza."""
+    if request is None:
+        return None
+    remota = request.META.get('REMOTE_ADDR')
+    proxies = getattr(settings, 'IP_CLIENTE_PROXIES', 0)
+    if not proxies:
+        return remota
+    cabecera = request.META.get(getattr(settings, 'IP_CLIENTE_CABECERA', 'HTTP_X_FORWARDED_FOR'), '')
+    saltos = [salto.strip() for salto in cabecera.split(',') if salto.strip()]
+    if len(saltos) < proxies:
+        # Petición que no pasó por todos los proxies: no se fía de la cabecera
+        return remota
+    try:
+        return str(ipaddress.ip_address(saltos[-proxies]))
+    except ValueError:
+        return remota
+
+
 class EmailBackend(ModelBackend):
     def authenticate(self, request, email=None, password=None, **kwargs):
+        # Logins por username (p. ej. el admin) los resuelve ModelBackend
+        if email is None or password is None:
+            return None
+
+        if not limites.permitir_login(ip_cliente(request), email):
+            self._rechazar(request, 'login_limitado')
+
+        if not limites.limite_hashes.adquirir():
+            # Sobrecarga del proceso, no un abuso de este cliente
+            self._rechazar(request, 'login_sobrecargado')
         try:
-            user = Usuario.objects.get(email=email)
-            if user.check_password(password):
+            try:
+                user = Usuario.objects.get(email=email)
+            except Usuario.DoesNotExist:
+                # Mismo coste que un email existente: no revela qué cuentas existen
+                Usuario().set_password(password)
+                user = None
+            if user is not None and user.check_password(password):
                 return user
-        except Usuario.DoesNotExist:
-            return None
+        finally:
+            limites.limite_hashes.liberar()
+
+        # Este backend es el responsable de los logins por email: cortar la
+        # cadena evita que otro backend vuelva a calcular el hash
+        raise PermissionDenied
+
+    def _rechazar(self, request, motivo):
+        if request is not None:
+            setattr(request, motivo, True)
+        raise PermissionDenied
 
     def get_user(self, user_id):
-        try:
-            return Usuario.objects.get(pk=user_id)
-        except Usuario.DoesNotExist:
-            return None
+        # Se llama en cada petición autenticada: se cachea (sin el hash de la
+        # contraseña) y se invalida al guardar el usuario (ver core.signals).
+        # La invalidación solo llega a todos los workers con una cache
+        # compartida; con la de por proceso, desactivar un usuario o cambiar
+        # su contraseña tarda hasta USUARIO_CACHE_TIMEOUT en verse en los demás
+        clave = clave_usuario(user_id)
+        datos = cache.get(clave)
+        if datos is None:
+            try:
+                user = Usuario.objects.get(pk=user_id)
+            except Usuario.DoesNotExist:
+                return None
+            datos = _a_cache(user)
+            cache.set(clave, datos, _timeout())
+        user = _desde_cache(datos)
+        return user if self.user_can_authenticate(user) else None
+
+    async def aget_user(self, user_id):
+        # Versión para las vistas asíncronas (request.auser()), misma cache
+        clave = clave_usuario(user_id)
+        datos = await cache.aget(clave)
+        if datos is None:
+            try:
+                user = await Usuario.objects.aget(pk=user_id)
+            except Usuario.DoesNotExist:
+                return None
+            datos = _a_cache(user)
+            await cache.aset(clave, datos, _timeout())
+        user = _desde_cache(datos)
+        return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,64 @@
+import contextvars
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import connections
+
+LECTURA = 'lectura'
+
+_solo_lectura = contextvars.ContextVar('solo_lectura', default=False)
+
+
+def solo_lectura(vista):
+    """Marca una vista cuyas lecturas pueden ir a la conexión ``lectura``.
+
+    Las escrituras siguen yendo a ``default``; las lecturas hechas dentro de
+    una transacción también, para que vean lo que la propia transacción
+    acaba de escribir.
+    """
+    if iscoroutinefunction(vista):
+        @wraps(vista)
+        async def envoltura_async(*args, **kwargs):
+            token = _solo_lectura.set(True)
+            try:
+                return await vista(*args, **kwargs)
+            finally:
+                _solo_lectura.reset(token)
+        return envoltura_async
+
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        token = _solo_lectura.set(True)
+        try:
+            return vista(*args, **kwargs)
+        finally:
+            _solo_lectura.reset(token)
+    return envoltura
+
+
+class RouterLecturaEscritura:
+    """Envía las lecturas de las vistas ``@solo_lectura`` a ``lectura``."""
+
+    def db_for_read(self, model, **hints):
+        # Siempre explícito: si no, Django reutilizaría el alias de la
+        # instancia relacionada y un objeto leído de ``lectura`` arrastraría
+        # sus consultas fuera de la vista
+        if (
+            _solo_lectura.get()
+            and getattr(settings, 'BD_LECTURA_SEPARADA', False)
+            and LECTURA in settings.DATABASES
+            and not connections['default'].in_atomic_block
+        ):
+            return LECTURA
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Ambos alias son el mismo archivo
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != LECTURA
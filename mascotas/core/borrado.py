@@ -0,0 +1,120 @@
+import logging
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from . import busqueda
+from . import fragmentos
+from . import tareas
+from .models import Fundacion, Mascota, Adopcion, AdopcionArchivada, EstadisticaAdopcion, BorradoFundacion
+
+logger = logging.getLogger(__name__)
+
+# Borrado de fundaciones en segundo plano. Con ``delete()`` directo, el
+# collector de Django carga todas las mascotas y adopciones de la fundación
+# y las borra en una sola transacción, bloqueando SQLite mientras dura.
+# Aquí la fundación se marca como eliminada al instante (deja de mostrarse)
+# y sus dependientes se borran por lotes de ``BORRADO_LOTE`` filas, cada uno
+# en su propia transacción corta. El progreso se guarda en BorradoFundacion,
+# visible desde cualquier worker. Si el proceso muere a mitad, el comando
+# ``borrar_fundaciones`` retoma las fundaciones marcadas.
+
+LOTE = 500
+
+
+def _dependientes(fundacion_id):
+    # Adopciones antes que mascotas: así el collector no encuentra nada en
+    # cascada al borrar cada lote de mascotas
+    return (
+        ('adopciones', Adopcion.objects.filter(fundacion_id=fundacion_id)),
+        ('archivadas', AdopcionArchivada.objects.filter(fundacion_id=fundacion_id)),
+        ('mascotas', Mascota.objects.filter(fundacion_id=fundacion_id)),
+        ('estadisticas', EstadisticaAdopcion.objects.filter(fundacion_id=fundacion_id)),
+    )
+
+
+def marcar(fundacion, programar=True):
+    """Marca la fundación como eliminada y, si ``programar``, encola el borrado.
+
+    El borrado se encola al confirmar la transacción. Quien vaya a llamar
+    a ``borrar`` por su cuenta (el comando) pasa ``programar=False`` para no
+    tener dos borrados compitiendo por la base. Devuelve ``False`` si ya
+    estaba marcada.
+    """
+    with transaction.atomic():
+        marcada = (
+            Fundacion.objects
+            .filter(pk=fundacion.pk, eliminada__isnull=True)
+            .update(eliminada=timezone.now())
+        )
+        if not marcada:
+            return False
+        BorradoFundacion.objects.update_or_create(
+            fundacion_id=fundacion.pk,
+            defaults={'nombre': fundacion.nombre, 'estado': 'pendiente', 'progreso': {}},
+        )
+        # Fuera de la búsqueda y de las páginas cacheadas desde ya
+        busqueda.eliminar_fundacion(fundacion.pk)
+    transaction.on_commit(lambda: fragmentos.invalidar_fundacion(fundacion.pk))
+    if programar:
+        transaction.on_commit(lambda: encolar(fundacion.pk))
+    return True
+
+
+def encolar(fundacion_id):
+    return tareas.encolar(('borrar_fundacion', fundacion_id), _borrar_en_segundo_plano, fundacion_id)
+
+
+def _borrar_en_segundo_plano(fundacion_id):
+    for progreso in borrar(fundacion_id):
+        logger.info('Borrando la fundación %s: %s', fundacion_id, progreso)
+
+
+def _borrar_lote(queryset, tamano):
+    ids = list(queryset.values_list('pk', flat=True)[:tamano])
+    if ids:
+        with transaction.atomic():
+            # Con señales: contadores, índice de búsqueda y cache siguen al día
+            queryset.model.objects.filter(pk__in=ids).delete()
+    return len(ids)
+
+
+def borrar(fundacion_id, tamano=None):
+    """Borra por lotes una fundación marcada y todo lo que depende de ella.
+
+    Genera el progreso (filas borradas por tipo) tras cada lote y lo guarda
+    en BorradoFundacion. Repetirlo es seguro: continúa donde quedó.
+    """
+    fundacion = Fundacion.objects.filter(pk=fundacion_id, eliminada__isnull=False).first()
+    if fundacion is None:
+        return
+    tamano = tamano or getattr(settings, 'BORRADO_LOTE', LOTE)
+    registro, _ = BorradoFundacion.objects.get_or_create(
+        fundacion_id=fundacion_id, defaults={'nombre': fundacion.nombre},
+    )
+    # Si se retoma, se sigue sumando a lo ya contado
+    cuentas = {nombre: registro.progreso.get(nombre, 0) for nombre, _ in _dependientes(fundacion_id)}
+    for nombre, queryset in _dependientes(fundacion_id):
+        while borradas := _borrar_lote(queryset, tamano):
+            cuentas[nombre] += borradas
+            yield _guardar(registro, 'borrando', cuentas)
+
+    with transaction.atomic():
+        Fundacion.objects.filter(pk=fundacion_id, eliminada__isnull=False).delete()
+    yield _guardar(registro, 'terminado', cuentas)
+
+
+def _guardar(registro, estado, cuentas):
+    registro.estado = estado
+    registro.progreso = dict(cuentas)
+    registro.save(update_fields=['estado', 'progreso', 'actualizado'])
+    return {'estado': estado, **cuentas}
+
+
+def progreso(fundacion_id):
+    """Último progreso conocido del borrado, o ``None`` si no hay ninguno."""
+    registro = BorradoFundacion.objects.filter(fundacion_id=fundacion_id).first()
+    if registro is None:
+        return None
+    return {'estado': registro.estado, **registro.progreso}
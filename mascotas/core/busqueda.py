@@ -0,0 +1,190 @@
+import re
+
+from django.db import connection
+from django.urls import reverse
+
+from .models import Fundacion, Mascota
+
+TABLA = 'core_busqueda'
+# La migración 0008 solo crea la tabla en estos motores; en el resto la
+# búsqueda queda desactivada y no se indexa nada
+MOTORES = ('sqlite', 'postgresql')
+RESULTADOS_POR_PAGINA = 20
+
+# Peso relativo de cada columna de texto al ordenar por relevancia
+PESO_TITULO = 10.0
+PESO_CUERPO = 1.0
+
+_PALABRA = re.compile(r'\w+', re.UNICODE)
+
+
+def _es_postgres():
+    return connection.vendor == 'postgresql'
+
+
+def hay_indice():
+    """Si la base configurada tiene índice de búsqueda."""
+    return connection.vendor in MOTORES
+
+
+def indexable(instancia):
+    """Las mascotas adoptadas no aparecen en la búsqueda."""
+    return not isinstance(instancia, Mascota) or instancia.disponible
+
+
+def documento(instancia):
+    """Devuelve (tipo, id, fundacion_id, titulo, cuerpo) de lo que se indexa."""
+    if isinstance(instancia, Mascota):
+        return ('mascota', instancia.pk, instancia.fundacion_id, instancia.nombre, instancia.especie)
+    cuerpo = ' '.join(filter(None, [instancia.descripcion, instancia.direccion]))
+    return ('fundacion', instancia.pk, instancia.pk, instancia.nombre, cuerpo)
+
+
+def rowid(tipo, objeto_id):
+    """Rowid FTS5 derivado de (tipo, id), para borrar sin recorrer la tabla."""
+    return objeto_id * 2 + (1 if tipo == 'mascota' else 0)
+
+
+def eliminar(tipo, objeto_id):
+    eliminar_varios([(tipo, objeto_id)])
+
+
+def eliminar_varios(claves):
+    """Quita del índice las entradas ``(tipo, id)`` indicadas."""
+    if not hay_indice():
+        return
+    with connection.cursor() as cursor:
+        if _es_postgres():
+            cursor.executemany(
+                f'DELETE FROM {TABLA} WHERE tipo = %s AND objeto_id = %s', list(claves)
+            )
+        else:
+            cursor.executemany(
+                f'DELETE FROM {TABLA} WHERE rowid = %s',
+                [[rowid(tipo, objeto_id)] for tipo, objeto_id in claves],
+            )
+
+
+def eliminar_fundacion(fundacion_id, lote=500):
+    """Quita del índice una fundación y todas sus mascotas.
+
+    Borra por clave (rowid o clave primaria) con los ids que da el índice de
+    ``Mascota.fundacion``: ``fundacion_id`` no está indexada en la búsqueda
+    y filtrar por ella recorrería la tabla entera.
+    """
+    if not hay_indice():
+        return
+    claves = [('fundacion', fundacion_id)] + [
+        ('mascota', pk) for pk in Mascota.objects.filter(fundacion_id=fundacion_id).values_list('pk', flat=True)
+    ]
+    for inicio in range(0, len(claves), lote):
+        eliminar_varios(claves[inicio:inicio + lote])
+
+
+def indexar(instancia):
+    """Inserta o reemplaza la entrada de una mascota o fundación (o la quita si no es ``indexable``)."""
+    indexar_varios([instancia])
+
+
+def indexar_varios(instancias):
+    """Inserta o reemplaza varias entradas con dos sentencias por lote.
+
+    Las que ya no son ``indexable`` (mascotas adoptadas) solo se quitan.
+    """
+    if not hay_indice() or not instancias:
+        return
+    eliminar_varios([documento(instancia)[:2] for instancia in instancias])
+    documentos = [documento(instancia) for instancia in instancias if indexable(instancia)]
+    if not documentos:
+        return
+    with connection.cursor() as cursor:
+        if _es_postgres():
+            cursor.executemany(
+                f"INSERT INTO {TABLA} (tipo, objeto_id, fundacion_id, titulo, cuerpo, documento) "
+                f"VALUES (%s, %s, %s, %s, %s, "
+                f"setweight(to_tsvector('spanish', %s), 'A') || setweight(to_tsvector('spanish', %s), 'D'))",
+                [[*doc, doc[3], doc[4]] for doc in documentos],
+            )
+        else:
+            cursor.executemany(
+                f'INSERT INTO {TABLA} (rowid, tipo, objeto_id, fundacion_id, titulo, cuerpo) '
+                f'VALUES (%s, %s, %s, %s, %s, %s)',
+                [[rowid(doc[0], doc[1]), *doc] for doc in documentos],
+            )
+
+
+def reindexar(lote=500):
+    """Reconstruye el índice completo; devuelve el número de documentos."""
+    if not hay_indice():
+        return 0
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {TABLA}')
+    total = 0
+    for queryset in (Fundacion.objects.activas(), Mascota.objects.activas().filter(disponible=True)):
+        pendientes = []
+        for instancia in queryset.iterator(chunk_size=lote):
+            pendientes.append(instancia)
+            if len(pendientes) >= lote:
+                indexar_varios(pendientes)
+                total += len(pendientes)
+                pendientes = []
+        indexar_varios(pendientes)
+        total += len(pendientes)
+    return total
+
+
+def _consulta_fts(texto):
+    """Convierte texto libre en una consulta FTS5 segura (prefijos, AND implícito)."""
+    palabras = _PALABRA.findall(texto)
+    return ' '.join(f'"{palabra}"*' for palabra in palabras)
+
+
+def _consulta_tsquery(texto):
+    return ' & '.join(f'{palabra}:*' for palabra in _PALABRA.findall(texto))
+
+
+def buscar(texto, pagina=1, tamano=RESULTADOS_POR_PAGINA):
+    """Busca fundaciones y mascotas disponibles; devuelve (resultados, hay_mas).
+
+    Los resultados vienen ordenados por relevancia y se leen solo del índice,
+    sin consultar las tablas de mascotas ni fundaciones.
+    """
+    desplazamiento = (max(pagina, 1) - 1) * tamano
+    consulta = _consulta_tsquery(texto) if _es_postgres() else _consulta_fts(texto)
+    if not consulta or not hay_indice():
+        return [], False
+
+    if _es_postgres():
+        sql = (
+            f"SELECT tipo, objeto_id, fundacion_id, titulo, cuerpo, "
+            f"ts_rank(documento, to_tsquery('spanish', %s)) AS rango "
+            f"FROM {TABLA} WHERE documento @@ to_tsquery('spanish', %s) "
+            f"ORDER BY rango DESC LIMIT %s OFFSET %s"
+        )
+        parametros = [consulta, consulta, tamano + 1, desplazamiento]
+    else:
+        # bm25 devuelve valores negativos: cuanto menor, más relevante
+        sql = (
+            f"SELECT tipo, objeto_id, fundacion_id, titulo, cuerpo, "
+            f"-bm25({TABLA}, 0, 0, 0, %s, %s) AS rango "
+            f"FROM {TABLA} WHERE {TABLA} MATCH %s "
+            f"ORDER BY rango DESC LIMIT %s OFFSET %s"
+        )
+        parametros = [PESO_TITULO, PESO_CUERPO, consulta, tamano + 1, desplazamiento]
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, parametros)
+        filas = cursor.fetchall()
+
+    resultados = [
+        {
+            'tipo': tipo,
+            'id': objeto_id,
+            'titulo': titulo,
+            'descripcion': cuerpo,
+            'url': reverse('fundacion_detalle', args=[fundacion_id]),
+            'relevancia': round(float(rango), 4),
+        }
+        for tipo, objeto_id, fundacion_id, titulo, cuerpo, rango in filas[:tamano]
+    ]
+    return resultados, len(filas) > tamano
@@ -0,0 +1,305 @@
+import csv
+import json
+import os
+from itertools import islice
+
+from django.core.files import File
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+
+from . import busqueda
+from . import contadores
+from . import fragmentos
+from . import imagenes
+from .models import Fundacion, Mascota, Adopcion, AdopcionArchivada
+
+CAMPOS_FUNDACION = ['id', 'nombre', 'direccion', 'telefono', 'email', 'descripcion', 'capacidad']
+CAMPOS_MASCOTA = ['id', 'nombre', 'especie', 'edad', 'disponible', 'fundacion', 'foto']
+
+MODELOS = {
+    'fundaciones': (Fundacion, CAMPOS_FUNDACION),
+    'mascotas': (Mascota, CAMPOS_MASCOTA),
+}
+
+
+class ErrorCatalogo(Exception):
+    """Una fila del catálogo no se puede importar."""
+
+
+def formato_de(ruta, formato=None):
+    if formato:
+        return formato
+    return 'jsonl' if os.path.splitext(ruta)[1].lower() in ('.jsonl', '.ndjson') else 'csv'
+
+
+# -------- Lectura y escritura por trozos --------
+
+def leer_filas(archivo, formato):
+    """Genera diccionarios desde un CSV con cabecera o un JSONL, fila a fila."""
+    if formato == 'jsonl':
+        for numero, linea in enumerate(archivo, start=1):
+            if linea.strip():
+                try:
+                    yield json.loads(linea)
+                except ValueError as error:
+                    raise ErrorCatalogo(f'Línea {numero}: JSON inválido ({error})')
+    else:
+        yield from csv.DictReader(archivo)
+
+
+def lotes(iterable, tamano):
+    iterador = iter(iterable)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+
+def escribir_filas(archivo, formato, campos, filas):
+    """Escribe ``filas`` (diccionarios) y devuelve cuántas se escribieron."""
+    total = 0
+    if formato == 'jsonl':
+        for fila in filas:
+            archivo.write(json.dumps(fila, ensure_ascii=False, default=str) + '\n')
+            total += 1
+    else:
+        escritor = csv.DictWriter(archivo, fieldnames=campos)
+        escritor.writeheader()
+        for fila in filas:
+            escritor.writerow(fila)
+            total += 1
+    return total
+
+
+def exportar(modelo, archivo, formato, lote=2000):
+    """Vuelca fundaciones o mascotas sin cargar la tabla entera en memoria."""
+    if modelo == 'fundaciones':
+        campos = CAMPOS_FUNDACION
+        filas = Fundacion.objects.activas().order_by('pk').values(*campos).iterator(chunk_size=lote)
+    else:
+        campos = CAMPOS_MASCOTA
+        filas = (
+            {**fila, 'fundacion': fila.pop('fundacion__nombre')}
+            for fila in Mascota.objects.activas().order_by('pk').values(
+                'id', 'nombre', 'especie', 'edad', 'disponible', 'fundacion__nombre', 'foto',
+            ).iterator(chunk_size=lote)
+        )
+    return escribir_filas(archivo, formato, campos, filas)
+
+
+# -------- Conversión de filas --------
+
+def _entero(valor, campo, defecto=None):
+    if valor in (None, ''):
+        if defecto is None:
+            raise ErrorCatalogo(f'Falta el campo {campo}')
+        return defecto
+    try:
+        return int(valor)
+    except (TypeError, ValueError):
+        raise ErrorCatalogo(f'{campo} debe ser un número: {valor!r}')
+
+
+def _booleano(valor, defecto=True):
+    if valor in (None, ''):
+        return defecto
+    if isinstance(valor, bool):
+        return valor
+    return str(valor).strip().lower() in ('1', 'true', 'si', 'sí', 'yes', 'x')
+
+
+def _texto(fila, campo, obligatorio=True):
+    valor = fila.get(campo)
+    valor = '' if valor is None else str(valor).strip()
+    if obligatorio and not valor:
+        raise ErrorCatalogo(f'Falta el campo {campo}')
+    return valor
+
+
+def _id(fila):
+    return _entero(fila.get('id'), 'id', defecto=0) or None
+
+
+# -------- Importación --------
+
+def _reiniciar_secuencia(modelo):
+    conexion = connections[router.db_for_write(modelo)]
+    sentencias = conexion.ops.sequence_reset_sql(no_style(), [modelo])
+    if sentencias:
+        with conexion.cursor() as cursor:
+            for sentencia in sentencias:
+                cursor.execute(sentencia)
+
+
+class Importador:
+    """Importa un catálogo por lotes con ``bulk_create``/``bulk_update``.
+
+    Cada lote va en su propia transacción, así que un fallo solo deshace ese
+    lote, y borra las fotos que ese lote había copiado al almacenamiento.
+    Las filas con el id de una existente solo cambian las columnas que traen
+    con valor: una celda vacía o una columna ausente deja el dato como está.
+    Las señales no se disparan con las operaciones masivas: al final se
+    recalculan contadores, índice de búsqueda y cache de las fundaciones
+    afectadas, y se encolan las variantes de las fotos nuevas.
+    """
+
+    def __init__(self, modelo, directorio_fotos=None, lote=1000):
+        self.modelo = modelo
+        self.directorio_fotos = directorio_fotos
+        self.lote = lote
+        self.creadas = 0
+        self.actualizadas = 0
+        self.fundaciones_afectadas = set()
+        self.con_foto = []
+        self._fundaciones_por_nombre = None
+        self._fotos_lote = []
+
+    # Fundación por clave natural (nombre)
+    def _fundacion_id(self, nombre):
+        if self._fundaciones_por_nombre is None:
+            self._fundaciones_por_nombre = {}
+            for pk, valor in Fundacion.objects.activas().values_list('pk', 'nombre').iterator():
+                self._fundaciones_por_nombre.setdefault(valor, []).append(pk)
+        ids = self._fundaciones_por_nombre.get(nombre)
+        if not ids:
+            raise ErrorCatalogo(f'No existe la fundación {nombre!r}')
+        if len(ids) > 1:
+            raise ErrorCatalogo(f'Hay varias fundaciones llamadas {nombre!r}')
+        return ids[0]
+
+    def _foto(self, nombre_archivo):
+        if not nombre_archivo or not self.directorio_fotos:
+            return nombre_archivo or None
+        ruta = os.path.join(self.directorio_fotos, os.path.basename(nombre_archivo))
+        if not os.path.exists(ruta):
+            raise ErrorCatalogo(f'No se encuentra la foto {ruta}')
+        campo = Mascota._meta.get_field('foto')
+        with open(ruta, 'rb') as archivo:
+            # Pasa por el almacenamiento deduplicado: fotos repetidas se guardan una vez
+            nombre = campo.storage.save(campo.generate_filename(None, os.path.basename(ruta)), File(archivo))
+        self._fotos_lote.append(nombre)
+        return nombre
+
+    def _borrar_fotos_lote(self):
+        # Solo las que ninguna mascota usa: con la deduplicación, la misma
+        # foto puede ser de un lote anterior o de otra mascota
+        campo = Mascota._meta.get_field('foto')
+        usadas = set(Mascota.objects.filter(foto__in=self._fotos_lote).values_list('foto', flat=True))
+        for nombre in set(self._fotos_lote) - usadas:
+            campo.storage.delete(nombre)
+
+    def _conversiones(self):
+        # Columna -> (atributo del modelo, conversión de la fila)
+        if self.modelo == 'fundaciones':
+            return {
+                'nombre': ('nombre', lambda fila: _texto(fila, 'nombre')),
+                'direccion': ('direccion', lambda fila: _texto(fila, 'direccion')),
+                'telefono': ('telefono', lambda fila: _texto(fila, 'telefono')),
+                'email': ('email', lambda fila: _texto(fila, 'email')),
+                'descripcion': ('descripcion', lambda fila: _texto(fila, 'descripcion', obligatorio=False) or None),
+                'capacidad': ('capacidad', lambda fila: _entero(fila.get('capacidad'), 'capacidad', defecto=0)),
+            }
+        return {
+            'nombre': ('nombre', lambda fila: _texto(fila, 'nombre')),
+            'especie': ('especie', lambda fila: _texto(fila, 'especie')),
+            'edad': ('edad', lambda fila: _entero(fila.get('edad'), 'edad')),
+            'disponible': ('disponible', lambda fila: _booleano(fila.get('disponible'))),
+            'fundacion': ('fundacion_id', lambda fila: self._fundacion_id(_texto(fila, 'fundacion'))),
+            'foto': ('foto', lambda fila: self._foto(_texto(fila, 'foto', obligatorio=False))),
+        }
+
+    def construir(self, fila, existente=False):
+        """Objeto sin guardar para ``fila``; devuelve (objeto, campos que trae).
+
+        Si ``existente``, solo se convierten las columnas con valor.
+        """
+        modelo, _campos = MODELOS[self.modelo]
+        valores, campos = {}, []
+        for columna, (atributo, convertir) in self._conversiones().items():
+            if existente and fila.get(columna) in (None, ''):
+                continue
+            valores[atributo] = convertir(fila)
+            campos.append(columna)
+        return modelo(pk=_id(fila), **valores), campos
+
+    def _existentes(self, modelo, ids):
+        """``{id: fundacion_id}`` de las filas ya guardadas entre ``ids``."""
+        if not ids:
+            return {}
+        campo = 'fundacion_id' if modelo is Mascota else 'pk'
+        existentes = dict(modelo.objects.filter(pk__in=ids).values_list('pk', campo))
+        activas = set(modelo.objects.activas().filter(pk__in=ids).values_list('pk', flat=True))
+        if eliminadas := sorted(set(existentes) - activas):
+            # Su fundación está marcada para borrar: ni se actualizan ni vuelven al índice
+            raise ErrorCatalogo(f'Los ids {eliminadas} son de fundaciones eliminadas')
+        return existentes
+
+    def _con_adopcion_activa(self, ids):
+        return set().union(*(
+            modelo.objects.filter(mascota_id__in=ids, activa=True).values_list('mascota_id', flat=True)
+            for modelo in (Adopcion, AdopcionArchivada)
+        ))
+
+    def importar_lote(self, filas):
+        self._fotos_lote = []
+        try:
+            self._importar_lote(filas)
+        except Exception:
+            self._borrar_fotos_lote()
+            raise
+
+    def _importar_lote(self, filas):
+        modelo, _campos = MODELOS[self.modelo]
+        existentes = self._existentes(modelo, [pk for pk in map(_id, filas) if pk])
+        construidos = [self.construir(fila, existente=_id(fila) in existentes) for fila in filas]
+        objetos = [obj for obj, _campos in construidos]
+
+        con_id = [obj for obj in objetos if obj.pk and obj.pk not in existentes]
+        sin_id = [obj for obj in objetos if not obj.pk]
+        actualizar = [(obj, campos) for obj, campos in construidos if obj.pk in existentes]
+        if self.modelo == 'mascotas' and actualizar:
+            # Una mascota adoptada no vuelve al catálogo por reimportarla
+            adoptadas = self._con_adopcion_activa([obj.pk for obj, _campos in actualizar])
+            actualizar = [
+                (obj, [c for c in campos if not (c == 'disponible' and obj.disponible and obj.pk in adoptadas)])
+                for obj, campos in actualizar
+            ]
+
+        # bulk_update escribe los mismos campos en todas: se agrupan por columnas
+        grupos = {}
+        for obj, campos in actualizar:
+            if campos:
+                grupos.setdefault(tuple(campos), []).append(obj)
+        actualizadas = [obj.pk for obj, _campos in actualizar]
+
+        with transaction.atomic():
+            creados = modelo.objects.bulk_create(con_id, batch_size=self.lote)
+            if con_id:
+                # Los ids explícitos no avanzan la secuencia de PostgreSQL:
+                # se reinicia (como hace loaddata) antes de insertar el resto
+                _reiniciar_secuencia(modelo)
+            creados += modelo.objects.bulk_create(sin_id, batch_size=self.lote)
+            for campos, grupo in grupos.items():
+                modelo.objects.bulk_update(grupo, campos, batch_size=self.lote)
+            # Las actualizadas se indexan completas, no solo con las columnas del archivo
+            busqueda.indexar_varios(creados + list(modelo.objects.filter(pk__in=actualizadas)))
+
+        self.creadas += len(creados)
+        self.actualizadas += len(actualizar)
+        if self.modelo == 'mascotas':
+            # Las de origen también: una mascota que cambia de fundación
+            # descuadra los contadores de las dos
+            self.fundaciones_afectadas.update(obj.fundacion_id for obj in objetos if obj.fundacion_id)
+            self.fundaciones_afectadas.update(existentes[pk] for pk in actualizadas)
+            self.con_foto.extend(obj.pk for obj in creados if obj.foto)
+            self.con_foto.extend(obj.pk for obj, campos in actualizar if 'foto' in campos and obj.foto)
+        else:
+            self.fundaciones_afectadas.update([obj.pk for obj in creados] + actualizadas)
+            self._fundaciones_por_nombre = None
+
+    def finalizar(self):
+        if not self.fundaciones_afectadas:
+            return
+        afectadas = Fundacion.objects.filter(pk__in=self.fundaciones_afectadas)
+        contadores.recalcular(afectadas)
+        fragmentos.invalidar_fundacion(*self.fundaciones_afectadas)
+        for mascota_id in self.con_foto:
+            imagenes.encolar(mascota_id)
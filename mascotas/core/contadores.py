@@ -0,0 +1,82 @@
+from django.db.models import Count, F, Q
+
+from . import fragmentos
+from .models import Fundacion
+
+# Atributo donde se guarda (fundacion_id, disponible) tal como se cargó la mascota
+ESTADO = '_estado_contadores'
+
+
+def ajustar(fundacion_id, total=0, disponibles=0, adoptadas=0):
+    """Suma los deltas a los contadores de una fundación con un solo UPDATE."""
+    cambios = {}
+    if total:
+        cambios['total_mascotas'] = F('total_mascotas') + total
+    if disponibles:
+        cambios['mascotas_disponibles'] = F('mascotas_disponibles') + disponibles
+    if adoptadas:
+        cambios['mascotas_adoptadas'] = F('mascotas_adoptadas') + adoptadas
+    if cambios:
+        Fundacion.objects.filter(pk=fundacion_id).update(**cambios)
+
+
+def deltas(disponible, signo=1):
+    """Deltas que aporta una mascota a los contadores de su fundación."""
+    if disponible:
+        return {'total': signo, 'disponibles': signo}
+    return {'total': signo, 'adoptadas': signo}
+
+
+def guardar_estado(mascota):
+    """Recuerda el estado de la mascota para calcular deltas al guardarla.
+
+    Lee ``__dict__`` directamente para no disparar consultas cuando los
+    campos están diferidos (``only()``/``defer()``).
+    """
+    datos = mascota.__dict__
+    if 'fundacion_id' in datos and 'disponible' in datos:
+        setattr(mascota, ESTADO, (datos['fundacion_id'], datos['disponible']))
+    else:
+        setattr(mascota, ESTADO, None)
+
+
+def estado_guardado(mascota):
+    return getattr(mascota, ESTADO, None)
+
+
+def recalcular(fundaciones=None, lote=500):
+    """Recalcula los contadores desde cero; devuelve cuántas fundaciones cambiaron.
+
+    Sirve para reparar desviaciones (p. ej. tras un ``update()`` masivo que
+    no dispara señales).
+    """
+    if fundaciones is None:
+        fundaciones = Fundacion.objects.all()
+    fundaciones = fundaciones.annotate(
+        _total=Count('mascota'),
+        _disponibles=Count('mascota', filter=Q(mascota__disponible=True)),
+    ).order_by('pk')
+
+    corregidas = []
+    cambiadas = 0
+    for fundacion in fundaciones.iterator(chunk_size=lote):
+        reales = (fundacion._total, fundacion._disponibles, fundacion._total - fundacion._disponibles)
+        actuales = (fundacion.total_mascotas, fundacion.mascotas_disponibles, fundacion.mascotas_adoptadas)
+        if reales != actuales:
+            fundacion.total_mascotas, fundacion.mascotas_disponibles, fundacion.mascotas_adoptadas = reales
+            corregidas.append(fundacion)
+        if len(corregidas) >= lote:
+            cambiadas += _guardar(corregidas)
+    cambiadas += _guardar(corregidas)
+    return cambiadas
+
+
+def _guardar(fundaciones):
+    Fundacion.objects.bulk_update(
+        fundaciones, ['total_mascotas', 'mascotas_disponibles', 'mascotas_adoptadas']
+    )
+    cantidad = len(fundaciones)
+    if cantidad:
+        fragmentos.invalidar_fundacion(*(f.pk for f in fundaciones))
+    fundaciones.clear()
+    return cantidad
@@ -0,0 +1,178 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Max, Min, Sum
+from django.db.models.functions import TruncWeek
+
+from .historial import MODELOS as MODELOS_ADOPCION
+from .models import EstadisticaAdopcion
+
+# Estadísticas de adopción precalculadas por (fundación, especie, día).
+# Cada adopción nueva suma sus valores a su fila con un UPDATE atómico, así
+# que el panel lee solo estas filas: su coste depende del rango de fechas,
+# no de cuántas adopciones haya. ``recalcular`` las reconstruye desde
+# Adopcion y AdopcionArchivada por tramos de días (carga inicial o reparación).
+
+CAMPOS_SUMA = ('adopciones', 'suma_edades', 'con_fecha_ingreso', 'suma_dias_espera')
+
+
+def aportacion(edad, fecha_ingreso, fecha_adopcion):
+    """Lo que una adopción suma a su fila de estadísticas."""
+    valores = {'adopciones': 1, 'suma_edades': max(edad or 0, 0)}
+    if fecha_ingreso:
+        valores['con_fecha_ingreso'] = 1
+        valores['suma_dias_espera'] = max((fecha_adopcion - fecha_ingreso).days, 0)
+    return valores
+
+
+def sumar(fundacion_id, especie, dia, **valores):
+    """Suma ``valores`` a la fila (fundación, especie, día), creándola si falta."""
+    cambios = {campo: F(campo) + valor for campo, valor in valores.items() if valor}
+    if not cambios:
+        return
+    fila = EstadisticaAdopcion.objects.filter(fundacion_id=fundacion_id, especie=especie, dia=dia)
+    if not fila.update(**cambios):
+        # Primera adopción del día para esta especie: se crea a cero (otra
+        # petición pudo crearla a la vez, de ahí ignore_conflicts) y se suma
+        EstadisticaAdopcion.objects.bulk_create(
+            [EstadisticaAdopcion(fundacion_id=fundacion_id, especie=especie, dia=dia)],
+            ignore_conflicts=True,
+        )
+        fila.update(**cambios)
+
+
+def registrar(adopcion):
+    """Suma una adopción recién creada; la mascota suele venir ya cargada."""
+    mascota = adopcion.mascota
+    sumar(
+        adopcion.fundacion_id, mascota.especie, adopcion.fecha_adopcion,
+        **aportacion(mascota.edad, mascota.fecha_ingreso, adopcion.fecha_adopcion),
+    )
+
+
+def rango_adopciones():
+    """(primera, última) fecha de adopción, o (None, None) si no hay ninguna."""
+    primeras, ultimas = [], []
+    for modelo in MODELOS_ADOPCION:
+        limites = modelo.objects.aggregate(primera=Min('fecha_adopcion'), ultima=Max('fecha_adopcion'))
+        if limites['primera'] is not None:
+            primeras.append(limites['primera'])
+            ultimas.append(limites['ultima'])
+    return (min(primeras), max(ultimas)) if primeras else (None, None)
+
+
+def _agregar_tramo(inicio, fin):
+    """Filas (fundación, especie, día) del tramo calculadas desde las adopciones."""
+    filas = defaultdict(lambda: dict.fromkeys(CAMPOS_SUMA, 0))
+    total = 0
+    for modelo in MODELOS_ADOPCION:
+        adopciones = (
+            modelo.objects
+            .filter(fecha_adopcion__range=(inicio, fin))
+            .values_list('fundacion_id', 'mascota__especie', 'fecha_adopcion',
+                         'mascota__edad', 'mascota__fecha_ingreso')
+        )
+        for fundacion_id, especie, dia, edad, fecha_ingreso in adopciones.iterator(chunk_size=2000):
+            for campo, valor in aportacion(edad, fecha_ingreso, dia).items():
+                filas[fundacion_id, especie, dia][campo] += valor
+            total += 1
+    return filas, total
+
+
+def _reemplazar_tramo(inicio, fin):
+    # Lectura y reemplazo en la misma transacción, con las filas del tramo
+    # bloqueadas: una adopción concurrente espera en su UPDATE de ``sumar``
+    # y se suma después a la fila nueva, en lugar de perderse al borrarla.
+    # En SQLite la transacción IMMEDIATE ya bloquea las escrituras.
+    with transaction.atomic():
+        list(
+            EstadisticaAdopcion.objects.select_for_update()
+            .filter(dia__range=(inicio, fin)).values_list('pk', flat=True)
+        )
+        filas, total = _agregar_tramo(inicio, fin)
+        EstadisticaAdopcion.objects.filter(dia__range=(inicio, fin)).delete()
+        EstadisticaAdopcion.objects.bulk_create(
+            (
+                EstadisticaAdopcion(fundacion_id=fundacion_id, especie=especie, dia=dia, **valores)
+                for (fundacion_id, especie, dia), valores in filas.items()
+            ),
+            batch_size=1000,
+        )
+    return total
+
+
+def recalcular(desde, hasta, dias_por_lote=31, reintentos=3):
+    """Reconstruye las filas de ``desde`` a ``hasta`` por tramos de días.
+
+    Cada tramo se recalcula desde las adopciones (también las archivadas) y
+    reemplaza sus filas en una transacción, así que repetirlo da el mismo
+    resultado y un fallo a mitad deja los tramos anteriores ya corregidos.
+    Si una adopción crea a la vez la primera fila de un día del tramo, el
+    tramo se repite. Genera ``(inicio, fin, adopciones)`` por tramo para
+    informar del progreso.
+    """
+    inicio = desde
+    while inicio <= hasta:
+        fin = min(inicio + timedelta(days=dias_por_lote - 1), hasta)
+        for intento in range(reintentos):
+            try:
+                total = _reemplazar_tramo(inicio, fin)
+                break
+            except IntegrityError:
+                if intento == reintentos - 1:
+                    raise
+        yield inicio, fin, total
+        inicio = fin + timedelta(days=1)
+
+
+def _con_medias(fila):
+    adopciones = fila['adopciones']
+    con_fecha = fila['con_fecha_ingreso']
+    return {
+        **fila,
+        'edad_media': round(fila['suma_edades'] / adopciones, 1) if adopciones else None,
+        'dias_espera_medios': round(fila['suma_dias_espera'] / con_fecha, 1) if con_fecha else None,
+    }
+
+
+def resumen(desde, hasta, fundacion=None, agrupar='dia'):
+    """Totales, serie temporal y desglose por especie y fundación del rango.
+
+    Solo lee EstadisticaAdopcion: tres consultas agregadas sobre, como
+    mucho, fundaciones × especies × días del rango.
+    """
+    filas = EstadisticaAdopcion.objects.filter(dia__range=(desde, hasta))
+    if fundacion is not None:
+        filas = filas.filter(fundacion=fundacion)
+    sumas = {campo: Sum(campo) for campo in CAMPOS_SUMA}
+
+    periodo = TruncWeek('dia') if agrupar == 'semana' else F('dia')
+    serie = [
+        _con_medias(fila)
+        for fila in filas.annotate(periodo=periodo).values('periodo').annotate(**sumas).order_by('periodo')
+    ]
+    por_especie = [
+        _con_medias(fila)
+        for fila in filas.values('especie').annotate(**sumas).order_by('-adopciones', 'especie')
+    ]
+    por_fundacion = [
+        _con_medias(fila)
+        for fila in (
+            filas.values('fundacion_id', 'fundacion__nombre').annotate(**sumas)
+            .order_by('-adopciones', 'fundacion__nombre')
+        )
+    ]
+    totales = dict.fromkeys(CAMPOS_SUMA, 0)
+    for fila in serie:
+        for campo in CAMPOS_SUMA:
+            totales[campo] += fila[campo]
+    return {
+        'desde': desde,
+        'hasta': hasta,
+        'agrupar': agrupar,
+        'totales': _con_medias(totales),
+        'serie': serie,
+        'por_especie': por_especie,
+        'por_fundacion': por_fundacion,
+    }
@@ -0,0 +1,123 @@
+import json
+import mimetypes
+import os
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import FileResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+# Nombres con hash: su contenido no cambia nunca, el navegador no revalida
+CACHE_INMUTABLE = 'public, max-age=31536000, immutable'
+# Nombres originales (sin hash): pueden cambiar en el siguiente despliegue
+CACHE_SIN_HASH = 'public, max-age=60'
+# Variantes precomprimidas en orden de preferencia
+CODIFICACIONES = (('br', '.br'), ('gzip', '.gz'))
+
+
+class Estatico:
+    """Un archivo de STATIC_ROOT con sus cabeceras ya calculadas."""
+
+    def __init__(self, ruta, inmutable):
+        estado = os.stat(ruta)
+        tipo = mimetypes.guess_type(ruta)[0] or 'application/octet-stream'
+        if tipo.startswith('text/') or tipo in ('application/javascript', 'application/json'):
+            tipo += '; charset=utf-8'
+        self.ruta = ruta
+        self.tipo = tipo
+        self.cache = CACHE_INMUTABLE if inmutable else CACHE_SIN_HASH
+        # Débil: la variante comprimida es la misma representación
+        self.etag = f'W/"{int(estado.st_mtime):x}-{estado.st_size:x}"'
+        self.modificado = estado.st_mtime
+        self.variantes = {
+            codificacion: ruta + extension
+            for codificacion, extension in CODIFICACIONES
+            if os.path.isfile(ruta + extension)
+        }
+
+    def elegir(self, aceptadas):
+        for codificacion, ruta in self.variantes.items():
+            if codificacion in aceptadas:
+                return codificacion, ruta
+        return None, self.ruta
+
+
+def indexar(raiz):
+    """Archivos servibles de ``raiz`` por nombre relativo, con las barras de URL."""
+    manifiesto = os.path.join(raiz, 'staticfiles.json')
+    try:
+        with open(manifiesto, encoding='utf-8') as origen:
+            con_hash = set(json.load(origen)['paths'].values())
+    except (OSError, ValueError, KeyError):
+        con_hash = set()
+
+    archivos = {}
+    for directorio, _, nombres in os.walk(raiz):
+        for nombre in nombres:
+            ruta = os.path.join(directorio, nombre)
+            relativo = os.path.relpath(ruta, raiz).replace(os.sep, '/')
+            if relativo == 'staticfiles.json':
+                continue
+            # Las variantes .gz/.br se sirven a través de su original
+            if any(relativo.endswith(ext) and os.path.isfile(ruta[:-len(ext)]) for _, ext in CODIFICACIONES):
+                continue
+            archivos[relativo] = Estatico(ruta, relativo in con_hash)
+    return archivos
+
+
+def _codificaciones_aceptadas(request):
+    aceptadas = set()
+    for parte in request.headers.get('Accept-Encoding', '').split(','):
+        codificacion, _, parametros = parte.strip().partition(';')
+        if parametros.replace(' ', '') not in ('q=0', 'q=0.0'):
+            aceptadas.add(codificacion.strip().lower())
+    return aceptadas
+
+
+class EstaticosMiddleware:
+    """Sirve STATIC_ROOT desde el proceso, sin las rutas ``static()`` de DEBUG.
+
+    El índice de archivos se construye al arrancar, así que tras un
+    ``collectstatic`` hay que reiniciar el servidor. Elige la variante
+    brotli/gzip según ``Accept-Encoding`` y marca como inmutables los
+    nombres con hash del manifiesto. Si no hay STATIC_ROOT (o los
+    estáticos están en otro dominio), Django lo descarta al arrancar.
+    """
+
+    def __init__(self, get_response):
+        raiz = settings.STATIC_ROOT
+        prefijo = urlsplit(settings.STATIC_URL or '')
+        if not raiz or not os.path.isdir(raiz) or prefijo.netloc:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.prefijo = prefijo.path
+        self.archivos = indexar(raiz)
+
+    def __call__(self, request):
+        if request.method in ('GET', 'HEAD') and request.path_info.startswith(self.prefijo):
+            estatico = self.archivos.get(request.path_info[len(self.prefijo):])
+            if estatico is not None:
+                return self.servir(request, estatico)
+        return self.get_response(request)
+
+    def servir(self, request, estatico):
+        respuesta = get_conditional_response(
+            request, etag=estatico.etag, last_modified=int(estatico.modificado),
+        )
+        if respuesta is None:
+            codificacion, ruta = estatico.elegir(_codificaciones_aceptadas(request))
+            respuesta = FileResponse(open(ruta, 'rb'))
+            # FileResponse deduce tipo y Content-Disposition del nombre
+            # (.gz/.br en las variantes); un estático no es una descarga
+            respuesta['Content-Type'] = estatico.tipo
+            respuesta.headers.pop('Content-Disposition', None)
+            if codificacion:
+                respuesta['Content-Encoding'] = codificacion
+        respuesta['Cache-Control'] = estatico.cache
+        respuesta['ETag'] = estatico.etag
+        respuesta['Last-Modified'] = http_date(estatico.modificado)
+        if estatico.variantes:
+            respuesta['Vary'] = 'Accept-Encoding'
+        return respuesta
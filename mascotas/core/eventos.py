@@ -0,0 +1,190 @@
+import asyncio
+import itertools
+import json
+import threading
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+# Notificaciones en vivo (Server-Sent Events) de mascotas nuevas, cambios de
+# disponibilidad y adopciones. Cada evento se serializa una sola vez y se
+# reparte a las colas de los navegadores conectados sin volver a consultar
+# la base de datos. Cada cliente tiene una cola acotada: si no lee a tiempo
+# se descartan sus eventos más antiguos en lugar de acumular memoria.
+
+GLOBAL = 'mascotas'
+COLA_MAXIMA = 100
+# Segundos sin eventos tras los que se envía un comentario para mantener viva
+# la conexión a través de proxies
+LATIDO = 15
+
+
+def canal_fundacion(fundacion_id):
+    return f'fundacion:{fundacion_id}'
+
+
+class Evento:
+    """Un evento ya codificado en el formato de ``text/event-stream``."""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, tipo, datos):
+        self.id = next(self._ids)
+        self.tipo = tipo
+        self.datos = datos
+        self.sse = (
+            f'id: {self.id}\nevent: {tipo}\ndata: {json.dumps(datos, separators=(",", ":"))}\n\n'
+        ).encode()
+
+
+class Suscripcion:
+    """Cola acotada de un cliente; vive en el bucle de eventos que la creó."""
+
+    def __init__(self, canal, maximo):
+        self.canal = canal
+        self.bucle = asyncio.get_running_loop()
+        self.cola = asyncio.Queue(maxsize=maximo)
+        self.perdidos = 0
+
+    def entregar(self, evento):
+        # Cliente lento: se descarta el evento más antiguo, no el nuevo
+        if self.cola.full():
+            self.cola.get_nowait()
+            self.perdidos += 1
+        self.cola.put_nowait(evento)
+
+    async def siguiente(self, espera):
+        """El próximo evento, o ``None`` si no llega ninguno en ``espera`` segundos."""
+        try:
+            return await asyncio.wait_for(self.cola.get(), espera)
+        except asyncio.TimeoutError:
+            return None
+
+
+class Hub:
+    """Suscripciones de este proceso por canal.
+
+    ``repartir`` puede llamarse desde cualquier hilo (señales del ORM,
+    ``sync_to_async``): agrupa los suscriptores por bucle y programa una
+    sola llamada en cada uno.
+    """
+
+    def __init__(self):
+        self._canales = defaultdict(set)
+        self._candado = threading.Lock()
+        self.publicados = 0
+
+    def suscribir(self, canal, maximo=None):
+        suscripcion = Suscripcion(canal, maximo or getattr(settings, 'EVENTOS_COLA_MAXIMA', COLA_MAXIMA))
+        with self._candado:
+            self._canales[canal].add(suscripcion)
+        return suscripcion
+
+    def cancelar(self, suscripcion):
+        with self._candado:
+            suscriptores = self._canales.get(suscripcion.canal)
+            if suscriptores is not None:
+                suscriptores.discard(suscripcion)
+                if not suscriptores:
+                    del self._canales[suscripcion.canal]
+
+    def repartir(self, canal, evento):
+        with self._candado:
+            self.publicados += 1
+            por_bucle = defaultdict(list)
+            for suscripcion in self._canales.get(canal, ()):
+                por_bucle[suscripcion.bucle].append(suscripcion)
+        for bucle, suscripciones in por_bucle.items():
+            try:
+                bucle.call_soon_threadsafe(_entregar, suscripciones, evento)
+            except RuntimeError:
+                pass  # bucle ya cerrado: sus clientes se han desconectado
+
+    def estadisticas(self):
+        with self._candado:
+            suscripciones = [s for grupo in self._canales.values() for s in grupo]
+            return {
+                'canales': len(self._canales),
+                'suscriptores': len(suscripciones),
+                'publicados': self.publicados,
+                'perdidos': sum(s.perdidos for s in suscripciones),
+            }
+
+
+def _entregar(suscripciones, evento):
+    for suscripcion in suscripciones:
+        suscripcion.entregar(evento)
+
+
+class BackendLocal:
+    """Entrega los eventos al hub de este mismo proceso.
+
+    Con varios procesos (p. ej. ``uvicorn --workers 4``) cada uno solo ve
+    lo que publica él mismo. Otro backend (Redis pub/sub, LISTEN/NOTIFY de
+    PostgreSQL) implementaría ``publicar`` enviando al broker y llamaría a
+    ``hub.repartir`` en cada proceso al recibir el mensaje.
+    """
+
+    def __init__(self, hub):
+        self.hub = hub
+
+    def publicar(self, canales, evento):
+        for canal in canales:
+            self.hub.repartir(canal, evento)
+
+
+hub = Hub()
+_backend = None
+
+
+def backend():
+    global _backend
+    if _backend is None:
+        clase = import_string(getattr(settings, 'EVENTOS_BACKEND', 'core.eventos.BackendLocal'))
+        _backend = clase(hub)
+    return _backend
+
+
+def publicar(tipo, datos, fundacion_id):
+    """Publica en el canal global y en el de la fundación."""
+    evento = Evento(tipo, datos)
+    backend().publicar((GLOBAL, canal_fundacion(fundacion_id)), evento)
+    return evento
+
+
+async def flujo(canal):
+    """Cuerpo de la respuesta ``text/event-stream`` de un cliente."""
+    suscripcion = hub.suscribir(canal)
+    latido = getattr(settings, 'EVENTOS_LATIDO', LATIDO)
+    try:
+        # El navegador reintenta a los 5 s si se corta la conexión
+        yield b'retry: 5000\n\n'
+        while True:
+            evento = await suscripcion.siguiente(latido)
+            yield evento.sse if evento is not None else b': latido\n\n'
+    finally:
+        hub.cancelar(suscripcion)
+
+
+# Campos que interesan a quien espera una mascota; guardar solo otros
+# (p. ej. las variantes de la foto) no genera evento
+CAMPOS_EVENTO = ('nombre', 'especie', 'edad', 'disponible', 'fundacion_id')
+CAMPOS_RELEVANTES = frozenset(CAMPOS_EVENTO + ('fundacion', 'foto'))
+
+
+def datos_mascota(mascota, update_fields=None):
+    """Datos públicos de la mascota, o ``None`` si el guardado no los cambia.
+
+    Lee ``__dict__`` para no disparar consultas de campos diferidos.
+    """
+    if update_fields is not None and not CAMPOS_RELEVANTES & set(update_fields):
+        return None
+    datos = mascota.__dict__
+    if any(campo not in datos for campo in CAMPOS_EVENTO):
+        return None
+    return {
+        'id': mascota.pk,
+        **{campo: datos[campo] for campo in CAMPOS_EVENTO},
+        'foto': mascota.foto.url if datos.get('foto') else None,
+    }
@@ -0,0 +1,223 @@
+import io
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from itertools import islice
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import get_template
+
+from .facturas import PLANTILLA_PDF, factura_disponible
+from .models import Fundacion
+from .pdf import html_a_pdf
+from . import historial
+from . import tareas
+
+# Cuántas adopciones se cargan y renderizan a la vez; acota la memoria usada
+TAMANO_LOTE = 32
+# Carpeta de MEDIA_ROOT donde se dejan los PDF combinados generados en segundo plano
+CARPETA_PDF = 'exportaciones'
+# Segundos que se conserva un PDF combinado (o su error) antes de borrarlo
+CADUCIDAD_PDF = 24 * 60 * 60
+
+# Pools de procesos por número de workers, compartidos por todas las
+# exportaciones del proceso en lugar de arrancar uno por petición
+_pools = {}
+_candado_pools = threading.Lock()
+
+
+def _contexto_procesos():
+    # Nunca fork: el servidor tiene hilos (pool de tareas, ASGI) y un fork
+    # copiaría sus candados a medio tomar. Los hijos solo importan core.pdf
+    metodos = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in metodos else 'spawn')
+
+
+def _pool(workers):
+    with _candado_pools:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers, mp_context=_contexto_procesos())
+        return pool
+
+
+def _descartar_pool(workers):
+    with _candado_pools:
+        pool = _pools.pop(workers, None)
+    if pool is not None:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def adopciones_para_exportar(fundacion, desde=None, hasta=None):
+    """Adopciones de una fundación en un rango de fechas (ambos inclusive).
+
+    Incluye las archivadas; se leen de la base a trozos según se consumen.
+    """
+    return historial.de_fundacion(fundacion, desde, hasta, tamano_lote=TAMANO_LOTE)
+
+
+def _lotes(iterable, tamano):
+    iterador = iter(iterable)
+    while lote := list(islice(iterador, tamano)):
+        yield lote
+
+
+def iterar_facturas(adopciones, workers=None):
+    """Genera pares ``(adopcion, pdf)`` en el orden de ``adopciones``.
+
+    Las facturas ya guardadas en disco se leen tal cual; el resto se renderiza
+    con ``factura_pdf.html`` en un pool de procesos. El HTML se genera en este
+    proceso (necesita la base de datos) y solo la conversión a PDF, que es la
+    parte costosa, viaja a los procesos hijos. El pool se crea la primera
+    vez y se reutiliza en las siguientes exportaciones.
+    """
+    if workers is None:
+        workers = getattr(settings, 'FACTURAS_EXPORT_WORKERS', os.cpu_count() or 1)
+    plantilla = get_template(PLANTILLA_PDF)
+    pool = _pool(workers) if workers > 1 else None
+    for lote in _lotes(adopciones, TAMANO_LOTE):
+        pendientes = [a for a in lote if not factura_disponible(a)]
+        htmls = [plantilla.render({'adopcion': a}) for a in pendientes]
+        try:
+            pdfs = list(pool.map(html_a_pdf, htmls) if pool else map(html_a_pdf, htmls))
+        except BrokenProcessPool:
+            # Un hijo murió: la próxima exportación arranca un pool nuevo
+            _descartar_pool(workers)
+            raise
+        renderizados = dict(zip((a.pk for a in pendientes), pdfs))
+
+        for adopcion in lote:
+            if adopcion.pk in renderizados:
+                yield adopcion, renderizados[adopcion.pk]
+            else:
+                with adopcion.factura_pdf.open('rb') as archivo:
+                    yield adopcion, archivo.read()
+
+
+def nombre_en_zip(adopcion):
+    return f'factura_{adopcion.pk:05d}_{adopcion.fecha_adopcion:%Y%m%d}.pdf'
+
+
+class _BufferSalida:
+    """Destino no buscable para ``ZipFile``: acumula bytes hasta vaciarse."""
+
+    def __init__(self):
+        self._partes = []
+
+    def write(self, datos):
+        self._partes.append(bytes(datos))
+        return len(datos)
+
+    def flush(self):
+        pass
+
+    def vaciar(self):
+        datos = b''.join(self._partes)
+        self._partes.clear()
+        return datos
+
+
+def flujo_zip(facturas):
+    """Genera un ZIP en trozos a partir de pares ``(adopcion, pdf)``.
+
+    Cada factura se emite en cuanto se comprime, así que la memoria usada no
+    depende del número de adopciones.
+    """
+    buffer = _BufferSalida()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archivo_zip:
+        for adopcion, pdf in facturas:
+            archivo_zip.writestr(nombre_en_zip(adopcion), pdf)
+            yield buffer.vaciar()
+    yield buffer.vaciar()
+
+
+def escribir_pdf_combinado(facturas, destino):
+    """Une todas las facturas en un único PDF escrito en ``destino``.
+
+    pypdf no sabe escribir por partes: las páginas se acumulan en memoria
+    hasta el final, así que solo se llama desde el comando o desde el pool
+    de fondo (``encolar_pdf``), nunca dentro de una petición.
+    """
+    from pypdf import PdfWriter
+
+    escritor = PdfWriter()
+    for _adopcion, pdf in facturas:
+        escritor.append(io.BytesIO(pdf))
+    escritor.write(destino)
+    escritor.close()
+
+
+def nombre_pdf(fundacion, desde=None, hasta=None):
+    """Ruta del PDF combinado; cambia si el rango gana o pierde adopciones."""
+    firma = historial.firma_fundacion(fundacion, desde, hasta)
+    return f"{CARPETA_PDF}/facturas_{fundacion.pk}_{desde or 'inicio'}_{hasta or 'fin'}_{firma}.pdf"
+
+
+def _nombre_error(nombre):
+    return f'{nombre}.error'
+
+
+def generar_pdf(nombre, fundacion_id, desde=None, hasta=None):
+    """Genera el PDF combinado en un temporal en disco y lo guarda como ``nombre``.
+
+    Si falla deja el error junto al nombre para que la vista lo muestre en
+    lugar de esperar indefinidamente.
+    """
+    limpiar_caducados()
+    try:
+        fundacion = Fundacion.objects.get(pk=fundacion_id)
+        pares = iterar_facturas(adopciones_para_exportar(fundacion, desde, hasta))
+        with tempfile.TemporaryFile() as temporal:
+            escribir_pdf_combinado(pares, temporal)
+            temporal.seek(0)
+            default_storage.save(nombre, File(temporal))
+    except Exception as error:
+        default_storage.save(_nombre_error(nombre), ContentFile(str(error).encode()))
+        raise
+
+
+def encolar_pdf(nombre, fundacion_id, desde=None, hasta=None):
+    return tareas.encolar(('exportar_pdf', nombre), generar_pdf, nombre, fundacion_id, desde, hasta)
+
+
+def error_pdf(nombre):
+    """Mensaje del último intento fallido de ``nombre``, o ``None``.
+
+    Lo consume: la siguiente petición vuelve a intentarlo.
+    """
+    ruta = _nombre_error(nombre)
+    if not default_storage.exists(ruta):
+        return None
+    with default_storage.open(ruta, 'rb') as archivo:
+        mensaje = archivo.read().decode(errors='replace')
+    default_storage.delete(ruta)
+    return mensaje or 'Error desconocido'
+
+
+def limpiar_caducados(caducidad=None):
+    """Borra los PDF combinados (y errores) de más de ``EXPORTACIONES_CADUCIDAD`` segundos.
+
+    Se llama antes de cada exportación nueva; devuelve cuántos borró.
+    """
+    if caducidad is None:
+        caducidad = getattr(settings, 'EXPORTACIONES_CADUCIDAD', CADUCIDAD_PDF)
+    try:
+        _carpetas, archivos = default_storage.listdir(CARPETA_PDF)
+    except FileNotFoundError:
+        return 0
+    limite = time.time() - caducidad
+    borrados = 0
+    for archivo in archivos:
+        ruta = f'{CARPETA_PDF}/{archivo}'
+        if default_storage.get_modified_time(ruta).timestamp() < limite:
+            default_storage.delete(ruta)
+            borrados += 1
+    return borrados
@@ -0,0 +1,106 @@
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.template.loader import get_template
+
+from . import historial
+from . import perfilado
+from . import tareas
+from .models import Adopcion
+from .pdf import ErrorPDF, html_a_pdf  # noqa: F401
+
+PLANTILLA_PDF = 'core/factura_pdf.html'
+INTENTOS = 3
+
+
+def render_to_pdf(template_src, context_dict=None):
+    """Renderiza una plantilla HTML a PDF y devuelve los bytes."""
+    with perfilado.medir('pdf'):
+        return html_a_pdf(get_template(template_src).render(context_dict or {}))
+
+
+def nombre_archivo(adopcion_id, contenido):
+    """Ruta dentro de MEDIA_ROOT, con el hash del contenido en el nombre."""
+    digest = hashlib.sha256(contenido).hexdigest()[:16]
+    return f'facturas/factura_{adopcion_id:05d}_{digest}.pdf'
+
+
+def generar_factura(adopcion_id):
+    """Renderiza la factura de una adopción y la guarda en disco.
+
+    La factura de una adopción nunca cambia, así que solo se genera una vez;
+    las descargas posteriores sirven el archivo guardado. Cada fallo queda
+    anotado junto a las facturas (véase ``fallo``).
+    """
+    adopcion = historial.obtener(adopcion_id)
+    if adopcion is None:
+        raise Adopcion.DoesNotExist(f'No existe la adopción {adopcion_id}')
+    if factura_disponible(adopcion):
+        return adopcion.factura_pdf.name
+
+    try:
+        contenido = render_to_pdf(PLANTILLA_PDF, {'adopcion': adopcion})
+        nombre = default_storage.save(nombre_archivo(adopcion.pk, contenido), ContentFile(contenido))
+    except Exception as error:
+        _anotar_fallo(adopcion.pk, error)
+        raise
+    # Adopcion o AdopcionArchivada, según dónde esté
+    type(adopcion).objects.filter(pk=adopcion.pk).update(factura_pdf=nombre)
+    olvidar_fallos(adopcion.pk)
+    return nombre
+
+
+# -------- Fallos --------
+# En el almacenamiento y no en la cache: así los ve cualquier worker
+
+def _nombre_fallos(adopcion_id):
+    return f'facturas/factura_{adopcion_id:05d}.fallos'
+
+
+def fallo(adopcion_id):
+    """``{'intentos': n, 'error': mensaje}`` de los intentos fallidos, o ``None``."""
+    ruta = _nombre_fallos(adopcion_id)
+    if not default_storage.exists(ruta):
+        return None
+    try:
+        with default_storage.open(ruta, 'rb') as archivo:
+            return json.loads(archivo.read())
+    except (OSError, ValueError):
+        return None
+
+
+def agotada(adopcion_id):
+    """Indica si la factura ya falló ``FACTURA_INTENTOS`` veces seguidas."""
+    anotado = fallo(adopcion_id)
+    return anotado is not None and anotado['intentos'] >= getattr(settings, 'FACTURA_INTENTOS', INTENTOS)
+
+
+def _anotar_fallo(adopcion_id, error):
+    intentos = (fallo(adopcion_id) or {}).get('intentos', 0) + 1
+    olvidar_fallos(adopcion_id)
+    datos = {'intentos': intentos, 'error': str(error) or type(error).__name__}
+    default_storage.save(_nombre_fallos(adopcion_id), ContentFile(json.dumps(datos).encode()))
+
+
+def olvidar_fallos(adopcion_id):
+    default_storage.delete(_nombre_fallos(adopcion_id))
+
+
+def encolar(adopcion_id):
+    """Programa la generación de la factura en el pool de fondo.
+
+    Es idempotente: si la factura ya está en cola no se vuelve a encolar, y
+    tampoco si ya agotó los intentos. Devuelve ``True`` si se programó un
+    nuevo trabajo.
+    """
+    if agotada(adopcion_id):
+        return False
+    return tareas.encolar(('factura', adopcion_id), generar_factura, adopcion_id)
+
+
+def factura_disponible(adopcion):
+    """Indica si el PDF de la adopción ya está guardado en disco."""
+    return bool(adopcion.factura_pdf) and default_storage.exists(adopcion.factura_pdf.name)
@@ -1,8 +1,92 @@
+from datetime import timedelta
+
 from django import forms
 from django.contrib.auth.forms import UserCreationForm
-from .models import Usuario
+from django.http import QueryDict
+from django.utils import timezone
+from .models import Usuario, Fundacion
 
 class RegistroUsuarioForm(UserCreationForm):
     class Meta:
         model = Usuario
         fields = ['email', 'username', 'telefono', 'direccion', 'password1', 'password2']
+
+
+class ExportarFacturasForm(forms.Form):
+    FORMATOS = [('zip', 'ZIP'), ('pdf', 'PDF combinado')]
+
+    fundacion = forms.ModelChoiceField(queryset=Fundacion.objects.activas())
+    desde = forms.DateField(required=False)
+    hasta = forms.DateField(required=False)
+    formato = forms.ChoiceField(choices=FORMATOS, required=False)
+
+    def clean_formato(self):
+        return self.cleaned_data['formato'] or 'zip'
+
+    def clean(self):
+        datos = super().clean()
+        desde, hasta = datos.get('desde'), datos.get('hasta')
+        if desde and hasta and desde > hasta:
+            raise forms.ValidationError('La fecha inicial no puede ser posterior a la final.')
+        return datos
+
+
+class EstadisticasForm(forms.Form):
+    AGRUPACIONES = [('dia', 'Día'), ('semana', 'Semana')]
+    DIAS_POR_DEFECTO = 30
+
+    fundacion = forms.ModelChoiceField(queryset=Fundacion.objects.activas(), required=False)
+    desde = forms.DateField(required=False)
+    hasta = forms.DateField(required=False)
+    agrupar = forms.ChoiceField(choices=AGRUPACIONES, required=False)
+
+    def clean(self):
+        datos = super().clean()
+        hasta = datos.get('hasta') or timezone.localdate()
+        desde = datos.get('desde') or hasta - timedelta(days=self.DIAS_POR_DEFECTO - 1)
+        if desde > hasta:
+            raise forms.ValidationError('La fecha inicial no puede ser posterior a la final.')
+        datos.update(desde=desde, hasta=hasta, agrupar=datos.get('agrupar') or 'dia')
+        return datos
+
+
+class FiltroMascotasForm(forms.Form):
+    DISPONIBILIDAD = [('', 'Todas'), ('1', 'Disponibles'), ('0', 'Adoptadas')]
+
+    especie = forms.CharField(max_length=50, required=False)
+    edad_min = forms.IntegerField(min_value=0, required=False)
+    edad_max = forms.IntegerField(min_value=0, required=False)
+    disponible = forms.TypedChoiceField(
+        choices=DISPONIBILIDAD, required=False,
+        coerce=lambda valor: valor == '1', empty_value=None,
+    )
+
+    def filtrar(self, mascotas):
+        """Aplica los filtros válidos al queryset; los inválidos se ignoran."""
+        self.is_valid()
+        datos = getattr(self, 'cleaned_data', {})
+        return mascotas.filtrar(
+            especie=datos.get('especie'),
+            edad_min=datos.get('edad_min'),
+            edad_max=datos.get('edad_max'),
+            disponible=datos.get('disponible'),
+        )
+
+    def parametros(self, **extra):
+        """``QueryDict`` con solo los filtros válidos (y ``extra`` no vacíos).
+
+        Sirve como clave de caché y para construir enlaces: los parámetros
+        desconocidos o inválidos no generan variantes nuevas.
+        """
+        self.is_valid()
+        datos = getattr(self, 'cleaned_data', {})
+        parametros = QueryDict(mutable=True)
+        for nombre in ('especie', 'edad_min', 'edad_max'):
+            if datos.get(nombre) not in (None, ''):
+                parametros[nombre] = str(datos[nombre])
+        if datos.get('disponible') is not None:
+            parametros['disponible'] = '1' if datos['disponible'] else '0'
+        for nombre, valor in extra.items():
+            if valor:
+                parametros[nombre] = valor
+        return parametros
@@ -0,0 +1,173 @@
+import hashlib
+import threading
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import caches
+
+# Ámbito global: tarjetas de fundaciones en ``inicio``
+GLOBAL = 'fundaciones'
+
+# Backends cuya cache vive dentro de cada proceso: una invalidación en un
+# worker no llega a los demás
+CACHES_POR_PROCESO = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+_estadisticas = {'aciertos': 0, 'fallos': 0, 'invalidaciones': 0}
+_candado = threading.Lock()
+
+
+def _cache():
+    return caches[getattr(settings, 'CACHE_FRAGMENTOS_ALIAS', 'default')]
+
+
+def _timeout():
+    return getattr(settings, 'CACHE_FRAGMENTOS_TIMEOUT', 600)
+
+
+def _timeout_sellos():
+    # Finito: si un sello se pierde o caduca, se regenera desde el reloj y
+    # los clientes solo revalidan de más
+    return getattr(settings, 'CACHE_SELLOS_TIMEOUT', 24 * 60 * 60)
+
+
+def compartida():
+    """Si los sellos de versión los ven todos los workers.
+
+    ``CACHE_FRAGMENTOS_COMPARTIDA`` lo fuerza; si no se define se deduce del
+    backend. Solo con una cache compartida pueden servir como validadores
+    HTTP (core.api): con una por proceso, los demás workers no se enteran
+    de las invalidaciones.
+    """
+    ajuste = getattr(settings, 'CACHE_FRAGMENTOS_COMPARTIDA', None)
+    if ajuste is not None:
+        return ajuste
+    alias = getattr(settings, 'CACHE_FRAGMENTOS_ALIAS', 'default')
+    return settings.CACHES[alias]['BACKEND'] not in CACHES_POR_PROCESO
+
+
+def _contar(evento):
+    with _candado:
+        _estadisticas[evento] += 1
+
+
+def estadisticas():
+    """Aciertos, fallos e invalidaciones de este proceso desde su arranque."""
+    with _candado:
+        datos = dict(_estadisticas)
+    consultas = datos['aciertos'] + datos['fallos']
+    datos['tasa_aciertos'] = round(datos['aciertos'] / consultas, 4) if consultas else None
+    return datos
+
+
+def _clave_version(ambito):
+    return f'fragmentos:version:{ambito}'
+
+
+def _clave_modificado(ambito):
+    return f'fragmentos:modificado:{ambito}'
+
+
+def ambito_fundacion(fundacion_id):
+    return f'fundacion:{fundacion_id}'
+
+
+def ambito_usuario(usuario_id):
+    return f'usuario:{usuario_id}'
+
+
+def _version_inicial():
+    # Basada en el reloj: si la versión se desaloja de la cache no se
+    # reutilizan fragmentos guardados con una versión anterior.
+    return int(time.time() * 1000)
+
+
+def version(ambito):
+    cache = _cache()
+    clave = _clave_version(ambito)
+    actual = cache.get(clave)
+    if actual is None:
+        actual = _version_inicial()
+        if not cache.add(clave, actual, _timeout_sellos()):
+            actual = cache.get(clave, actual)
+    return actual
+
+
+def modificado(ambito):
+    """Momento (epoch) de la última invalidación del ámbito.
+
+    Si la cache no lo conoce se toma el momento actual: un cliente como
+    mucho revalida de más, nunca se queda con datos viejos.
+    """
+    cache = _cache()
+    clave_modificado = _clave_modificado(ambito)
+    actual = cache.get(clave_modificado)
+    if actual is None:
+        actual = time.time()
+        if not cache.add(clave_modificado, actual, _timeout_sellos()):
+            actual = cache.get(clave_modificado, actual)
+    return actual
+
+
+def invalidar(*ambitos):
+    """Incrementa la versión de los ámbitos; sus fragmentos dejan de usarse."""
+    cache = _cache()
+    ahora = time.time()
+    timeout = _timeout_sellos()
+    for ambito in ambitos:
+        # incr no renueva la caducidad: el sello se reescribe con la suya
+        try:
+            nueva = cache.incr(_clave_version(ambito))
+        except ValueError:
+            nueva = _version_inicial()
+        cache.set(_clave_version(ambito), nueva, timeout)
+        cache.set(_clave_modificado(ambito), ahora, timeout)
+        _contar('invalidaciones')
+
+
+def invalidar_fundacion(*fundacion_ids):
+    """Invalida las páginas de las fundaciones indicadas y el listado global."""
+    invalidar(GLOBAL, *(ambito_fundacion(pk) for pk in set(fundacion_ids) if pk))
+
+
+def clave(nombre, ambito, variacion=''):
+    resumen = hashlib.md5(str(variacion).encode(), usedforsecurity=False).hexdigest()
+    return f'fragmentos:{nombre}:{ambito}:v{version(ambito)}:{resumen}'
+
+
+def obtener(nombre, ambito, variacion=''):
+    """Devuelve el fragmento cacheado o ``None``, sin contarlo como acierto.
+
+    Lo usan las vistas asíncronas para saber, antes de renderizar, si
+    necesitan consultar los datos del fragmento.
+    """
+    return _cache().get(clave(nombre, ambito, variacion))
+
+
+async def aobtener(nombre, ambito, variacion=''):
+    """``obtener`` para las vistas asíncronas, sin bloquear el bucle de eventos."""
+    return await sync_to_async(obtener)(nombre, ambito, variacion)
+
+
+def obtener_o_renderizar(nombre, ambito, variacion, renderizar, precargado=None):
+    """Devuelve el fragmento cacheado o lo genera con ``renderizar()``.
+
+    ``precargado`` es el contenido que la vista ya obtuvo con ``obtener``:
+    se usa tal cual para no depender de que siga en la cache.
+    """
+    if precargado is not None:
+        _contar('aciertos')
+        return precargado
+    cache = _cache()
+    llave = clave(nombre, ambito, variacion)
+    contenido = cache.get(llave)
+    if contenido is not None:
+        _contar('aciertos')
+        return contenido
+    _contar('fallos')
+    contenido = renderizar()
+    cache.set(llave, contenido, _timeout())
+    return contenido
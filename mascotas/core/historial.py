@@ -0,0 +1,156 @@
+from datetime import timedelta
+from itertools import chain
+
+from django.conf import settings
+from django.db import connections, router, transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+
+from .models import Adopcion, AdopcionArchivada
+from .paginacion import apaginar_encadenado, paginar_encadenado
+
+# Historial de adopciones repartido en dos tablas: Adopcion guarda las
+# recientes y AdopcionArchivada las que ``archivar_adopciones`` ha movido por
+# antigüedad, con el mismo id. Todo lo que necesita el historial completo
+# (mis adopciones, facturas, exportación, estadísticas) lee a través de este
+# módulo, que consulta primero la tabla caliente.
+#
+# Se archiva siempre de la más antigua en adelante, así que cualquier fecha
+# archivada es anterior a cualquier fecha de Adopcion: recorrer las
+# dos tablas una detrás de otra mantiene el orden.
+
+MODELOS = (Adopcion, AdopcionArchivada)
+ORDEN = ('-fecha_adopcion', '-id')
+DIAS_ARCHIVO = 365
+
+
+def de_usuario(usuario, campos=None):
+    """Querysets del historial de ``usuario``, el reciente primero."""
+    querysets = [modelo.objects.historial_de(usuario) for modelo in MODELOS]
+    if campos:
+        querysets = [queryset.values(*campos) for queryset in querysets]
+    return querysets
+
+
+def paginar(usuario, cursor=None, tamano=20, campos=None):
+    """Página del historial completo de ``usuario`` (véase ``paginar_encadenado``)."""
+    return paginar_encadenado(de_usuario(usuario, campos), cursor=cursor, orden=ORDEN, tamano=tamano)
+
+
+async def apaginar(usuario, cursor=None, tamano=20):
+    return await apaginar_encadenado(de_usuario(usuario), cursor=cursor, orden=ORDEN, tamano=tamano)
+
+
+def _ids_de(usuario):
+    # Un solo COUNT sobre UNION ALL en lugar de una consulta por tabla
+    recientes, *resto = (modelo.objects.filter(usuario=usuario).values('id') for modelo in MODELOS)
+    return recientes.union(*resto, all=True)
+
+
+def contar(usuario):
+    return _ids_de(usuario).count()
+
+
+async def acontar(usuario):
+    return await _ids_de(usuario).acount()
+
+
+def obtener(adopcion_id):
+    """La adopción con ese id en cualquiera de las dos tablas, o ``None``."""
+    for modelo in MODELOS:
+        adopcion = (
+            modelo.objects
+            .select_related('mascota', 'usuario', 'fundacion')
+            .filter(pk=adopcion_id)
+            .first()
+        )
+        if adopcion is not None:
+            return adopcion
+    return None
+
+
+def _de_fundacion(modelo, fundacion, desde, hasta):
+    adopciones = modelo.objects.filter(fundacion=fundacion)
+    if desde:
+        adopciones = adopciones.filter(fecha_adopcion__gte=desde)
+    if hasta:
+        adopciones = adopciones.filter(fecha_adopcion__lte=hasta)
+    return adopciones
+
+
+def de_fundacion(fundacion, desde=None, hasta=None, tamano_lote=2000):
+    """Adopciones de una fundación de la más antigua a la más reciente.
+
+    Itera las archivadas y luego las recientes en trozos de ``tamano_lote``.
+    """
+    return chain.from_iterable(
+        _de_fundacion(modelo, fundacion, desde, hasta)
+        .select_related('mascota', 'usuario', 'fundacion')
+        .order_by('fecha_adopcion', 'id')
+        .iterator(chunk_size=tamano_lote)
+        for modelo in reversed(MODELOS)
+    )
+
+
+def firma_fundacion(fundacion, desde=None, hasta=None):
+    """Resumen (cuántas y el id mayor por tabla) de las adopciones del rango."""
+    partes = []
+    for modelo in MODELOS:
+        datos = _de_fundacion(modelo, fundacion, desde, hasta).aggregate(total=Count('id'), ultimo=Max('id'))
+        partes.append(f"{datos['total']}-{datos['ultimo'] or 0}")
+    return '_'.join(partes)
+
+
+def fecha_limite(dias=None):
+    """Fecha a partir de la cual una adopción sigue en la tabla caliente."""
+    if dias is None:
+        dias = getattr(settings, 'ADOPCIONES_DIAS_ARCHIVO', DIAS_ARCHIVO)
+    return timezone.localdate() - timedelta(days=dias)
+
+
+def archivar_lote(limite, tamano=1000):
+    """Mueve hasta ``tamano`` adopciones anteriores a ``limite`` al archivo.
+
+    Copia y borrado van en la misma transacción, así que una adopción nunca
+    está en las dos tablas ni en ninguna. Devuelve cuántas se movieron.
+    """
+    with transaction.atomic():
+        viejas = list(
+            Adopcion.objects
+            .filter(fecha_adopcion__lt=limite)
+            .order_by('fecha_adopcion', 'id')[:tamano]
+        )
+        if not viejas:
+            return 0
+        AdopcionArchivada.objects.bulk_create([
+            AdopcionArchivada(
+                id=adopcion.pk,
+                mascota_id=adopcion.mascota_id,
+                usuario_id=adopcion.usuario_id,
+                fundacion_id=adopcion.fundacion_id,
+                fecha_adopcion=adopcion.fecha_adopcion,
+                activa=adopcion.activa,
+                factura_pdf=adopcion.factura_pdf.name,
+            )
+            for adopcion in viejas
+        ])
+        Adopcion.objects.filter(pk__in=[adopcion.pk for adopcion in viejas]).delete()
+    return len(viejas)
+
+
+def analizar():
+    """Refresca las estadísticas del planificador de las dos tablas.
+
+    En SQLite son también las que usa el admin para estimar cuántas filas hay.
+    """
+    for modelo in MODELOS:
+        with connections[router.db_for_write(modelo)].cursor() as cursor:
+            cursor.execute(f'ANALYZE {cursor.db.ops.quote_name(modelo._meta.db_table)}')
+
+
+def archivar(limite, tamano=1000):
+    """Archiva por lotes todo lo anterior a ``limite``; genera el total movido tras cada lote."""
+    total = 0
+    while movidas := archivar_lote(limite, tamano):
+        total += movidas
+        yield total
@@ -0,0 +1,93 @@
+import io
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps, features
+
+from . import fragmentos
+from . import tareas
+from .almacenamiento import hash_contenido
+from .models import Mascota
+
+# Anchos (px) de las miniaturas y variantes responsivas de cada foto
+ANCHOS_VARIANTES = (320, 640, 960)
+# Formatos en orden de preferencia para el navegador
+FORMATOS_VARIANTES = ('avif', 'webp')
+CALIDAD = {'avif': 55, 'webp': 75}
+DIRECTORIO_VARIANTES = 'mascotas/variantes'
+
+
+def formatos_soportados():
+    return [formato for formato in FORMATOS_VARIANTES if features.check(formato)]
+
+
+def nombre_variante(digest, ancho, formato):
+    return f'{DIRECTORIO_VARIANTES}/{digest[:32]}_{ancho}.{formato}'
+
+
+def _redimensionar(imagen, ancho):
+    if imagen.width <= ancho:
+        return imagen
+    alto = round(imagen.height * ancho / imagen.width)
+    return imagen.resize((ancho, alto), Image.LANCZOS)
+
+
+def generar_variantes(mascota_id):
+    """Genera las variantes de la foto de una mascota y las registra.
+
+    Las variantes se nombran por el hash de la foto original, así que dos
+    mascotas con la misma imagen comparten archivos y no se recalculan. Se
+    guardan con el almacenamiento por defecto: su nombre ya es determinista.
+    """
+    mascota = Mascota.objects.only('foto', 'fundacion_id').get(pk=mascota_id)
+    if not mascota.foto:
+        return {}
+
+    with mascota.foto.open('rb') as archivo:
+        digest = hash_contenido(archivo)
+        imagen = Image.open(archivo)
+        imagen = ImageOps.exif_transpose(imagen)
+        imagen.load()
+    if imagen.mode not in ('RGB', 'RGBA'):
+        imagen = imagen.convert('RGBA' if 'A' in imagen.getbands() else 'RGB')
+
+    variantes = {}
+    for formato in formatos_soportados():
+        variantes[formato] = []
+        for ancho in ANCHOS_VARIANTES:
+            escalada = _redimensionar(imagen, ancho)
+            nombre = nombre_variante(digest, escalada.width, formato)
+            if not default_storage.exists(nombre):
+                destino = io.BytesIO()
+                escalada.save(destino, format=formato.upper(), quality=CALIDAD[formato])
+                default_storage.save(nombre, ContentFile(destino.getvalue()))
+            variantes[formato].append([escalada.width, nombre])
+            if escalada is imagen:
+                # No se amplían imágenes más pequeñas que el ancho pedido
+                break
+
+    variantes['origen'] = mascota.foto.name
+    actualizada = Mascota.objects.filter(pk=mascota_id, foto=mascota.foto.name).update(
+        foto_hash=digest, foto_variantes=variantes,
+    )
+    if actualizada:
+        # update() no dispara señales: las páginas cacheadas aún no tienen el srcset
+        fragmentos.invalidar_fundacion(mascota.fundacion_id)
+    return variantes
+
+
+def variantes_pendientes(mascota):
+    """Indica si la foto cambió desde que se generaron sus variantes."""
+    return bool(mascota.foto) and (mascota.foto_variantes or {}).get('origen') != mascota.foto.name
+
+
+def encolar(mascota_id):
+    return tareas.encolar(('variantes', mascota_id), generar_variantes, mascota_id)
+
+
+def srcset(mascota, formato):
+    """Valor del atributo ``srcset`` para un formato, o cadena vacía."""
+    if variantes_pendientes(mascota):
+        return ''
+    entradas = (mascota.foto_variantes or {}).get(formato) or []
+    return ', '.join(f'{default_storage.url(nombre)} {ancho}w' for ancho, nombre in entradas)
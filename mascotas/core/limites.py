@@ -0,0 +1,79 @@
+import math
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+
+# (capacidad, periodo en segundos): ráfaga máxima y ritmo de recarga
+LIMITE_IP_DEFECTO = (20, 60)
+LIMITE_EMAIL_DEFECTO = (5, 300)
+
+
+def _cache():
+    return caches[getattr(settings, 'LOGIN_LIMITES_CACHE', 'default')]
+
+
+def consumir(clave, capacidad, periodo):
+    """Consume un token del cubo ``clave``; devuelve ``False`` si está vacío.
+
+    El cubo se recarga a ``capacidad / periodo`` tokens por segundo y vive
+    en la cache compartida, así que el límite se aplica entre procesos si el
+    backend de cache lo es. La lectura y escritura no son atómicas: bajo
+    concurrencia extrema puede colarse algún intento de más, lo cual es
+    aceptable para frenar inundaciones.
+    """
+    cache = _cache()
+    ahora = time.time()
+    estado = cache.get(clave)
+    tokens, ultimo = estado if estado else (float(capacidad), ahora)
+    tokens = min(float(capacidad), tokens + (ahora - ultimo) * capacidad / periodo)
+    permitido = tokens >= 1
+    if permitido:
+        tokens -= 1
+    cache.set(clave, (tokens, ahora), periodo)
+    return permitido
+
+
+def permitir_login(ip, email):
+    """Aplica los cubos por IP y por email a un intento de login."""
+    capacidad_ip, periodo_ip = getattr(settings, 'LOGIN_LIMITE_IP', LIMITE_IP_DEFECTO)
+    capacidad_email, periodo_email = getattr(settings, 'LOGIN_LIMITE_EMAIL', LIMITE_EMAIL_DEFECTO)
+    if ip and not consumir(f'login:ip:{ip}', capacidad_ip, periodo_ip):
+        return False
+    if email and not consumir(f'login:email:{email.strip().lower()}', capacidad_email, periodo_email):
+        return False
+    return True
+
+
+class _LimiteHashes:
+    """Semáforo de proceso que acota cuántos hashes de contraseña corren a la vez."""
+
+    def __init__(self):
+        self._semaforo = None
+        self._candado = threading.Lock()
+
+    def _get_semaforo(self):
+        with self._candado:
+            if self._semaforo is None:
+                self._semaforo = threading.BoundedSemaphore(
+                    getattr(settings, 'LOGIN_HASHES_CONCURRENTES', 4)
+                )
+            return self._semaforo
+
+    def espera(self):
+        return getattr(settings, 'LOGIN_HASHES_ESPERA', 2.0)
+
+    def adquirir(self):
+        return self._get_semaforo().acquire(timeout=self.espera())
+
+    def liberar(self):
+        self._get_semaforo().release()
+
+
+    def reintentar_en(self):
+        """Segundos para la cabecera Retry-After cuando no hubo hueco."""
+        return max(1, math.ceil(self.espera()))
+
+
+limite_hashes = _LimiteHashes()
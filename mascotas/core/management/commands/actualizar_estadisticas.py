@@ -0,0 +1,34 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import estadisticas
+
+
+class Command(BaseCommand):
+    help = ('Recalcula las estadísticas de adopción por fundación, especie y día desde la '
+            'tabla de adopciones, por tramos de días. Es idempotente: sirve para la carga '
+            'inicial, para ponerse al día (--desde) y para reparar desviaciones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', type=date.fromisoformat, help='AAAA-MM-DD (por defecto, la primera adopción)')
+        parser.add_argument('--hasta', type=date.fromisoformat, help='AAAA-MM-DD (por defecto, la última adopción)')
+        parser.add_argument('--dias-por-lote', type=int, default=31)
+
+    def handle(self, *args, **options):
+        if options['dias_por_lote'] < 1:
+            raise CommandError('--dias-por-lote debe ser al menos 1')
+        primera, ultima = estadisticas.rango_adopciones()
+        desde = options['desde'] or primera
+        hasta = options['hasta'] or ultima
+        if desde is None or hasta is None:
+            self.stdout.write('No hay adopciones que procesar')
+            return
+        if desde > hasta:
+            raise CommandError('--desde no puede ser posterior a --hasta')
+
+        total = 0
+        for inicio, fin, adopciones in estadisticas.recalcular(desde, hasta, options['dias_por_lote']):
+            total += adopciones
+            self.stdout.write(f'{inicio} → {fin}: {adopciones} adopciones')
+        self.stdout.write(self.style.SUCCESS(f'{total} adopciones agregadas entre {desde} y {hasta}'))
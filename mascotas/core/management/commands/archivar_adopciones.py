@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import historial
+
+
+class Command(BaseCommand):
+    help = ('Mueve las adopciones más antiguas que --dias días a la tabla de archivo, por '
+            'lotes de --lote en transacciones cortas. Mis adopciones, las facturas, la '
+            'exportación y las estadísticas las siguen leyendo (core.historial). Es '
+            'idempotente y puede interrumpirse: lo ya movido queda archivado.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, help='Antigüedad mínima (por defecto, ADOPCIONES_DIAS_ARCHIVO)')
+        parser.add_argument('--lote', type=int, default=1000, help='Adopciones por transacción')
+        parser.add_argument('--pausa', type=float, default=0,
+                            help='Segundos de espera entre lotes para dejar paso a otras escrituras')
+
+    def handle(self, *args, **options):
+        if options['lote'] < 1:
+            raise CommandError('--lote debe ser al menos 1')
+        if options['dias'] is not None and options['dias'] < 0:
+            raise CommandError('--dias no puede ser negativo')
+
+        limite = historial.fecha_limite(options['dias'])
+        total = 0
+        for total in historial.archivar(limite, options['lote']):
+            self.stdout.write(f'{total} adopciones archivadas')
+            if options['pausa']:
+                time.sleep(options['pausa'])
+        if total:
+            # Tras mover muchas filas, para el planificador y el admin
+            historial.analizar()
+        self.stdout.write(self.style.SUCCESS(f'{total} adopciones anteriores a {limite} archivadas'))
@@ -0,0 +1,131 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+
+from core.perfilado import percentil
+
+# Se ejecuta en un intérprete nuevo: mide lo que paga un worker recién
+# arrancado hasta responder su primera petición
+SONDA = r'''
+import json, os, sys, time
+inicio = time.perf_counter()
+import django
+django.setup()
+from mascotas.wsgi import application
+listo = time.perf_counter()
+from django.test import Client
+cliente = Client(SERVER_NAME='localhost')
+peticiones = []
+for url in sys.argv[1:]:
+    for _ in range(2):
+        antes = time.perf_counter()
+        estado = cliente.get(url).status_code
+        peticiones.append((url, estado, (time.perf_counter() - antes) * 1000))
+print(json.dumps({
+    'arranque_ms': (listo - inicio) * 1000,
+    'peticiones': peticiones,
+    'pdf_cargado': 'xhtml2pdf' in sys.modules,
+}))
+'''
+
+MODOS = {'sin_precarga': '0', 'con_precarga': '1'}
+
+
+class Command(BaseCommand):
+    help = ('Mide el arranque de un worker en procesos nuevos: tiempo hasta tener la '
+            'aplicación WSGI lista y latencia de la primera y la segunda petición, con y '
+            'sin PRECARGAR_PLANTILLAS. Incluye los módulos más lentos de importar.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeticiones', type=int, default=5)
+        parser.add_argument('--url', action='append', dest='urls',
+                            help='Rutas a pedir (por defecto, login e índice)')
+        parser.add_argument('--modulos', type=int, default=10, help='Módulos lentos a listar')
+        parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+
+    def handle(self, *args, **options):
+        if options['repeticiones'] < 1:
+            raise CommandError('--repeticiones debe ser al menos 1')
+        urls = options['urls'] or [reverse('login_usuario'), reverse('index')]
+        entorno = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': os.environ.get('DJANGO_SETTINGS_MODULE', 'mascotas.settings'),
+            # La misma base que este proceso (la de pruebas, si se lanza desde los tests)
+            'DB_NAME': str(connection.settings_dict['NAME']),
+        }
+
+        resultados = {
+            modo: self._medir(urls, {**entorno, 'PRECARGAR_PLANTILLAS': valor}, options['repeticiones'])
+            for modo, valor in MODOS.items()
+        }
+        salida = json.dumps({
+            'repeticiones': options['repeticiones'],
+            'modos': resultados,
+            'modulos_lentos_ms': self._modulos_lentos(urls, entorno, options['modulos']),
+        }, indent=2, sort_keys=True)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as destino:
+                destino.write(salida + '\n')
+        else:
+            self.stdout.write(salida)
+
+    def _sonda(self, argumentos, entorno, urls):
+        proceso = subprocess.run(
+            [sys.executable, *argumentos, '-c', SONDA, *urls],
+            cwd=settings.BASE_DIR, env=entorno, capture_output=True, text=True,
+        )
+        if proceso.returncode:
+            raise CommandError(f'La sonda de arranque falló:\n{proceso.stderr[-2000:]}')
+        return proceso
+
+    def _medir(self, urls, entorno, repeticiones):
+        arranques, primeras, segundas = [], [], []
+        pdf_cargado = False
+        for _ in range(repeticiones):
+            datos = json.loads(self._sonda([], entorno, urls).stdout.strip().splitlines()[-1])
+            errores = [(url, estado) for url, estado, _ in datos['peticiones'] if estado >= 400]
+            if errores:
+                raise CommandError(f'Respuestas con error en la sonda: {errores}')
+            arranques.append(datos['arranque_ms'])
+            primeras.append(datos['peticiones'][0][2])
+            segundas.extend(ms for i, (_, _, ms) in enumerate(datos['peticiones']) if i)
+            pdf_cargado = pdf_cargado or datos['pdf_cargado']
+
+        def resumen(valores):
+            valores = sorted(valores)
+            return {
+                'mediana_ms': round(statistics.median(valores), 2),
+                'p95_ms': round(percentil(valores, 95), 2),
+            }
+
+        return {
+            'arranque': resumen(arranques),
+            'primera_peticion': resumen(primeras),
+            'siguientes_peticiones': resumen(segundas),
+            # La pila PDF no debería cargarse hasta generar una factura
+            'pdf_cargado': pdf_cargado,
+        }
+
+    def _modulos_lentos(self, urls, entorno, cantidad):
+        """Módulos de primer nivel que más tardan en importarse (``-X importtime``).
+
+        Incluye los que se importan al atender la primera petición (URLs y vistas).
+        """
+        proceso = self._sonda(['-X', 'importtime'], {**entorno, 'PRECARGAR_PLANTILLAS': '0'}, urls)
+        tiempos = {}
+        for linea in proceso.stderr.splitlines():
+            if not linea.startswith('import time:') or '|' not in linea:
+                continue
+            _, acumulado, nombre = linea.split('|')
+            if nombre.startswith('  ') or not acumulado.strip().isdigit():
+                continue  # solo los importados directamente, no sus dependencias
+            tiempos[nombre.strip()] = max(tiempos.get(nombre.strip(), 0), int(acumulado) / 1000)
+        lentos = sorted(tiempos.items(), key=lambda par: -par[1])[:cantidad]
+        return [[nombre, round(ms, 1)] for nombre, ms in lentos]
@@ -0,0 +1,109 @@
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core.models import Usuario, Fundacion
+from core.perfilado import percentil
+
+
+class Command(BaseCommand):
+    help = ('Lanza peticiones concurrentes contra servidores ya arrancados y compara '
+            'rendimiento y latencia, p. ej. ASGI (uvicorn) frente a WSGI (gunicorn):\n'
+            '  uvicorn mascotas.asgi:application --port 8001 --workers 1\n'
+            '  gunicorn mascotas.wsgi:application -b :8002 --workers 1 --threads 8\n'
+            '  manage.py benchmark_servidores asgi=http://127.0.0.1:8001 '
+            'wsgi=http://127.0.0.1:8002 --usuario ana')
+
+    def add_arguments(self, parser):
+        parser.add_argument('servidores', nargs='+', help='nombre=url_base')
+        parser.add_argument('--usuario', required=True, help='Usuario con el que se autentican las peticiones')
+        parser.add_argument('--concurrencia', type=int, default=32)
+        parser.add_argument('--peticiones', type=int, default=500, help='Peticiones por ruta y servidor')
+        parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = Usuario.objects.get(username=options['usuario'])
+        except Usuario.DoesNotExist:
+            raise CommandError(f"No existe el usuario {options['usuario']!r}")
+        servidores = dict(self._servidor(valor) for valor in options['servidores'])
+
+        rutas = {
+            'inicio': reverse('inicio'),
+            'mis_adopciones': reverse('mis_adopciones'),
+            'buscar': reverse('buscar') + '?q=perro',
+        }
+        fundacion = Fundacion.objects.order_by('pk').first()
+        if fundacion:
+            rutas['fundacion_detalle'] = reverse('fundacion_detalle', args=[fundacion.pk])
+
+        # Sesión guardada con el motor configurado, visible para los servidores
+        sesion = import_module(settings.SESSION_ENGINE).SessionStore()
+        sesion[SESSION_KEY] = str(usuario.pk)
+        sesion[BACKEND_SESSION_KEY] = 'core.backends.EmailBackend'
+        sesion[HASH_SESSION_KEY] = usuario.get_session_auth_hash()
+        sesion.create()
+        cookie = f'{settings.SESSION_COOKIE_NAME}={sesion.session_key}'
+        try:
+            resultados = {
+                nombre: {
+                    ruta: self._medir(base + url, cookie, options['peticiones'], options['concurrencia'])
+                    for ruta, url in rutas.items()
+                }
+                for nombre, base in servidores.items()
+            }
+        finally:
+            sesion.delete()
+
+        salida = json.dumps({
+            'concurrencia': options['concurrencia'],
+            'peticiones': options['peticiones'],
+            'servidores': resultados,
+        }, indent=2, sort_keys=True)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as destino:
+                destino.write(salida + '\n')
+        else:
+            self.stdout.write(salida)
+
+    def _servidor(self, valor):
+        nombre, separador, url = valor.partition('=')
+        if not separador or not url.startswith('http'):
+            raise CommandError(f'Servidor inválido {valor!r}: usa nombre=http://host:puerto')
+        return nombre, url.rstrip('/')
+
+    def _medir(self, url, cookie, peticiones, concurrencia):
+        def pedir(_):
+            solicitud = urllib.request.Request(url, headers={'Cookie': cookie})
+            inicio = time.perf_counter()
+            try:
+                with urllib.request.urlopen(solicitud, timeout=30) as respuesta:
+                    respuesta.read()
+                    # Una redirección al login también acaba en 200
+                    correcta = respuesta.status == 200 and respuesta.url == url
+            except (urllib.error.URLError, OSError):
+                correcta = False
+            return time.perf_counter() - inicio, correcta
+
+        pedir(0)  # calienta caches y conexiones
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrencia) as pool:
+            medidas = list(pool.map(pedir, range(peticiones)))
+        total = time.perf_counter() - inicio
+
+        duraciones = sorted(duracion * 1000 for duracion, _ in medidas)
+        return {
+            'errores': sum(1 for _, correcta in medidas if not correcta),
+            'peticiones_s': round(peticiones / total, 1),
+            'p50_ms': round(percentil(duraciones, 50), 2),
+            'p95_ms': round(percentil(duraciones, 95), 2),
+            'p99_ms': round(percentil(duraciones, 99), 2),
+        }
@@ -0,0 +1,79 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models import Usuario, Fundacion, Mascota, Adopcion
+
+MOTORES = [
+    ('db', 'django.contrib.sessions.backends.db'),
+    ('cached_db', 'django.contrib.sessions.backends.cached_db'),
+    ('signed_cookies', 'django.contrib.sessions.backends.signed_cookies'),
+]
+
+
+class _Deshacer(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = ('Cuenta las consultas SQL por petición de inicio, mis_adopciones y '
+            'factura_adopcion con cada motor de sesiones y con/sin cache de usuario. '
+            'Los datos de prueba se crean en una transacción que se deshace al final.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--peticiones', type=int, default=5,
+                            help='Peticiones por vista (se informa la media tras la primera)')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._medir(options['peticiones'])
+                raise _Deshacer
+        except _Deshacer:
+            pass
+
+    def _medir(self, peticiones):
+        usuario = Usuario.objects.create_user(
+            username='benchmark_sesiones', email='benchmark_sesiones@example.com', password='x',
+        )
+        fundacion = Fundacion.objects.create(
+            nombre='Benchmark', direccion='-', telefono='-', email='benchmark@example.com',
+        )
+        mascota = Mascota.objects.create(
+            nombre='Benchmark', especie='Perro', edad=1, disponible=False, fundacion=fundacion,
+        )
+        adopcion = Adopcion.objects.create(mascota=mascota, usuario=usuario, fundacion=fundacion)
+        urls = {
+            'inicio': reverse('inicio'),
+            'mis_adopciones': reverse('mis_adopciones'),
+            'factura_adopcion': reverse('factura_adopcion', args=[adopcion.pk]),
+        }
+
+        self.stdout.write(f"{'sesión':<16}{'cache usuario':<15}" + ''.join(f'{n:>18}' for n in urls))
+        for nombre, motor in MOTORES:
+            for cache_usuario in (False, True):
+                with override_settings(
+                    SESSION_ENGINE=motor,
+                    USUARIO_CACHE_TIMEOUT=300 if cache_usuario else 0,
+                    ALLOWED_HOSTS=['testserver'],
+                ):
+                    cache.clear()
+                    cliente = Client()
+                    cliente.force_login(usuario, backend='core.backends.EmailBackend')
+                    fila = [self._consultas(cliente, url, peticiones) for url in urls.values()]
+                self.stdout.write(
+                    f"{nombre:<16}{'sí' if cache_usuario else 'no':<15}"
+                    + ''.join(f'{n:>18.1f}' for n in fila)
+                )
+
+    def _consultas(self, cliente, url, peticiones):
+        cliente.get(url)  # calienta caches de fragmentos y de usuario
+        total = 0
+        for _ in range(peticiones):
+            with CaptureQueriesContext(connection) as capturadas:
+                cliente.get(url)
+            total += len(capturadas)
+        return total / peticiones
@@ -0,0 +1,239 @@
+import json
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.cache import cache, caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import contadores, facturas
+from core.models import Usuario, Fundacion, Mascota, Adopcion
+from core.perfilado import percentil
+
+# Consultas SQL máximas por petición. "frio" vacía la cache antes de cada
+# petición; "caliente" la reutiliza (fragmentos, sesión y usuario).
+PRESUPUESTOS = {
+    'inicio': {'frio': 3, 'caliente': 0},
+    'fundacion_detalle': {'frio': 4, 'caliente': 1},
+    # Incluye la página de AdopcionArchivada cuando las recientes no la llenan
+    'mis_adopciones': {'frio': 5, 'caliente': 3},
+    # Incluye la fila de core.estadisticas (1 UPDATE, o 3 si es la primera
+    # del día), la comprobación de adopciones activas archivadas y la
+    # baja en el índice de búsqueda
+    'adoptar_mascota': {'frio': 13, 'caliente': 11},
+    'factura_html': {'frio': 3, 'caliente': 1},
+    'factura_pdf': {'frio': 3, 'caliente': 1},
+    'factura_pdf_render': {'frio': 0, 'caliente': 0},
+}
+
+ESPECIES = ('Perro', 'Gato', 'Conejo', 'Hámster', 'Loro')
+
+
+class Command(BaseCommand):
+    help = ('Mide latencia y consultas SQL de las vistas principales sobre un conjunto '
+            'sintético y comprueba los presupuestos de consultas. Los datos se crean en '
+            'una transacción que se deshace al final y la cache es una en memoria propia; '
+            'la salida es JSON. Solo con DEBUG o con --forzar. Las peticiones van una '
+            'tras otra desde un único cliente (los datos solo existen en esa transacción), '
+            'así que peticiones_s_secuencial no es el rendimiento con carga concurrente: '
+            'para eso, benchmark_servidores contra un servidor arrancado.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fundaciones', type=int, default=20)
+        parser.add_argument('--mascotas', type=int, default=50, help='Mascotas por fundación')
+        parser.add_argument('--usuarios', type=int, default=20)
+        parser.add_argument('--adopciones', type=int, default=10, help='Adopciones por usuario')
+        parser.add_argument('--peticiones', type=int, default=30, help='Peticiones medidas por vista y modo')
+        parser.add_argument('--semilla', type=int, default=0)
+        parser.add_argument('--salida', help='Archivo JSON de resultados (por defecto, stdout)')
+        parser.add_argument('--sin-presupuestos', action='store_true',
+                            help='Informa sin fallar si se supera algún presupuesto')
+        parser.add_argument('--forzar', action='store_true',
+                            help='Ejecutar aunque DEBUG esté desactivado (p. ej. contra una copia '
+                                 'de producción)')
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG and not options['forzar']:
+            # Mientras dura, la transacción retiene el candado de escritura de
+            # SQLite y en PostgreSQL consume valores de las secuencias
+            raise CommandError(
+                'benchmark_vistas siembra datos en la base configurada (y los deshace al '
+                'terminar). Ejecútalo con DEBUG=True o añade --forzar.'
+            )
+        # Cada alias con su propia cache en memoria: vaciarla entre peticiones
+        # no toca la cache real ni la deja con datos del benchmark
+        aisladas = {
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'benchmark-{alias}'}
+            for alias in settings.CACHES
+        }
+        media = tempfile.mkdtemp(prefix='benchmark-media-')
+        try:
+            with override_settings(MEDIA_ROOT=media, ALLOWED_HOSTS=['testserver'], CACHES=aisladas):
+                try:
+                    with transaction.atomic():
+                        resultados = self._ejecutar(options)
+                        transaction.set_rollback(True)
+                finally:
+                    for alias in aisladas:
+                        caches[alias].clear()
+        finally:
+            shutil.rmtree(media, ignore_errors=True)
+
+        salida = json.dumps(resultados, indent=2, sort_keys=True, ensure_ascii=False)
+        if options['salida']:
+            with open(options['salida'], 'w', encoding='utf-8') as destino:
+                destino.write(salida + '\n')
+        else:
+            self.stdout.write(salida)
+
+        excedidos = [
+            f"{vista} ({modo}): {datos['consultas']} consultas > {datos['presupuesto']}"
+            for vista, modos in resultados['vistas'].items()
+            for modo, datos in modos.items()
+            if datos['consultas'] > datos['presupuesto']
+        ]
+        if excedidos and not options['sin_presupuestos']:
+            raise CommandError('Presupuestos de consultas superados:\n  ' + '\n  '.join(excedidos))
+
+    # -------- Datos sintéticos --------
+
+    def _sembrar(self, options):
+        azar = random.Random(options['semilla'])
+        fundaciones = Fundacion.objects.bulk_create(
+            Fundacion(
+                nombre=f'Fundación {i}', direccion=f'Calle {i}', telefono='3000000000',
+                email=f'fundacion{i}@example.com', capacidad=options['mascotas'] * 2,
+                descripcion='Fundación de prueba para el benchmark',
+            )
+            for i in range(options['fundaciones'])
+        )
+        mascotas = Mascota.objects.bulk_create(
+            Mascota(
+                nombre=f'Mascota {fundacion.pk}-{j}', especie=azar.choice(ESPECIES),
+                edad=azar.randint(0, 15), fundacion=fundacion,
+            )
+            for fundacion in fundaciones
+            for j in range(options['mascotas'])
+        )
+        clave = make_password('benchmark')
+        usuarios = Usuario.objects.bulk_create(
+            Usuario(username=f'benchmark{i}', email=f'benchmark{i}@example.com', password=clave)
+            for i in range(options['usuarios'])
+        )
+
+        # Cada usuario adopta mascotas al azar; el resto siguen disponibles
+        azar.shuffle(mascotas)
+        adoptadas = iter(mascotas)
+        adopciones = []
+        for usuario in usuarios:
+            for mascota, _ in zip(adoptadas, range(options['adopciones'])):
+                mascota.disponible = False
+                adopciones.append(Adopcion(mascota=mascota, usuario=usuario, fundacion_id=mascota.fundacion_id))
+        Mascota.objects.bulk_update([a.mascota for a in adopciones], ['disponible'], batch_size=1000)
+        Adopcion.objects.bulk_create(adopciones, batch_size=1000)
+        contadores.recalcular()
+        disponibles = [m for m in mascotas if m.disponible]
+        return fundaciones, usuarios, adopciones, disponibles
+
+    # -------- Medición --------
+
+    def _ejecutar(self, options):
+        inicio = time.perf_counter()
+        fundaciones, usuarios, adopciones, disponibles = self._sembrar(options)
+        siembra = time.perf_counter() - inicio
+
+        usuario = usuarios[0]
+        propias = [a for a in adopciones if a.usuario_id == usuario.pk]
+        if not propias:
+            raise CommandError('El benchmark necesita al menos una adopción por usuario.')
+        facturas.generar_factura(propias[0].pk)
+        factura = Adopcion.objects.select_related('mascota', 'usuario', 'fundacion').get(pk=propias[0].pk)
+
+        peticiones = options['peticiones']
+        if len(disponibles) < 2 * (peticiones + 1):
+            raise CommandError('No quedan suficientes mascotas disponibles para medir adoptar_mascota.')
+        por_adoptar = iter(disponibles)
+
+        urls = {
+            'inicio': lambda: reverse('inicio'),
+            'fundacion_detalle': lambda: reverse('fundacion_detalle', args=[fundaciones[0].pk]),
+            'mis_adopciones': lambda: reverse('mis_adopciones'),
+            'adoptar_mascota': lambda: reverse('adoptar_mascota', args=[next(por_adoptar).pk]),
+            'factura_html': lambda: reverse('factura_adopcion', args=[factura.pk]),
+            'factura_pdf': lambda: reverse('factura_adopcion', args=[factura.pk]) + '?descargar=pdf',
+        }
+
+        cliente = Client()
+        cliente.force_login(usuario, backend='core.backends.EmailBackend')
+        vistas = {}
+        for nombre, url in urls.items():
+            vistas[nombre] = {
+                modo: self._medir(nombre, modo, peticiones, lambda: cliente.get(url()), frio)
+                for modo, frio in (('frio', True), ('caliente', False))
+            }
+
+        # Render del PDF en sí (lo que hace el pool de fondo tras adoptar)
+        vistas['factura_pdf_render'] = {
+            modo: self._medir('factura_pdf_render', modo, max(peticiones // 5, 1),
+                              lambda: facturas.render_to_pdf(facturas.PLANTILLA_PDF, {'adopcion': factura}),
+                              frio)
+            for modo, frio in (('frio', True), ('caliente', False))
+        }
+
+        return {
+            'entorno': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'base_de_datos': connection.vendor,
+                'plataforma': sys.platform,
+            },
+            'escala': {
+                clave: options[clave]
+                for clave in ('fundaciones', 'mascotas', 'usuarios', 'adopciones', 'peticiones', 'semilla')
+            },
+            'siembra_s': round(siembra, 3),
+            'vistas': vistas,
+        }
+
+    def _medir(self, nombre, modo, peticiones, peticion, frio):
+        if not frio:
+            peticion()  # calienta caches
+        duraciones = []
+        consultas = 0
+        for _ in range(peticiones):
+            if frio:
+                cache.clear()
+            with CaptureQueriesContext(connection) as capturadas:
+                inicio = time.perf_counter()
+                respuesta = peticion()
+                if getattr(respuesta, 'streaming', False):
+                    # Leer el archivo completo, como haría el cliente; al
+                    # agotarse el cliente de pruebas cierra la respuesta
+                    b''.join(respuesta.streaming_content)
+                duraciones.append((time.perf_counter() - inicio) * 1000)
+            if getattr(respuesta, 'status_code', 200) >= 400:
+                raise CommandError(f'{nombre} respondió {respuesta.status_code}')
+            consultas = max(consultas, len(capturadas))
+        total = sum(duraciones)
+        duraciones.sort()
+        return {
+            'peticiones': peticiones,
+            'consultas': consultas,
+            'presupuesto': PRESUPUESTOS[nombre][modo],
+            'media_ms': round(total / peticiones, 3),
+            'p50_ms': round(percentil(duraciones, 50), 3),
+            'p95_ms': round(percentil(duraciones, 95), 3),
+            'p99_ms': round(percentil(duraciones, 99), 3),
+            # Un solo cliente: es 1000 / media_ms, no la capacidad del servidor
+            'peticiones_s_secuencial': round(peticiones * 1000 / total, 1) if total else None,
+        }
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import borrado
+from core.models import Fundacion
+
+
+class Command(BaseCommand):
+    help = ('Termina de borrar, por lotes, las fundaciones marcadas como eliminadas (p. ej. si '
+            'el servidor se reinició con el borrado en curso). Con ids, marca antes esas '
+            'fundaciones.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('fundaciones', nargs='*', type=int, help='Ids de fundaciones a marcar y borrar')
+        parser.add_argument('--lote', type=int, help='Filas por transacción (por defecto, BORRADO_LOTE)')
+
+    def handle(self, *args, **options):
+        if options['lote'] is not None and options['lote'] < 1:
+            raise CommandError('--lote debe ser al menos 1')
+        # Las borra este mismo proceso, sin encolarlas en el pool de fondo
+        for fundacion in Fundacion.objects.filter(pk__in=options['fundaciones']):
+            borrado.marcar(fundacion, programar=False)
+
+        pendientes = list(
+            Fundacion.objects.filter(eliminada__isnull=False).order_by('pk').values_list('pk', flat=True)
+        )
+        for fundacion_id in pendientes:
+            for progreso in borrado.borrar(fundacion_id, options['lote']):
+                detalle = ', '.join(f'{n} {nombre}' for nombre, n in progreso.items() if nombre != 'estado')
+                self.stdout.write(f'Fundación {fundacion_id}: {detalle}')
+        self.stdout.write(self.style.SUCCESS(f'{len(pendientes)} fundaciones borradas'))
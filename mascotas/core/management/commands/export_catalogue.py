@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import catalogo
+
+
+class Command(BaseCommand):
+    help = 'Exporta fundaciones o mascotas a CSV o JSONL en streaming.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelo', choices=sorted(catalogo.MODELOS))
+        parser.add_argument('archivo', help='Ruta de salida (.csv o .jsonl)')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'],
+                            help='Por defecto se deduce de la extensión')
+
+    def handle(self, *args, **options):
+        formato = catalogo.formato_de(options['archivo'], options['formato'])
+        inicio = time.perf_counter()
+        with open(options['archivo'], 'w', encoding='utf-8', newline='') as archivo:
+            total = catalogo.exportar(options['modelo'], archivo, formato)
+        duracion = time.perf_counter() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} filas exportadas en {duracion:.2f}s '
+            f'({total / duracion if duracion else 0:.0f} filas/s)'
+        ))
@@ -0,0 +1,47 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import catalogo
+
+
+class Command(BaseCommand):
+    help = 'Importa fundaciones o mascotas desde CSV o JSONL por lotes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('modelo', choices=sorted(catalogo.MODELOS))
+        parser.add_argument('archivo', help='Ruta del CSV (con cabecera) o JSONL')
+        parser.add_argument('--formato', choices=['csv', 'jsonl'],
+                            help='Por defecto se deduce de la extensión')
+        parser.add_argument('--fotos', help='Directorio con las fotos referenciadas en la columna foto')
+        parser.add_argument('--lote', type=int, default=1000, help='Filas por transacción')
+
+    def handle(self, *args, **options):
+        formato = catalogo.formato_de(options['archivo'], options['formato'])
+        importador = catalogo.Importador(
+            options['modelo'], directorio_fotos=options['fotos'], lote=options['lote'],
+        )
+
+        inicio = time.perf_counter()
+        with open(options['archivo'], encoding='utf-8', newline='') as archivo:
+            filas = catalogo.leer_filas(archivo, formato)
+            try:
+                for numero, lote in enumerate(catalogo.lotes(filas, options['lote']), start=1):
+                    importador.importar_lote(lote)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'Lote {numero}: {importador.creadas + importador.actualizadas} filas')
+            except catalogo.ErrorCatalogo as error:
+                # Los lotes anteriores ya están confirmados: se dejan coherentes
+                importador.finalizar()
+                raise CommandError(
+                    f'{error}. Se importaron {importador.creadas + importador.actualizadas} '
+                    f'filas antes del error.'
+                )
+        importador.finalizar()
+        duracion = time.perf_counter() - inicio
+
+        total = importador.creadas + importador.actualizadas
+        self.stdout.write(self.style.SUCCESS(
+            f'{importador.creadas} creadas, {importador.actualizadas} actualizadas '
+            f'en {duracion:.2f}s ({total / duracion if duracion else 0:.0f} filas/s)'
+        ))
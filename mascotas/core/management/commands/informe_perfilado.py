@@ -0,0 +1,38 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core import perfilado
+
+
+class Command(BaseCommand):
+    help = 'Resume por vista (p50/p95/p99) las muestras guardadas en PERFILADO_ARCHIVO.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('archivo', nargs='?', help='Por defecto, PERFILADO_ARCHIVO')
+        parser.add_argument('--json', action='store_true', help='Salida JSON en lugar de tabla')
+
+    def handle(self, *args, **options):
+        ruta = options['archivo'] or getattr(settings, 'PERFILADO_ARCHIVO', None)
+        if not ruta:
+            raise CommandError('Indica un archivo o configura PERFILADO_ARCHIVO.')
+        try:
+            informe = perfilado.resumir(*perfilado.leer_archivo(ruta))
+        except FileNotFoundError:
+            raise CommandError(f'No existe {ruta}')
+
+        if options['json']:
+            self.stdout.write(json.dumps(informe, indent=2, ensure_ascii=False))
+            return
+
+        for vista, datos in informe.items():
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{vista} ({datos['peticiones']} peticiones)"))
+            for metrica in perfilado.METRICAS:
+                valores = ' / '.join(str(valor) for valor in datos[metrica].values())
+                self.stdout.write(f'  {metrica:<14} {valores}')
+            repetida = datos['consulta_mas_repetida']
+            if repetida:
+                self.stdout.write(self.style.WARNING(
+                    f"  consulta repetida x{repetida['veces']}: {repetida['sql'][:200]}"
+                ))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import arranque
+
+
+class Command(BaseCommand):
+    help = ('Compila todas las plantillas de las apps indicadas (por defecto, core) y '
+            'falla si alguna tiene errores de sintaxis. En el servidor el mismo paso lo '
+            'hace cada worker al arrancar con PRECARGAR_PLANTILLAS=1.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('apps', nargs='*', default=['core'], help='Etiquetas de las apps')
+
+    def handle(self, *args, **options):
+        tiempos, errores = arranque.precargar_plantillas(options['apps'])
+        if options['verbosity'] > 1:
+            for nombre, ms in sorted(tiempos.items(), key=lambda par: -par[1]):
+                self.stdout.write(f'{ms:9.3f} ms  {nombre}')
+        if errores:
+            raise CommandError('Plantillas con errores:\n  ' + '\n  '.join(
+                f'{nombre}: {error}' for nombre, error in sorted(errores.items())
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(tiempos)} plantillas compiladas en {sum(tiempos.values()):.1f} ms'
+        ))
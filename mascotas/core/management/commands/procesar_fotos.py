@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from core import imagenes
+from core.models import Mascota
+
+
+class Command(BaseCommand):
+    help = ('Normaliza las fotos existentes al nombre por hash (deduplicando copias) '
+            'y genera sus variantes responsivas.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--todas', action='store_true',
+                            help='Regenera también las fotos que ya tienen variantes')
+
+    def handle(self, *args, **options):
+        procesadas = deduplicadas = 0
+        mascotas = Mascota.objects.exclude(foto='').exclude(foto__isnull=True).only('foto', 'foto_variantes')
+        for mascota in mascotas.iterator(chunk_size=200):
+            storage = mascota.foto.storage
+            if not storage.exists(mascota.foto.name):
+                self.stderr.write(f'Falta el archivo {mascota.foto.name} (mascota {mascota.pk})')
+                continue
+
+            with mascota.foto.open('rb') as archivo:
+                canonico = storage.save(mascota.foto.name, archivo)
+            if canonico != mascota.foto.name:
+                Mascota.objects.filter(pk=mascota.pk).update(foto=canonico)
+                mascota.foto.name = canonico
+                deduplicadas += 1
+
+            if options['todas'] or imagenes.variantes_pendientes(mascota):
+                imagenes.generar_variantes(mascota.pk)
+            procesadas += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{procesadas} fotos procesadas, {deduplicadas} renombradas a su hash'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import contadores
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los contadores de mascotas de cada fundación y corrige las desviaciones.'
+
+    def handle(self, *args, **options):
+        corregidas = contadores.recalcular()
+        self.stdout.write(self.style.SUCCESS(f'{corregidas} fundaciones corregidas'))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import busqueda
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda de mascotas y fundaciones.'
+
+    def handle(self, *args, **options):
+        total = busqueda.reindexar()
+        self.stdout.write(self.style.SUCCESS(f'{total} documentos indexados'))
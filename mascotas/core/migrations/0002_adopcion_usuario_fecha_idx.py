@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adopcion',
+            index=models.Index(fields=['usuario', 'fecha_adopcion'], name='adopcion_usuario_fecha_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_adopcion_usuario_fecha_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adopcion',
+            name='activa',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.AddConstraint(
+            model_name='adopcion',
+            constraint=models.UniqueConstraint(condition=models.Q(('activa', True)), fields=('mascota',), name='adopcion_activa_unica'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0003_adopcion_activa_unica'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='adopcion',
+            name='factura_pdf',
+            field=models.FileField(blank=True, editable=False, upload_to='facturas/'),
+        ),
+    ]
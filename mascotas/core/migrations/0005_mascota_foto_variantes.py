@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:43
+
+import core.almacenamiento
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_adopcion_factura_pdf'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mascota',
+            name='foto_hash',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='mascota',
+            name='foto_variantes',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='mascota',
+            name='foto',
+            field=models.ImageField(blank=True, null=True, storage=core.almacenamiento.AlmacenamientoDeduplicado(), upload_to='mascotas/'),
+        ),
+    ]
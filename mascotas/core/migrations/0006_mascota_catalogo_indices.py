@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0005_mascota_foto_variantes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['fundacion', 'disponible'], name='mascota_fundacion_disp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['especie', 'disponible'], name='mascota_especie_disp_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:45
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def calcular_contadores(apps, schema_editor):
+    Fundacion = apps.get_model('core', 'Fundacion')
+    fundaciones = Fundacion.objects.annotate(
+        _total=Count('mascota'),
+        _disponibles=Count('mascota', filter=Q(mascota__disponible=True)),
+    )
+    for fundacion in fundaciones:
+        Fundacion.objects.filter(pk=fundacion.pk).update(
+            total_mascotas=fundacion._total,
+            mascotas_disponibles=fundacion._disponibles,
+            mascotas_adoptadas=fundacion._total - fundacion._disponibles,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_mascota_catalogo_indices'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundacion',
+            name='mascotas_adoptadas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='fundacion',
+            name='mascotas_disponibles',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='fundacion',
+            name='total_mascotas',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(calcular_contadores, migrations.RunPython.noop),
+    ]
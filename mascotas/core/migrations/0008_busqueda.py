@@ -0,0 +1,71 @@
+from django.db import migrations
+
+
+SQLITE_CREAR = [
+    "CREATE VIRTUAL TABLE core_busqueda USING fts5("
+    "tipo UNINDEXED, objeto_id UNINDEXED, fundacion_id UNINDEXED, titulo, cuerpo, "
+    "tokenize = 'unicode61 remove_diacritics 2')",
+]
+
+POSTGRES_CREAR = [
+    "CREATE TABLE core_busqueda ("
+    "tipo varchar(20) NOT NULL, objeto_id bigint NOT NULL, fundacion_id bigint NOT NULL, "
+    "titulo text NOT NULL, cuerpo text NOT NULL, documento tsvector NOT NULL, "
+    "PRIMARY KEY (tipo, objeto_id))",
+    "CREATE INDEX core_busqueda_documento_idx ON core_busqueda USING GIN (documento)",
+]
+
+
+def crear_indice(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        sentencias = SQLITE_CREAR
+    elif vendor == 'postgresql':
+        sentencias = POSTGRES_CREAR
+    else:
+        return
+    for sentencia in sentencias:
+        schema_editor.execute(sentencia)
+
+    # Indexa los datos existentes con los modelos históricos
+    Fundacion = apps.get_model('core', 'Fundacion')
+    Mascota = apps.get_model('core', 'Mascota')
+    filas = [
+        ('fundacion', f.pk, f.pk, f.nombre, ' '.join(filter(None, [f.descripcion, f.direccion])))
+        for f in Fundacion.objects.all()
+    ] + [
+        ('mascota', m.pk, m.fundacion_id, m.nombre, m.especie)
+        for m in Mascota.objects.all()
+    ]
+    with schema_editor.connection.cursor() as cursor:
+        for fila in filas:
+            if vendor == 'postgresql':
+                cursor.execute(
+                    "INSERT INTO core_busqueda VALUES (%s, %s, %s, %s, %s, "
+                    "setweight(to_tsvector('spanish', %s), 'A') || setweight(to_tsvector('spanish', %s), 'D'))",
+                    [*fila, fila[3], fila[4]],
+                )
+            else:
+                # Mismo rowid que core.busqueda.rowid()
+                rowid = fila[1] * 2 + (1 if fila[0] == 'mascota' else 0)
+                cursor.execute(
+                    "INSERT INTO core_busqueda (rowid, tipo, objeto_id, fundacion_id, titulo, cuerpo) "
+                    "VALUES (%s, %s, %s, %s, %s, %s)",
+                    [rowid, *fila],
+                )
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute('DROP TABLE IF EXISTS core_busqueda')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_fundacion_contadores'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-18 06:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_busqueda'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='adopcion',
+            index=models.Index(fields=['fecha_adopcion', 'id'], name='adopcion_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='adopcion',
+            index=models.Index(fields=['fundacion', 'fecha_adopcion'], name='adopcion_fundacion_fecha_idx'),
+        ),
+    ]
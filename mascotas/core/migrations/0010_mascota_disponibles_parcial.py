@@ -0,0 +1,29 @@
+from django.db import migrations, models
+
+INDICE = models.Index(
+    fields=['fundacion', 'id'],
+    condition=models.Q(disponible=True),
+    name='mascota_disponibles_pg_idx',
+)
+
+
+def crear_indice(apps, schema_editor):
+    # Solo en PostgreSQL: en SQLite ya cubre el caso mascota_fundacion_disp_idx
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.add_index(apps.get_model('core', 'Mascota'), INDICE)
+
+
+def eliminar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.remove_index(apps.get_model('core', 'Mascota'), INDICE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_adopcion_indices_admin'),
+    ]
+
+    operations = [
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
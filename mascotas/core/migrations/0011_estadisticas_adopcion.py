@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_mascota_disponibles_parcial'),
+    ]
+
+    operations = [
+        # Primero sin auto_now_add: si no, las mascotas existentes recibirían
+        # la fecha de hoy como ingreso en lugar de quedar sin fecha
+        migrations.AddField(
+            model_name='mascota',
+            name='fecha_ingreso',
+            field=models.DateField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='mascota',
+            name='fecha_ingreso',
+            field=models.DateField(auto_now_add=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='EstadisticaAdopcion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('especie', models.CharField(max_length=50)),
+                ('dia', models.DateField()),
+                ('adopciones', models.PositiveIntegerField(default=0)),
+                ('suma_edades', models.PositiveIntegerField(default=0)),
+                ('con_fecha_ingreso', models.PositiveIntegerField(default=0)),
+                ('suma_dias_espera', models.PositiveIntegerField(default=0)),
+                ('fundacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.fundacion')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['dia'], name='estadistica_dia_idx')],
+                'constraints': [models.UniqueConstraint(fields=('fundacion', 'especie', 'dia'), name='estadistica_adopcion_unica')],
+            },
+        ),
+    ]
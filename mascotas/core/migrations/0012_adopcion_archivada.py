@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:24
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_estadisticas_adopcion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdopcionArchivada',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('fecha_adopcion', models.DateField()),
+                ('activa', models.BooleanField(default=True)),
+                ('factura_pdf', models.FileField(blank=True, editable=False, upload_to='facturas/')),
+                ('archivada', models.DateTimeField(auto_now_add=True)),
+                ('fundacion', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.fundacion')),
+                ('mascota', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='core.mascota')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['usuario', 'fecha_adopcion'], name='archivada_usuario_fecha_idx'), models.Index(fields=['fundacion', 'fecha_adopcion'], name='archivada_fundacion_fecha_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_adopcion_archivada'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fundacion',
+            name='eliminada',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
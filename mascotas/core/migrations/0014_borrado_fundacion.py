@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_fundacion_eliminada'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BorradoFundacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fundacion_id', models.BigIntegerField(unique=True)),
+                ('nombre', models.CharField(max_length=100)),
+                ('estado', models.CharField(default='pendiente', max_length=20)),
+                ('progreso', models.JSONField(default=dict)),
+                ('iniciado', models.DateTimeField(auto_now_add=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_borrado_fundacion'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='mascota',
+            name='mascota_fundacion_disp_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='mascota',
+            name='mascota_especie_disp_idx',
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['-disponible', 'id'], name='mascota_catalogo_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['fundacion', '-disponible', 'id'], name='mascota_fundacion_disp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mascota',
+            index=models.Index(fields=['especie', '-disponible', 'id'], name='mascota_especie_disp_idx'),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+def quitar_adoptadas(apps, schema_editor):
+    # La búsqueda solo lista mascotas disponibles (core.busqueda.indexable)
+    vendor = schema_editor.connection.vendor
+    if vendor not in ('sqlite', 'postgresql'):
+        return
+    Mascota = apps.get_model('core', 'Mascota')
+    ids = list(Mascota.objects.filter(disponible=False).values_list('pk', flat=True))
+    with schema_editor.connection.cursor() as cursor:
+        if vendor == 'postgresql':
+            cursor.executemany(
+                "DELETE FROM core_busqueda WHERE tipo = 'mascota' AND objeto_id = %s", [[pk] for pk in ids],
+            )
+        else:
+            # Mismo rowid que core.busqueda.rowid()
+            cursor.executemany('DELETE FROM core_busqueda WHERE rowid = %s', [[pk * 2 + 1] for pk in ids])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_mascota_orden_catalogo'),
+    ]
+
+    operations = [
+        # Al deshacerla basta con reindexar_busqueda si se quieren de vuelta
+        migrations.RunPython(quitar_adoptadas, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import AbstractUser, User
 from django.conf import settings 
 
+from .almacenamiento import AlmacenamientoDeduplicado
+
 class Usuario(AbstractUser):
     email = models.EmailField(unique=True)
 
@@ -12,6 +14,22 @@ class Usuario(AbstractUser):
     def __str__(self):
         return self.username
 
+    def get_session_auth_hash(self):
+        # Los usuarios servidos desde cache (core.backends) traen el hash de
+        # sesión ya calculado y no cargan la contraseña
+        hash_sesion = self.__dict__.get('_hash_sesion')
+        return hash_sesion if hash_sesion is not None else super().get_session_auth_hash()
+
+    def set_password(self, raw_password):
+        self.__dict__.pop('_hash_sesion', None)
+        super().set_password(raw_password)
+
+
+class FundacionQuerySet(models.QuerySet):
+    def activas(self):
+        """Excluye las fundaciones marcadas para borrar (core.borrado)."""
+        return self.filter(eliminada__isnull=True)
+
 
 class Fundacion(models.Model):
     nombre = models.CharField(max_length=100)
@@ -21,27 +39,190 @@ class Fundacion(models.Model):
     descripcion = models.TextField(blank=True, null=True)
     capacidad = models.IntegerField(default=0)
 
+    # Contadores desnormalizados, mantenidos por core.contadores
+    total_mascotas = models.PositiveIntegerField(default=0, editable=False)
+    mascotas_disponibles = models.PositiveIntegerField(default=0, editable=False)
+    mascotas_adoptadas = models.PositiveIntegerField(default=0, editable=False)
+    # Marca de borrado: la fundación deja de mostrarse al instante y sus
+    # mascotas y adopciones se borran por lotes en segundo plano
+    eliminada = models.DateTimeField(null=True, blank=True, editable=False)
+
+    objects = FundacionQuerySet.as_manager()
+
+    CAMPOS_CONTADORES = ('total_mascotas', 'mascotas_disponibles', 'mascotas_adoptadas')
+
     def __str__(self):
         return self.nombre
 
+    def save(self, *args, **kwargs):
+        # Los contadores y la marca de borrado solo cambian con UPDATE
+        # atómicos (core.contadores, core.borrado); editar la fundación no
+        # debe pisarlos con los valores en memoria.
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.name for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CONTADORES + ('eliminada',)
+            ]
+        super().save(*args, **kwargs)
+
+    @property
+    def cupo_disponible(self):
+        """Plazas libres: capacidad menos los animales que siguen en la fundación."""
+        return max(self.capacidad - self.mascotas_disponibles, 0)
+
+
+class MascotaQuerySet(models.QuerySet):
+    def filtrar(self, especie=None, edad_min=None, edad_max=None, disponible=None):
+        """Aplica los filtros del catálogo; los valores ``None`` se ignoran."""
+        mascotas = self
+        if especie:
+            mascotas = mascotas.filter(especie=especie)
+        if edad_min is not None:
+            mascotas = mascotas.filter(edad__gte=edad_min)
+        if edad_max is not None:
+            mascotas = mascotas.filter(edad__lte=edad_max)
+        if disponible is not None:
+            mascotas = mascotas.filter(disponible=disponible)
+        return mascotas
+
+    def activas(self):
+        """Excluye las mascotas de fundaciones marcadas para borrar."""
+        return self.filter(fundacion__eliminada__isnull=True)
+
 
 class Mascota(models.Model):
     nombre = models.CharField(max_length=100)
     especie = models.CharField(max_length=50)
     edad = models.IntegerField()
-    foto = models.ImageField(upload_to='mascotas/', blank=True, null=True)
+    foto = models.ImageField(upload_to='mascotas/', storage=AlmacenamientoDeduplicado(), blank=True, null=True)
+    # Rellenados por core.imagenes en segundo plano
+    foto_hash = models.CharField(max_length=64, blank=True, editable=False, db_index=True)
+    foto_variantes = models.JSONField(default=dict, blank=True, editable=False)
     disponible = models.BooleanField(default=True)
     fundacion = models.ForeignKey(Fundacion, on_delete=models.CASCADE)
+    # Para el tiempo hasta la adopción; vacío en las mascotas anteriores a este campo
+    fecha_ingreso = models.DateField(auto_now_add=True, null=True)
+
+    objects = MascotaQuerySet.as_manager()
+
+    class Meta:
+        # Con el orden del catálogo (-disponible, id) al final: las páginas se
+        # leen del índice en orden, sin ordenar aparte
+        indexes = [
+            models.Index(fields=['-disponible', 'id'], name='mascota_catalogo_idx'),
+            models.Index(fields=['fundacion', '-disponible', 'id'], name='mascota_fundacion_disp_idx'),
+            models.Index(fields=['especie', '-disponible', 'id'], name='mascota_especie_disp_idx'),
+        ]
 
     def __str__(self):
         return self.nombre
 
 
+class AdopcionQuerySet(models.QuerySet):
+    def historial_de(self, usuario):
+        """Adopciones de un usuario con la mascota y la fundación ya unidas."""
+        return (
+            self.filter(usuario=usuario)
+            .select_related('mascota', 'fundacion')
+            .order_by('-fecha_adopcion', '-id')
+        )
+
+
 class Adopcion(models.Model):
     mascota = models.ForeignKey('Mascota', on_delete=models.CASCADE)
     usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)  # <-- cambia aquí
     fundacion = models.ForeignKey('Fundacion', on_delete=models.CASCADE)
     fecha_adopcion = models.DateField(auto_now_add=True)
+    activa = models.BooleanField(default=True)
+    factura_pdf = models.FileField(upload_to='facturas/', blank=True, editable=False)
+
+    objects = AdopcionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_adopcion'], name='adopcion_usuario_fecha_idx'),
+            # Listado del admin: jerarquía de fechas y filtro por fundación
+            models.Index(fields=['fecha_adopcion', 'id'], name='adopcion_fecha_idx'),
+            models.Index(fields=['fundacion', 'fecha_adopcion'], name='adopcion_fundacion_fecha_idx'),
+        ]
+        constraints = [
+            # Una mascota solo puede tener una adopción activa a la vez
+            models.UniqueConstraint(
+                fields=['mascota'],
+                condition=models.Q(activa=True),
+                name='adopcion_activa_unica',
+            ),
+        ]
 
     def __str__(self):
         return f"{self.usuario.username} adoptó {self.mascota.nombre}"
+
+
+class AdopcionArchivada(models.Model):
+    """Adopción antigua movida fuera de Adopcion (core.historial).
+
+    Conserva el id original, así que las URLs de factura siguen valiendo.
+    """
+
+    id = models.BigIntegerField(primary_key=True)
+    mascota = models.ForeignKey('Mascota', on_delete=models.CASCADE)
+    usuario = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    fundacion = models.ForeignKey('Fundacion', on_delete=models.CASCADE)
+    fecha_adopcion = models.DateField()
+    activa = models.BooleanField(default=True)
+    factura_pdf = models.FileField(upload_to='facturas/', blank=True, editable=False)
+    archivada = models.DateTimeField(auto_now_add=True)
+
+    objects = AdopcionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['usuario', 'fecha_adopcion'], name='archivada_usuario_fecha_idx'),
+            models.Index(fields=['fundacion', 'fecha_adopcion'], name='archivada_fundacion_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.usuario.username} adoptó {self.mascota.nombre}"
+
+
+class EstadisticaAdopcion(models.Model):
+    """Adopciones agregadas por fundación, especie y día (core.estadisticas)."""
+
+    fundacion = models.ForeignKey(Fundacion, on_delete=models.CASCADE)
+    especie = models.CharField(max_length=50)
+    dia = models.DateField()
+    adopciones = models.PositiveIntegerField(default=0)
+    # Sumas (no medias) para poder acumular y agregar periodos sin perder precisión
+    suma_edades = models.PositiveIntegerField(default=0)
+    con_fecha_ingreso = models.PositiveIntegerField(default=0)
+    suma_dias_espera = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['fundacion', 'especie', 'dia'], name='estadistica_adopcion_unica'),
+        ]
+        indexes = [
+            models.Index(fields=['dia'], name='estadistica_dia_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.fundacion_id} · {self.especie} · {self.dia}: {self.adopciones}"
+
+
+class BorradoFundacion(models.Model):
+    """Progreso del borrado por lotes de una fundación (core.borrado).
+
+    No tiene clave foránea: sobrevive a la fundación para poder consultar
+    cómo terminó desde cualquier worker.
+    """
+
+    fundacion_id = models.BigIntegerField(unique=True)
+    nombre = models.CharField(max_length=100)
+    estado = models.CharField(max_length=20, default='pendiente')
+    # Filas borradas por tipo: adopciones, archivadas, mascotas, estadisticas
+    progreso = models.JSONField(default=dict)
+    iniciado = models.DateTimeField(auto_now_add=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Borrado de {self.nombre} ({self.estado})"
@@ -0,0 +1,164 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class PaginaCursor:
+    """Página de resultados obtenida con paginación por cursor (keyset)."""
+
+    def __init__(self, items, siguiente=None):
+        self.items = items
+        self.siguiente = siguiente
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+    @property
+    def tiene_siguiente(self):
+        return self.siguiente is not None
+
+
+def _codificar(valores):
+    crudo = json.dumps(valores, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(crudo).decode().rstrip('=')
+
+
+def _decodificar(cursor):
+    relleno = '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(cursor + relleno))
+
+
+def _campo(modelo, nombre):
+    nombre = nombre.lstrip('-')
+    if nombre == 'pk':
+        return modelo._meta.pk
+    return modelo._meta.get_field(nombre)
+
+
+def _filtro_despues_de(modelo, orden, valores):
+    """Construye el Q que selecciona las filas posteriores a ``valores``.
+
+    Para un orden (a, b, c) equivale a
+    ``a > va OR (a = va AND b > vb) OR (a = va AND b = vb AND c > vc)``,
+    invirtiendo el operador en los campos descendentes.
+    """
+    filtro = Q()
+    iguales = Q()
+    for nombre, valor in zip(orden, valores):
+        campo = nombre.lstrip('-')
+        operador = 'lt' if nombre.startswith('-') else 'gt'
+        filtro |= iguales & Q(**{f'{campo}__{operador}': valor})
+        iguales &= Q(**{campo: valor})
+    return filtro
+
+
+def _valores_cursor(modelo, orden, cursor):
+    """Valores del cursor convertidos a cada campo, o ``None`` si no es válido.
+
+    Un cursor inválido (manipulado, de otro orden, con nulos) equivale a
+    pedir la primera página.
+    """
+    try:
+        crudos = _decodificar(cursor)
+        if not isinstance(crudos, list) or len(crudos) != len(orden):
+            return None
+        valores = [
+            _campo(modelo, nombre).to_python(valor)
+            for nombre, valor in zip(orden, crudos)
+        ]
+    except (ValueError, TypeError, ValidationError):
+        return None
+    if any(valor is None for valor in valores):
+        return None
+    return valores
+
+
+def cursor_normalizado(modelo, cursor, orden=('-pk',)):
+    """``cursor`` si es válido para ``orden``; cadena vacía si no lo es."""
+    if cursor and _valores_cursor(modelo, tuple(orden), cursor) is not None:
+        return cursor
+    return ''
+
+
+def _consulta_pagina(queryset, cursor, orden, tamano):
+    modelo = queryset.model
+    queryset = queryset.order_by(*orden)
+
+    valores = _valores_cursor(modelo, orden, cursor) if cursor else None
+    if valores is not None:
+        queryset = queryset.filter(_filtro_despues_de(modelo, orden, valores))
+
+    return queryset[:tamano + 1]
+
+
+def _valor_cursor(campo, fila):
+    # Las filas de ``values()`` son diccionarios en lugar de instancias
+    if isinstance(fila, dict):
+        return str(fila[campo.attname] if campo.attname in fila else fila[campo.name])
+    return campo.value_to_string(fila)
+
+
+def _pagina(modelo, orden, items, tamano):
+    siguiente = None
+    if len(items) > tamano:
+        items = items[:tamano]
+        ultimo = items[-1]
+        siguiente = _codificar([
+            _valor_cursor(_campo(modelo, nombre), ultimo)
+            for nombre in orden
+        ])
+    return PaginaCursor(items, siguiente)
+
+
+def paginar_por_cursor(queryset, cursor=None, orden=('-pk',), tamano=20):
+    """Devuelve una ``PaginaCursor`` de ``queryset`` a partir de ``cursor``.
+
+    ``orden`` debe terminar en un campo único (normalmente ``pk``) para que el
+    cursor sea estable. El coste de cada página es constante: se aplica un
+    filtro sobre el índice en lugar de un OFFSET creciente.
+    """
+    orden = tuple(orden)
+    items = list(_consulta_pagina(queryset, cursor, orden, tamano))
+    return _pagina(queryset.model, orden, items, tamano)
+
+
+async def apaginar_por_cursor(queryset, cursor=None, orden=('-pk',), tamano=20):
+    """Versión asíncrona de ``paginar_por_cursor``."""
+    orden = tuple(orden)
+    items = [item async for item in _consulta_pagina(queryset, cursor, orden, tamano)]
+    return _pagina(queryset.model, orden, items, tamano)
+
+
+def paginar_encadenado(querysets, cursor=None, orden=('-pk',), tamano=20):
+    """Pagina varios querysets seguidos como si fueran uno solo.
+
+    Cada queryset debe ir entero, según ``orden``, antes que el siguiente
+    (p. ej. adopciones recientes y archivadas). El siguiente solo se consulta
+    cuando el anterior no llena la página, con el mismo cursor.
+    """
+    orden = tuple(orden)
+    items = []
+    for queryset in querysets:
+        items += _consulta_pagina(queryset, cursor, orden, tamano - len(items))
+        if len(items) > tamano:
+            break
+    return _pagina(querysets[0].model, orden, items, tamano)
+
+
+async def apaginar_encadenado(querysets, cursor=None, orden=('-pk',), tamano=20):
+    """Versión asíncrona de ``paginar_encadenado``."""
+    orden = tuple(orden)
+    items = []
+    for queryset in querysets:
+        items += [item async for item in _consulta_pagina(queryset, cursor, orden, tamano - len(items))]
+        if len(items) > tamano:
+            break
+    return _pagina(querysets[0].model, orden, items, tamano)
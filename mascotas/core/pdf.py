@@ -0,0 +1,22 @@
+import io
+
+# Conversión HTML -> PDF sin nada de Django: es lo que ejecutan los procesos
+# hijos de la exportación (core.exportacion). Con spawn o forkserver cada
+# hijo importa solo este módulo, sin configurar Django ni cargar modelos.
+
+
+class ErrorPDF(Exception):
+    """xhtml2pdf no pudo generar el documento."""
+
+
+def html_a_pdf(html):
+    """Convierte HTML a PDF con xhtml2pdf y devuelve los bytes."""
+    # Importación perezosa: xhtml2pdf arrastra reportlab, pyhanko y aiohttp
+    # (~0,5 s); solo la paga el primer PDF, no el arranque de cada worker
+    from xhtml2pdf import pisa
+
+    destino = io.BytesIO()
+    pisa_status = pisa.CreatePDF(html, dest=destino)
+    if pisa_status.err:
+        raise ErrorPDF('Error al generar PDF')
+    return destino.getvalue()
@@ -0,0 +1,201 @@
+import contextvars
+import json
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+# Métricas que se guardan por petición, en el orden del informe
+METRICAS = ('total_ms', 'db_ms', 'consultas', 'duplicadas', 'plantillas_ms', 'pdf_ms')
+PERCENTILES = (50, 95, 99)
+
+_medicion = contextvars.ContextVar('perfilado_medicion', default=None)
+_muestras = defaultdict(deque)
+_repetidas = {}
+_candado = threading.Lock()
+
+
+class Medicion:
+    """Lo que cuesta una petición: consultas SQL y tiempos por fase."""
+
+    def __init__(self):
+        self.consultas = Counter()
+        self.db = 0.0
+        self.fases = defaultdict(float)
+
+    def ejecutar(self, execute, sql, params, many, context):
+        # Envoltorio de connection.execute_wrapper: cuenta y cronometra cada consulta
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - inicio
+            self.consultas[sql] += 1
+
+    def duplicadas(self):
+        """Consultas que repiten la misma SQL (con otros parámetros): el patrón N+1."""
+        return sum(veces - 1 for veces in self.consultas.values())
+
+    def mas_repetida(self):
+        sql, veces = self.consultas.most_common(1)[0] if self.consultas else ('', 0)
+        return (sql, veces) if veces > 1 else None
+
+
+@contextmanager
+def medir(fase):
+    """Suma el tiempo del bloque a ``fase`` (``plantillas`` o ``pdf``).
+
+    Dentro de una petición perfilada se acumula en su medición. Fuera de
+    ella (p. ej. las facturas del pool de fondo) se registra como una
+    muestra propia bajo ``fondo:<fase>``, si el perfilado está activo.
+    """
+    medicion = _medicion.get()
+    if medicion is None and not getattr(settings, 'PERFILADO_ACTIVO', False):
+        yield
+        return
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        duracion = time.perf_counter() - inicio
+        if medicion is not None:
+            medicion.fases[fase] += duracion
+        else:
+            muestra = dict.fromkeys(METRICAS, 0)
+            muestra['total_ms'] = muestra[f'{fase}_ms'] = round(duracion * 1000, 3)
+            registrar(f'fondo:{fase}', muestra)
+
+
+def _instrumentar_plantillas():
+    """Cronometra los render de plantillas de primer nivel (no los include)."""
+    from django.template.backends.django import Template
+
+    if getattr(Template.render, 'perfilado', False):
+        return
+    original = Template.render
+
+    def render(self, *args, **kwargs):
+        with medir('plantillas'):
+            return original(self, *args, **kwargs)
+
+    render.perfilado = True
+    Template.render = render
+
+
+# -------- Agregación --------
+
+def registrar(vista, muestra):
+    limite = getattr(settings, 'PERFILADO_MUESTRAS', 1000)
+    repetida = muestra.pop('repetida', None)
+    with _candado:
+        muestras = _muestras[vista]
+        muestras.append(muestra)
+        while len(muestras) > limite:
+            muestras.popleft()
+        if repetida and repetida[1] > _repetidas.get(vista, ('', 0))[1]:
+            _repetidas[vista] = repetida
+    archivo = getattr(settings, 'PERFILADO_ARCHIVO', None)
+    if archivo:
+        with _candado, open(archivo, 'a', encoding='utf-8') as destino:
+            destino.write(json.dumps({'vista': vista, **muestra, 'repetida': repetida}) + '\n')
+
+
+def reiniciar():
+    with _candado:
+        _muestras.clear()
+        _repetidas.clear()
+
+
+def percentil(valores_ordenados, p):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not valores_ordenados:
+        return None
+    indice = max(0, -(-p * len(valores_ordenados) // 100) - 1)
+    return valores_ordenados[indice]
+
+
+def resumir(muestras_por_vista, repetidas=None):
+    """Calcula p50/p95/p99 de cada métrica por nombre de URL."""
+    informe = {}
+    for vista, muestras in sorted(muestras_por_vista.items()):
+        datos = {'peticiones': len(muestras)}
+        for metrica in METRICAS:
+            valores = sorted(muestra[metrica] for muestra in muestras)
+            datos[metrica] = {f'p{p}': percentil(valores, p) for p in PERCENTILES}
+        repetida = (repetidas or {}).get(vista)
+        datos['consulta_mas_repetida'] = (
+            {'sql': repetida[0], 'veces': repetida[1]} if repetida else None
+        )
+        informe[vista] = datos
+    return informe
+
+
+def informe():
+    """Resumen de las peticiones perfiladas en este proceso."""
+    with _candado:
+        muestras = {vista: list(valores) for vista, valores in _muestras.items()}
+        repetidas = dict(_repetidas)
+    return resumir(muestras, repetidas)
+
+
+def leer_archivo(ruta):
+    """Carga las muestras escritas en ``PERFILADO_ARCHIVO`` por cualquier proceso."""
+    muestras = defaultdict(list)
+    repetidas = {}
+    with open(ruta, encoding='utf-8') as origen:
+        for linea in origen:
+            if not linea.strip():
+                continue
+            muestra = json.loads(linea)
+            vista = muestra.pop('vista')
+            repetida = muestra.pop('repetida', None)
+            muestras[vista].append(muestra)
+            if repetida and repetida[1] > repetidas.get(vista, ('', 0))[1]:
+                repetidas[vista] = tuple(repetida)
+    return muestras, repetidas
+
+
+# -------- Middleware --------
+
+class PerfiladoMiddleware:
+    """Mide consultas y tiempos de cada petición y los agrupa por nombre de URL.
+
+    Solo se carga con ``PERFILADO_ACTIVO = True``; si no, Django lo descarta
+    al arrancar y no cuesta nada.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFILADO_ACTIVO', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        _instrumentar_plantillas()
+
+    def __call__(self, request):
+        medicion = Medicion()
+        token = _medicion.set(medicion)
+        inicio = time.perf_counter()
+        try:
+            with ExitStack() as pila:
+                for conexion in connections.all():
+                    pila.enter_context(conexion.execute_wrapper(medicion.ejecutar))
+                response = self.get_response(request)
+        finally:
+            _medicion.reset(token)
+        total = time.perf_counter() - inicio
+
+        coincidencia = getattr(request, 'resolver_match', None)
+        vista = (coincidencia.view_name if coincidencia else None) or 'sin_nombre'
+        registrar(vista, {
+            'total_ms': round(total * 1000, 3),
+            'db_ms': round(medicion.db * 1000, 3),
+            'consultas': sum(medicion.consultas.values()),
+            'duplicadas': medicion.duplicadas(),
+            'plantillas_ms': round(medicion.fases['plantillas'] * 1000, 3),
+            'pdf_ms': round(medicion.fases['pdf'] * 1000, 3),
+            'repetida': medicion.mas_repetida(),
+        })
+        return response
@@ -0,0 +1,58 @@
+from django.db import IntegrityError, transaction
+
+from . import busqueda, contadores, fragmentos
+from .models import Mascota, Adopcion, AdopcionArchivada
+
+
+class MascotaYaAdoptada(Exception):
+    """La mascota ya no está disponible para adopción."""
+
+    def __init__(self, mascota):
+        self.mascota = mascota
+        super().__init__(f"La mascota {mascota.nombre} ya fue adoptada.")
+
+
+def adoptar(mascota, usuario):
+    """Adopta ``mascota`` para ``usuario`` de forma atómica.
+
+    La mascota se reclama con un único UPDATE condicional
+    (``disponible=True -> False``), así que de varias peticiones simultáneas
+    solo una puede ganar sin necesidad de bloquear filas. La restricción
+    ``adopcion_activa_unica`` respalda la regla en la base de datos, pero
+    solo cubre Adopcion: las activas que ``archivar_adopciones`` movió a
+    AdopcionArchivada se comprueban aquí, en la misma transacción.
+    Lanza ``MascotaYaAdoptada`` si otra petición se adelantó.
+    """
+    try:
+        with transaction.atomic():
+            reclamadas = (
+                Mascota.objects
+                .filter(pk=mascota.pk, disponible=True)
+                .update(disponible=False)
+            )
+            if not reclamadas:
+                raise MascotaYaAdoptada(mascota)
+            contadores.ajustar(mascota.fundacion_id, disponibles=-1, adoptadas=1)
+            # El UPDATE no pasa por las señales: la búsqueda solo lista disponibles
+            busqueda.eliminar('mascota', mascota.pk)
+
+            # Figuraba como disponible con una adopción activa en el archivo:
+            # se confirma la corrección pero no se crea otra adopción
+            archivada = AdopcionArchivada.objects.filter(mascota=mascota, activa=True).exists()
+            if archivada:
+                fundacion_id = mascota.fundacion_id
+                transaction.on_commit(lambda: fragmentos.invalidar_fundacion(fundacion_id))
+            else:
+                adopcion = Adopcion.objects.create(
+                    mascota=mascota,
+                    usuario=usuario,
+                    fundacion_id=mascota.fundacion_id,
+                )
+    except IntegrityError:
+        raise MascotaYaAdoptada(mascota)
+
+    mascota.disponible = False
+    contadores.guardar_estado(mascota)
+    if archivada:
+        raise MascotaYaAdoptada(mascota)
+    return adopcion
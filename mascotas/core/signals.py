@@ -0,0 +1,115 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import backends
+from . import busqueda
+from . import contadores
+from . import estadisticas
+from . import eventos
+from . import fragmentos
+from . import imagenes
+from .models import Fundacion, Mascota, Adopcion, Usuario
+
+
+@receiver(post_save, sender=Mascota)
+def procesar_foto(sender, instance, **kwargs):
+    """Genera las variantes de la foto cuando cambia."""
+    if imagenes.variantes_pendientes(instance):
+        transaction.on_commit(lambda: imagenes.encolar(instance.pk))
+
+
+@receiver(post_init, sender=Mascota)
+def recordar_estado_mascota(sender, instance, **kwargs):
+    contadores.guardar_estado(instance)
+
+
+@receiver(post_save, sender=Mascota)
+def actualizar_contadores_al_guardar(sender, instance, created, **kwargs):
+    """Mantiene los contadores (y la cache) de la fundación al guardar una mascota."""
+    anterior = None if created else contadores.estado_guardado(instance)
+    datos = instance.__dict__
+    if 'fundacion_id' not in datos or 'disponible' not in datos:
+        return
+    actual = (datos['fundacion_id'], datos['disponible'])
+
+    if created:
+        contadores.ajustar(actual[0], **contadores.deltas(actual[1]))
+    elif anterior is not None and anterior != actual:
+        contadores.ajustar(anterior[0], **contadores.deltas(anterior[1], signo=-1))
+        contadores.ajustar(actual[0], **contadores.deltas(actual[1]))
+    contadores.guardar_estado(instance)
+    _invalidar_al_confirmar(actual[0], anterior[0] if anterior else None)
+
+
+@receiver(post_delete, sender=Mascota)
+def actualizar_contadores_al_borrar(sender, instance, **kwargs):
+    anterior = contadores.estado_guardado(instance)
+    if anterior is not None:
+        contadores.ajustar(anterior[0], **contadores.deltas(anterior[1], signo=-1))
+
+
+@receiver(post_save, sender=Fundacion)
+@receiver(post_save, sender=Mascota)
+def indexar_busqueda(sender, instance, **kwargs):
+    busqueda.indexar(instance)
+
+
+@receiver(post_delete, sender=Fundacion)
+@receiver(post_delete, sender=Mascota)
+def desindexar_busqueda(sender, instance, **kwargs):
+    tipo, objeto_id = busqueda.documento(instance)[:2]
+    busqueda.eliminar(tipo, objeto_id)
+
+
+def _invalidar_al_confirmar(*fundacion_ids):
+    transaction.on_commit(lambda: fragmentos.invalidar_fundacion(*fundacion_ids))
+
+
+@receiver(post_save, sender=Fundacion)
+@receiver(post_delete, sender=Fundacion)
+def invalidar_cache_fundacion(sender, instance, **kwargs):
+    _invalidar_al_confirmar(instance.pk)
+
+
+@receiver(post_delete, sender=Mascota)
+@receiver(post_save, sender=Adopcion)
+@receiver(post_delete, sender=Adopcion)
+def invalidar_cache_relacionada(sender, instance, **kwargs):
+    _invalidar_al_confirmar(instance.fundacion_id)
+
+
+@receiver(post_save, sender=Adopcion)
+@receiver(post_delete, sender=Adopcion)
+def invalidar_adopciones_usuario(sender, instance, **kwargs):
+    # Sello de versión de /api/mis-adopciones/ (core.api)
+    ambito = fragmentos.ambito_usuario(instance.usuario_id)
+    transaction.on_commit(lambda: fragmentos.invalidar(ambito))
+
+
+@receiver(post_save, sender=Adopcion)
+def sumar_estadisticas(sender, instance, created, raw=False, **kwargs):
+    """Suma la adopción nueva a su fila de estadísticas en la misma transacción."""
+    if created and not raw:
+        estadisticas.registrar(instance)
+
+
+@receiver(post_save, sender=Mascota)
+def publicar_mascota(sender, instance, update_fields=None, raw=False, **kwargs):
+    """Avisa a los navegadores conectados (core.eventos) tras confirmar."""
+    datos = None if raw else eventos.datos_mascota(instance, update_fields)
+    if datos is not None:
+        transaction.on_commit(lambda: eventos.publicar('mascota', datos, datos['fundacion_id']))
+
+
+@receiver(post_save, sender=Adopcion)
+def publicar_adopcion(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        datos = {'id': instance.mascota_id, 'fundacion_id': instance.fundacion_id, 'disponible': False}
+        transaction.on_commit(lambda: eventos.publicar('adopcion', datos, datos['fundacion_id']))
+
+
+@receiver(post_save, sender=Usuario)
+@receiver(post_delete, sender=Usuario)
+def invalidar_cache_usuario(sender, instance, **kwargs):
+    backends.invalidar_usuario(instance.pk)
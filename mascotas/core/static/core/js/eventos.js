@@ -0,0 +1,47 @@
+// Avisos en vivo (core.eventos): en lugar de recargar la página para ver
+// si hay mascotas nuevas, el servidor avisa por Server-Sent Events.
+(function () {
+    var aviso = document.querySelector('[data-eventos]');
+    if (!aviso || !window.EventSource) {
+        return;
+    }
+    var texto = aviso.querySelector('.aviso-texto');
+    var nuevas = 0;
+
+    function mostrar(mensaje) {
+        texto.textContent = mensaje;
+        aviso.hidden = false;
+    }
+
+    function marcarAdoptada(id) {
+        var tarjeta = document.querySelector('[data-mascota="' + id + '"]');
+        if (!tarjeta) {
+            return;
+        }
+        var boton = tarjeta.querySelector('.btn-adopt');
+        if (boton) {
+            boton.remove();
+        }
+        var insignia = tarjeta.querySelector('.badge-available');
+        if (insignia) {
+            insignia.className = 'badge badge-adopted';
+            insignia.innerHTML = '<i class="fas fa-times-circle"></i> Ya Adoptado';
+        }
+    }
+
+    var fuente = new EventSource(aviso.dataset.eventos);
+    fuente.addEventListener('mascota', function (evento) {
+        var mascota = JSON.parse(evento.data);
+        if (!mascota.disponible) {
+            marcarAdoptada(mascota.id);
+        } else if (!document.querySelector('[data-mascota="' + mascota.id + '"]')) {
+            nuevas += 1;
+            mostrar(nuevas === 1
+                ? mascota.nombre + ' (' + mascota.especie + ') está disponible para adopción.'
+                : nuevas + ' mascotas nuevas disponibles.');
+        }
+    });
+    fuente.addEventListener('adopcion', function (evento) {
+        marcarAdoptada(JSON.parse(evento.data).id);
+    });
+})();
@@ -0,0 +1,53 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pendientes = set()
+_candado = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'TAREAS_WORKERS', 2),
+            thread_name_prefix='tareas',
+        )
+    return _executor
+
+
+def _ejecutar(clave, funcion, args):
+    try:
+        funcion(*args)
+    except Exception:
+        logger.exception('Falló la tarea en segundo plano %s', clave)
+    finally:
+        with _candado:
+            _pendientes.discard(clave)
+        close_old_connections()
+
+
+def encolar(clave, funcion, *args):
+    """Ejecuta ``funcion(*args)`` en el pool de hilos de fondo.
+
+    ``clave`` identifica el trabajo: mientras uno con la misma clave esté en
+    cola o en curso no se vuelve a programar. Devuelve ``True`` si se
+    programó un trabajo nuevo.
+    """
+    with _candado:
+        if clave in _pendientes:
+            return False
+        _pendientes.add(clave)
+        _get_executor().submit(_ejecutar, clave, funcion, args)
+    return True
+
+
+def en_proceso(clave):
+    with _candado:
+        return clave in _pendientes
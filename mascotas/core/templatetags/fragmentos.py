@@ -0,0 +1,49 @@
+from django import template
+from django.template.base import token_kwargs
+
+from core import fragmentos
+
+register = template.Library()
+
+
+class FragmentoNode(template.Node):
+    def __init__(self, nodelist, nombre, kwargs):
+        self.nodelist = nodelist
+        self.nombre = nombre
+        self.kwargs = kwargs
+
+    def render(self, context):
+        nombre = self.nombre.resolve(context)
+        valores = {clave: valor.resolve(context) for clave, valor in self.kwargs.items()}
+        fundacion = valores.get('fundacion')
+        ambito = fragmentos.ambito_fundacion(fundacion) if fundacion else fragmentos.GLOBAL
+        return fragmentos.obtener_o_renderizar(
+            nombre, ambito, valores.get('vary', ''),
+            lambda: self.nodelist.render(context),
+            precargado=(context.get('fragmentos_precargados') or {}).get(nombre),
+        )
+
+
+@register.tag
+def fragmento(parser, token):
+    """Cachea un bloque de plantilla con invalidación por versión.
+
+    Uso::
+
+        {% fragmento 'tarjetas_fundaciones' %}...{% endfragmento %}
+        {% fragmento 'animales' fundacion=fundacion.id vary=request.GET.urlencode %}...{% endfragmento %}
+
+    Con ``fundacion`` el fragmento se invalida cuando cambia esa fundación,
+    sus mascotas o sus adopciones; sin él, con cualquier cambio. Si el
+    contexto trae ``fragmentos_precargados[nombre]`` se usa ese contenido.
+    """
+    partes = token.split_contents()
+    if len(partes) < 2:
+        raise template.TemplateSyntaxError("'fragmento' necesita un nombre")
+    nombre = parser.compile_filter(partes[1])
+    kwargs = token_kwargs(partes[2:], parser)
+    if len(kwargs) != len(partes) - 2 or set(kwargs) - {'fundacion', 'vary'}:
+        raise template.TemplateSyntaxError("'fragmento' solo acepta fundacion= y vary=")
+    nodelist = parser.parse(('endfragmento',))
+    parser.delete_first_token()
+    return FragmentoNode(nodelist, nombre, kwargs)
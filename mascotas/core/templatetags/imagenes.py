@@ -0,0 +1,36 @@
+from django import template
+from django.utils.html import format_html, format_html_join
+
+from core import imagenes
+
+register = template.Library()
+
+# Oculta la foto rota y muestra el marcador que la sigue en el HTML
+ONERROR = (
+    "this.onerror=null; var p=this.closest('picture')||this; "
+    "p.style.display='none'; p.nextElementSibling.style.display='flex';"
+)
+
+
+@register.simple_tag
+def foto_responsiva(mascota, clase='', sizes='100vw'):
+    """Foto de la mascota con ``<source srcset>`` por formato.
+
+    Mientras las variantes no existen se emite la imagen original tal cual.
+    """
+    img = format_html(
+        '<img src="{}" alt="{}" class="{}" loading="lazy" onerror="{}">',
+        mascota.foto.url, mascota.nombre, clase, ONERROR,
+    )
+    fuentes = [
+        (f'image/{formato}', valor, sizes)
+        for formato in imagenes.FORMATOS_VARIANTES
+        if (valor := imagenes.srcset(mascota, formato))
+    ]
+    if not fuentes:
+        return img
+    return format_html(
+        '<picture style="display: contents">{}{}</picture>',
+        format_html_join('', '<source type="{}" srcset="{}" sizes="{}">', fuentes),
+        img,
+    )
@@ -1,3 +1,1938 @@
-from django.test import TestCase
+import asyncio
+import gzip
+import io
+import json
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+import threading
+import time
+from datetime import date, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import Usuario, Fundacion, Mascota, Adopcion, AdopcionArchivada, EstadisticaAdopcion
+from .paginacion import paginar_por_cursor
+from . import servicios
+from . import facturas
+from . import imagenes
+from . import contadores
+from . import fragmentos
+from . import borrado
+from . import estadisticas
+from . import eventos
+from . import exportacion
+from . import historial
+from . import busqueda
+
+
+def crear_fundacion(**kwargs):
+    datos = {
+        'nombre': 'Huellitas',
+        'direccion': 'Calle 1 # 2-3',
+        'telefono': '3000000000',
+        'email': 'huellitas@example.com',
+        'capacidad': 50,
+    }
+    datos.update(kwargs)
+    return Fundacion.objects.create(**datos)
+
+
+def crear_usuario(username='ana', **kwargs):
+    return Usuario.objects.create_user(
+        username=username,
+        email=kwargs.pop('email', f'{username}@example.com'),
+        password=kwargs.pop('password', 'clave-segura-123'),
+        **kwargs
+    )
+
+
+def crear_adopciones(usuario, fundacion, cantidad):
+    adopciones = []
+    for i in range(cantidad):
+        mascota = Mascota.objects.create(
+            nombre=f'Mascota {i}', especie='Perro', edad=2,
+            disponible=False, fundacion=fundacion,
+        )
+        adopciones.append(Adopcion.objects.create(
+            mascota=mascota, usuario=usuario, fundacion=fundacion,
+        ))
+    return adopciones
+
+
+class MisAdopcionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario()
+        self.fundacion = crear_fundacion()
+        self.client.force_login(self.usuario)
+
+    def test_consultas_constantes(self):
+        crear_adopciones(self.usuario, self.fundacion, 3)
+        # Usuario (la primera vez), total y página de cada tabla del historial
+        with self.assertNumQueries(4):
+            self.client.get(reverse('mis_adopciones'))
+
+        crear_adopciones(self.usuario, self.fundacion, 15)
+        with self.assertNumQueries(3):
+            self.client.get(reverse('mis_adopciones'))
+
+    def test_paginacion_por_cursor_recorre_todo_el_historial(self):
+        adopciones = crear_adopciones(self.usuario, self.fundacion, 5)
+        # Fechas distintas para comprobar el orden compuesto (fecha, id).
+        for i, adopcion in enumerate(adopciones):
+            Adopcion.objects.filter(pk=adopcion.pk).update(
+                fecha_adopcion=date(2025, 1, 1) + timedelta(days=i % 2)
+            )
+
+        historial = Adopcion.objects.historial_de(self.usuario)
+        vistos = []
+        cursor = None
+        while True:
+            pagina = paginar_por_cursor(
+                historial, cursor, orden=('-fecha_adopcion', '-id'), tamano=2
+            )
+            vistos.extend(a.pk for a in pagina)
+            if not pagina.tiene_siguiente:
+                break
+            cursor = pagina.siguiente
+
+        esperado = list(historial.values_list('pk', flat=True))
+        self.assertEqual(vistos, esperado)
+        self.assertEqual(len(set(vistos)), 5)
+
+    def test_cursor_invalido_devuelve_primera_pagina(self):
+        crear_adopciones(self.usuario, self.fundacion, 2)
+        respuesta = self.client.get(reverse('mis_adopciones'), {'cursor': 'no-valido'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(len(respuesta.context['adopciones']), 2)
+
+    def test_cursor_con_nulos_o_longitud_erronea_devuelve_primera_pagina(self):
+        from .paginacion import _codificar
+
+        crear_adopciones(self.usuario, self.fundacion, 2)
+        for valores in ([None, None], [None, 1], ['2025-01-01', None], ['2025-01-01'], {'a': 1}, 5):
+            with self.subTest(valores=valores):
+                respuesta = self.client.get(reverse('mis_adopciones'), {'cursor': _codificar(valores)})
+                self.assertEqual(respuesta.status_code, 200)
+                self.assertEqual(len(respuesta.context['adopciones']), 2)
+
+
+class AdopcionConcurrenteTests(TransactionTestCase):
+    HILOS = 8
+    MASCOTAS = 5
+
+    def test_un_solo_ganador_por_mascota(self):
+        fundacion = crear_fundacion()
+        usuarios = [crear_usuario(f'usuario{i}') for i in range(self.HILOS)]
+        mascotas = [
+            Mascota.objects.create(nombre=f'Popular {i}', especie='Gato', edad=1, fundacion=fundacion)
+            for i in range(self.MASCOTAS)
+        ]
+
+        barrera = threading.Barrier(self.HILOS)
+        resultados = []
+        candado = threading.Lock()
+
+        def intentar(usuario):
+            try:
+                barrera.wait()
+                for mascota in mascotas:
+                    copia = Mascota.objects.get(pk=mascota.pk)
+                    try:
+                        servicios.adoptar(copia, usuario)
+                        resultado = 'ganada'
+                    except servicios.MascotaYaAdoptada:
+                        resultado = 'ya_adoptada'
+                    with candado:
+                        resultados.append((mascota.pk, resultado))
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=intentar, args=(u,)) for u in usuarios]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(len(resultados), self.HILOS * self.MASCOTAS)
+        for mascota in mascotas:
+            ganadas = [r for pk, r in resultados if pk == mascota.pk and r == 'ganada']
+            self.assertEqual(len(ganadas), 1)
+            self.assertEqual(Adopcion.objects.filter(mascota=mascota).count(), 1)
+        self.assertFalse(Mascota.objects.filter(disponible=True).exists())
+
+    def test_restriccion_impide_segunda_adopcion_activa(self):
+        fundacion = crear_fundacion()
+        mascota = Mascota.objects.create(nombre='Toby', especie='Perro', edad=3, fundacion=fundacion)
+        servicios.adoptar(mascota, crear_usuario('primero'))
+
+        # Aunque alguien vuelva a marcarla disponible, la BD rechaza el duplicado
+        Mascota.objects.filter(pk=mascota.pk).update(disponible=True)
+        mascota.refresh_from_db()
+        with self.assertRaises(servicios.MascotaYaAdoptada):
+            servicios.adoptar(mascota, crear_usuario('segundo'))
+        mascota.refresh_from_db()
+        self.assertTrue(mascota.disponible)
+        self.assertEqual(Adopcion.objects.filter(mascota=mascota).count(), 1)
+
+
+class FacturaPDFTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.usuario = crear_usuario()
+        self.client.force_login(self.usuario)
+        self.adopcion = crear_adopciones(self.usuario, crear_fundacion(), 1)[0]
+        self.url = reverse('factura_adopcion', args=[self.adopcion.pk])
+
+    def test_primera_descarga_no_bloquea(self):
+        with mock.patch.object(facturas, 'encolar') as encolar:
+            respuesta = self.client.get(self.url, {'descargar': 'pdf'})
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertTemplateUsed(respuesta, 'core/factura_generando.html')
+        encolar.assert_called_once_with(self.adopcion.pk)
+
+    def test_descargas_posteriores_sirven_el_archivo(self):
+        nombre = facturas.generar_factura(self.adopcion.pk)
+        self.assertRegex(nombre, r'^facturas/factura_\d{5}_[0-9a-f]{16}\.pdf$')
+
+        with mock.patch.object(facturas, 'render_to_pdf') as render:
+            respuesta = self.client.get(self.url, {'descargar': 'pdf'})
+            # Generar de nuevo no vuelve a renderizar
+            self.assertEqual(facturas.generar_factura(self.adopcion.pk), nombre)
+        render.assert_not_called()
+
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta['Content-Type'], 'application/pdf')
+        self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'%PDF'))
+
+    def test_tras_varios_fallos_muestra_el_error(self):
+        with mock.patch.object(facturas, 'render_to_pdf', side_effect=facturas.ErrorPDF('Error al generar PDF')):
+            for intento in range(1, 4):
+                with self.assertRaises(facturas.ErrorPDF):
+                    facturas.generar_factura(self.adopcion.pk)
+                self.assertEqual(facturas.fallo(self.adopcion.pk)['intentos'], intento)
+
+        with mock.patch.object(facturas.tareas, 'encolar') as encolar:
+            respuesta = self.client.get(self.url, {'descargar': 'pdf'})
+        self.assertEqual(respuesta.status_code, 500)
+        self.assertContains(respuesta, 'Error al generar PDF', status_code=500)
+        self.assertNotContains(respuesta, 'http-equiv="refresh"', status_code=500)
+        encolar.assert_not_called()
+
+        # Reintentar a mano borra la cuenta y vuelve a la URL sin el parámetro
+        respuesta = self.client.get(self.url, {'descargar': 'pdf', 'reintentar': '1'})
+        self.assertRedirects(respuesta, f'{self.url}?descargar=pdf', fetch_redirect_response=False)
+        self.assertIsNone(facturas.fallo(self.adopcion.pk))
+        with mock.patch.object(facturas, 'render_to_pdf', side_effect=facturas.ErrorPDF('otra vez')):
+            with self.assertRaises(facturas.ErrorPDF):
+                facturas.generar_factura(self.adopcion.pk)
+        facturas.generar_factura(self.adopcion.pk)
+        self.assertIsNone(facturas.fallo(self.adopcion.pk))
+
+    def test_adoptar_encola_la_factura(self):
+        mascota = Mascota.objects.create(
+            nombre='Luna', especie='Gato', edad=1, fundacion=self.adopcion.fundacion,
+        )
+        with mock.patch.object(facturas, 'encolar') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(reverse('adoptar_mascota', args=[mascota.pk]))
+        nueva = Adopcion.objects.get(mascota=mascota)
+        encolar.assert_called_once_with(nueva.pk)
+
+
+@override_settings(FACTURAS_EXPORT_WORKERS=2)
+class ExportarFacturasTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.fundacion = crear_fundacion()
+        self.adopciones = crear_adopciones(crear_usuario(), self.fundacion, 3)
+        # Una ya generada: se reutiliza el archivo en lugar de renderizarla
+        facturas.generar_factura(self.adopciones[0].pk)
+        self.staff = crear_usuario('staff', is_staff=True)
+
+    def test_solo_personal(self):
+        self.client.force_login(crear_usuario('visitante'))
+        respuesta = self.client.get(reverse('exportar_facturas'), {'fundacion': self.fundacion.pk})
+        self.assertEqual(respuesta.status_code, 302)
+
+    def test_zip_en_streaming(self):
+        self.client.force_login(self.staff)
+        respuesta = self.client.get(reverse('exportar_facturas'), {'fundacion': self.fundacion.pk})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(respuesta.streaming)
+
+        contenido = io.BytesIO(b''.join(respuesta.streaming_content))
+        with zipfile.ZipFile(contenido) as archivo_zip:
+            nombres = archivo_zip.namelist()
+            self.assertEqual(len(nombres), 3)
+            for nombre in nombres:
+                self.assertTrue(archivo_zip.read(nombre).startswith(b'%PDF'))
+
+    def test_pdf_combinado_en_segundo_plano(self):
+        from pypdf import PdfReader
+
+        self.client.force_login(self.staff)
+        parametros = {'fundacion': self.fundacion.pk, 'formato': 'pdf'}
+        with mock.patch.object(exportacion, 'encolar_pdf') as encolar:
+            respuesta = self.client.get(reverse('exportar_facturas'), parametros)
+        self.assertEqual(respuesta.status_code, 202)
+        self.assertTemplateUsed(respuesta, 'core/exportacion_generando.html')
+        nombre = encolar.call_args.args[0]
+
+        exportacion.generar_pdf(*encolar.call_args.args)
+        respuesta = self.client.get(reverse('exportar_facturas'), parametros)
+        self.assertEqual(respuesta.status_code, 200)
+        lector = PdfReader(io.BytesIO(b''.join(respuesta.streaming_content)))
+        self.assertGreaterEqual(len(lector.pages), 3)
+
+        # Una adopción nueva en el rango cambia el archivo
+        crear_adopciones(crear_usuario('otro'), self.fundacion, 1)
+        self.assertNotEqual(exportacion.nombre_pdf(self.fundacion), nombre)
+
+    def test_pdf_combinado_con_error(self):
+        self.client.force_login(self.staff)
+        parametros = {'fundacion': self.fundacion.pk, 'formato': 'pdf'}
+        nombre = exportacion.nombre_pdf(self.fundacion)
+        with mock.patch.object(exportacion, 'escribir_pdf_combinado', side_effect=OSError('disco lleno')):
+            with self.assertRaises(OSError):
+                exportacion.generar_pdf(nombre, self.fundacion.pk)
+
+        respuesta = self.client.get(reverse('exportar_facturas'), parametros)
+        self.assertContains(respuesta, 'disco lleno', status_code=500)
+        # Al volver a pedirlo se reintenta
+        with mock.patch.object(exportacion, 'encolar_pdf') as encolar:
+            self.assertEqual(self.client.get(reverse('exportar_facturas'), parametros).status_code, 202)
+        encolar.assert_called_once()
+
+    def test_pdf_combinados_caducan(self):
+        viejo = default_storage.save(f'{exportacion.CARPETA_PDF}/viejo.pdf', ContentFile(b'%PDF'))
+        nuevo = default_storage.save(f'{exportacion.CARPETA_PDF}/nuevo.pdf', ContentFile(b'%PDF'))
+        hace_dos_dias = time.time() - 2 * 24 * 60 * 60
+        os.utime(default_storage.path(viejo), (hace_dos_dias, hace_dos_dias))
+
+        self.assertEqual(exportacion.limpiar_caducados(), 1)
+        self.assertFalse(default_storage.exists(viejo))
+        self.assertTrue(default_storage.exists(nuevo))
+
+    def test_los_hijos_no_cargan_django(self):
+        import subprocess
+        import sys
+
+        self.assertNotEqual(exportacion._contexto_procesos().get_start_method(), 'fork')
+        cargados = subprocess.run(
+            [sys.executable, '-c', 'import sys, core.pdf; print(any(m.startswith("django") for m in sys.modules))'],
+            capture_output=True, text=True, check=True, cwd=settings.BASE_DIR,
+        )
+        self.assertEqual(cargados.stdout.strip(), 'False')
+
+    def test_rango_invalido(self):
+        self.client.force_login(self.staff)
+        respuesta = self.client.get(reverse('exportar_facturas'), {
+            'fundacion': self.fundacion.pk, 'desde': '2025-02-01', 'hasta': '2025-01-01',
+        })
+        self.assertEqual(respuesta.status_code, 400)
+
+    def test_comando(self):
+        salida = os.path.join(self.media, 'facturas.zip')
+        call_command('exportar_facturas', self.fundacion.pk, salida, workers=1, stdout=io.StringIO())
+        with zipfile.ZipFile(salida) as archivo_zip:
+            self.assertEqual(len(archivo_zip.namelist()), 3)
+
+
+def imagen_de_prueba(nombre='foto.jpg', color='red', tamano=(1200, 800)):
+    from PIL import Image
+
+    destino = io.BytesIO()
+    Image.new('RGB', tamano, color).save(destino, format='JPEG')
+    return SimpleUploadedFile(nombre, destino.getvalue(), content_type='image/jpeg')
+
+
+class FotosMascotaTests(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache.clear()
+        self.fundacion = crear_fundacion()
+
+    def crear_mascota(self, foto):
+        return Mascota.objects.create(
+            nombre='Husky', especie='Perro', edad=2, fundacion=self.fundacion, foto=foto,
+        )
+
+    def test_fotos_duplicadas_comparten_archivo(self):
+        primera = self.crear_mascota(imagen_de_prueba('husky.jpg'))
+        segunda = self.crear_mascota(imagen_de_prueba('husky_zS2mrpP.jpg'))
+        distinta = self.crear_mascota(imagen_de_prueba('otro.jpg', color='blue'))
+
+        self.assertEqual(primera.foto.name, segunda.foto.name)
+        self.assertNotEqual(primera.foto.name, distinta.foto.name)
+        self.assertEqual(len(os.listdir(os.path.join(self.media, 'mascotas'))), 2)
+
+    def test_guardar_encola_variantes(self):
+        with mock.patch.object(imagenes, 'encolar') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                mascota = self.crear_mascota(imagen_de_prueba())
+        encolar.assert_called_once_with(mascota.pk)
+
+    def test_variantes_y_srcset(self):
+        mascota = self.crear_mascota(imagen_de_prueba())
+        variantes = imagenes.generar_variantes(mascota.pk)
+        mascota.refresh_from_db()
+
+        self.assertEqual(len(mascota.foto_hash), 64)
+        self.assertFalse(imagenes.variantes_pendientes(mascota))
+        for formato in imagenes.formatos_soportados():
+            anchos = [ancho for ancho, _nombre in variantes[formato]]
+            self.assertEqual(anchos, list(imagenes.ANCHOS_VARIANTES))
+            for _ancho, nombre in variantes[formato]:
+                self.assertTrue(os.path.exists(os.path.join(self.media, nombre)))
+
+        usuario = crear_usuario()
+        self.client.force_login(usuario)
+        respuesta = self.client.get(reverse('fundacion_detalle', args=[self.fundacion.pk]))
+        self.assertContains(respuesta, '<picture')
+        self.assertContains(respuesta, '320w')
+
+    def test_variantes_invalidan_la_pagina_cacheada(self):
+        with mock.patch.object(imagenes, 'encolar'):
+            mascota = self.crear_mascota(imagen_de_prueba())
+        self.client.force_login(crear_usuario())
+        url = reverse('fundacion_detalle', args=[self.fundacion.pk])
+        self.assertNotContains(self.client.get(url), '<picture')
+
+        imagenes.generar_variantes(mascota.pk)
+        self.assertContains(self.client.get(url), '<picture')
+
+    def test_imagen_pequena_no_se_amplia(self):
+        mascota = self.crear_mascota(imagen_de_prueba(tamano=(400, 300)))
+        variantes = imagenes.generar_variantes(mascota.pk)
+        self.assertEqual([a for a, _n in variantes['webp']], [320, 400])
+
+
+class CatalogoMascotasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fundacion = crear_fundacion()
+        self.client.force_login(crear_usuario())
+        self.url = reverse('fundacion_detalle', args=[self.fundacion.pk])
+
+    def crear_mascotas(self, cantidad, **kwargs):
+        datos = {'especie': 'Perro', 'edad': 3, 'disponible': True}
+        datos.update(kwargs)
+        Mascota.objects.bulk_create([
+            Mascota(nombre=f'Mascota {i}', fundacion=self.fundacion, **datos)
+            for i in range(cantidad)
+        ])
+        contadores.recalcular()
+
+    @skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN de SQLite')
+    def test_orden_del_catalogo_sale_del_indice(self):
+        from .views import ORDEN_CATALOGO
+
+        consultas = [
+            Mascota.objects.activas(),
+            Mascota.objects.filter(fundacion=self.fundacion),
+            Mascota.objects.activas().filter(especie='Gato'),
+        ]
+        with connection.cursor() as cursor:
+            for consulta in consultas:
+                sql, parametros = consulta.order_by(*ORDEN_CATALOGO)[:24].query.sql_with_params()
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', parametros)
+                plan = ' '.join(fila[-1] for fila in cursor.fetchall())
+                self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_consultas_constantes(self):
+        self.crear_mascotas(5)
+        # Usuario (la primera vez), fundación y página
+        with self.assertNumQueries(3):
+            self.client.get(self.url)
+        self.crear_mascotas(60)
+        with self.assertNumQueries(2):
+            respuesta = self.client.get(self.url)
+        self.assertEqual(len(respuesta.context['mascotas']), 24)
+        self.assertEqual(respuesta.context['fundacion'].total_mascotas, 65)
+
+    def test_filtros(self):
+        self.crear_mascotas(3, especie='Gato', edad=1)
+        self.crear_mascotas(2, especie='Gato', edad=8, disponible=False)
+        self.crear_mascotas(4, especie='Perro', edad=5)
+
+        def contar(**filtros):
+            return len(self.client.get(self.url, filtros).context['mascotas'])
+
+        self.assertEqual(contar(especie='Gato'), 5)
+        self.assertEqual(contar(especie='Gato', disponible='1'), 3)
+        self.assertEqual(contar(disponible='0'), 2)
+        self.assertEqual(contar(edad_min=2, edad_max=6), 4)
+        # Un filtro inválido se ignora en lugar de fallar
+        self.assertEqual(contar(edad_min='abc'), 9)
+
+    def test_paginacion_conserva_filtros(self):
+        self.crear_mascotas(30, especie='Gato')
+        self.crear_mascotas(30, especie='Perro', disponible=False)
+
+        vistos = []
+        parametros = {'especie': 'Gato'}
+        while True:
+            respuesta = self.client.get(self.url, parametros)
+            pagina = respuesta.context['mascotas']
+            vistos.extend(m.pk for m in pagina)
+            if not pagina.tiene_siguiente:
+                break
+            self.assertContains(respuesta, 'especie=Gato')
+            parametros['cursor'] = pagina.siguiente
+
+        self.assertEqual(len(vistos), 30)
+        self.assertEqual(len(set(vistos)), 30)
+
+
+class ContadoresFundacionTests(TestCase):
+    def setUp(self):
+        self.fundacion = crear_fundacion(capacidad=10)
+
+    def assertContadores(self, fundacion, total, disponibles, adoptadas):
+        fundacion.refresh_from_db()
+        self.assertEqual(
+            (fundacion.total_mascotas, fundacion.mascotas_disponibles, fundacion.mascotas_adoptadas),
+            (total, disponibles, adoptadas),
+        )
+
+    def test_crear_editar_adoptar_y_borrar(self):
+        mascotas = [
+            Mascota.objects.create(nombre=f'M{i}', especie='Perro', edad=1, fundacion=self.fundacion)
+            for i in range(3)
+        ]
+        self.assertContadores(self.fundacion, 3, 3, 0)
+        self.assertEqual(self.fundacion.cupo_disponible, 7)
+
+        servicios.adoptar(mascotas[0], crear_usuario())
+        self.assertContadores(self.fundacion, 3, 2, 1)
+        # Guardar de nuevo la mascota adoptada no vuelve a descontar
+        mascotas[0].nombre = 'Renombrada'
+        mascotas[0].save()
+        self.assertContadores(self.fundacion, 3, 2, 1)
+
+        # Editar la fundación no pisa los contadores
+        self.fundacion.nombre = 'Editada'
+        self.fundacion.save()
+        self.assertContadores(self.fundacion, 3, 2, 1)
+
+        otra = crear_fundacion(nombre='Otra')
+        mascotas[1].fundacion = otra
+        mascotas[1].save()
+        self.assertContadores(self.fundacion, 2, 1, 1)
+        self.assertContadores(otra, 1, 1, 0)
+
+        Mascota.objects.get(pk=mascotas[2].pk).delete()
+        self.assertContadores(self.fundacion, 1, 0, 1)
+
+    def test_reconciliar_repara_desviaciones(self):
+        Mascota.objects.create(nombre='A', especie='Gato', edad=1, fundacion=self.fundacion)
+        Mascota.objects.filter(fundacion=self.fundacion).update(disponible=False)
+        Fundacion.objects.filter(pk=self.fundacion.pk).update(total_mascotas=99)
+
+        salida = io.StringIO()
+        call_command('reconciliar_contadores', stdout=salida)
+        self.assertIn('1 fundaciones corregidas', salida.getvalue())
+        self.assertContadores(self.fundacion, 1, 0, 1)
+
+
+class BusquedaTests(TestCase):
+    def setUp(self):
+        self.client.force_login(crear_usuario())
+        self.fundacion = crear_fundacion(
+            nombre='Patitas Felices', descripcion='Rescate de gatos callejeros', direccion='Medellín',
+        )
+        self.luna = Mascota.objects.create(nombre='Luna', especie='Gato', edad=2, fundacion=self.fundacion)
+        Mascota.objects.create(nombre='Rocky', especie='Perro', edad=4, fundacion=self.fundacion)
+
+    def buscar(self, q, **extra):
+        respuesta = self.client.get(reverse('buscar'), {'q': q, **extra})
+        self.assertEqual(respuesta.status_code, 200)
+        return respuesta.json()
+
+    def test_busca_en_mascotas_y_fundaciones(self):
+        resultados = self.buscar('gato')['resultados']
+        self.assertEqual({(r['tipo'], r['id']) for r in resultados},
+                         {('mascota', self.luna.pk), ('fundacion', self.fundacion.pk)})
+        # Sin tildes y por prefijo
+        self.assertEqual(self.buscar('medel')['resultados'][0]['tipo'], 'fundacion')
+
+    def test_titulo_pesa_mas(self):
+        Mascota.objects.create(nombre='Felix', especie='Gato', edad=1, fundacion=self.fundacion)
+        resultados = self.buscar('felices')['resultados']
+        self.assertEqual(resultados[0]['tipo'], 'fundacion')
+
+    def test_sincroniza_al_guardar_y_borrar(self):
+        self.luna.nombre = 'Nala'
+        self.luna.save()
+        self.assertEqual(self.buscar('luna')['resultados'], [])
+        self.assertEqual(len(self.buscar('nala')['resultados']), 1)
+
+        self.luna.delete()
+        self.assertEqual(self.buscar('nala')['resultados'], [])
+
+    def test_eliminar_fundacion_borra_por_clave(self):
+        from . import busqueda
+
+        otra = crear_fundacion(nombre='Huellitas')
+        Mascota.objects.create(nombre='Lucas', especie='Gato', edad=3, fundacion=otra)
+        with CaptureQueriesContext(connection) as capturadas:
+            busqueda.eliminar_fundacion(self.fundacion.pk)
+        self.assertFalse([c['sql'] for c in capturadas if 'WHERE fundacion_id' in c['sql']])
+        self.assertEqual([r['titulo'] for r in self.buscar('gato')['resultados']], ['Lucas'])
+
+    def test_paginacion_y_entrada_vacia(self):
+        for i in range(25):
+            Mascota.objects.create(nombre=f'Bola {i}', especie='Perro', edad=1, fundacion=self.fundacion)
+        primera = self.buscar('bola')
+        self.assertEqual(len(primera['resultados']), 20)
+        self.assertEqual(primera['siguiente'], 2)
+        segunda = self.buscar('bola', pagina=2)
+        self.assertEqual(len(segunda['resultados']), 5)
+        self.assertIsNone(segunda['siguiente'])
+
+        self.assertEqual(self.buscar('  "* ')['resultados'], [])
+
+    def test_adoptadas_no_aparecen(self):
+        with mock.patch.object(facturas, 'encolar'):
+            servicios.adoptar(self.luna, crear_usuario('luis'))
+        self.assertEqual(self.buscar('luna')['resultados'], [])
+
+        # Vuelve a estar disponible: se indexa de nuevo al guardarla
+        self.luna.disponible = True
+        self.luna.save()
+        self.assertEqual(len(self.buscar('luna')['resultados']), 1)
+        Mascota.objects.create(nombre='Lunita', especie='Gato', edad=1, fundacion=self.fundacion, disponible=False)
+        self.assertEqual(busqueda.reindexar(), 3)
+        self.assertEqual([r['titulo'] for r in self.buscar('lun')['resultados']], ['Luna'])
+
+    def test_motor_sin_indice(self):
+        # Sin tabla de índice (p. ej. MySQL) no se escribe ni se consulta nada
+        with mock.patch.object(busqueda, 'MOTORES', ()):
+            with CaptureQueriesContext(connection) as capturadas:
+                Mascota.objects.create(nombre='Toby', especie='Perro', edad=1, fundacion=self.fundacion)
+                self.luna.delete()
+                self.assertEqual(busqueda.buscar('toby'), ([], False))
+                self.assertEqual(busqueda.reindexar(), 0)
+        self.assertFalse([c['sql'] for c in capturadas if 'core_busqueda' in c['sql']])
+
+
+class CacheFragmentosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(crear_usuario())
+        self.fundacion = crear_fundacion()
+        self.mascota = Mascota.objects.create(nombre='Kira', especie='Perro', edad=2, fundacion=self.fundacion)
+        self.url = reverse('fundacion_detalle', args=[self.fundacion.pk])
+
+    def test_aciertos_evitan_consultas(self):
+        # Usuario (la primera vez) y fundaciones; después todo sale de cache
+        with self.assertNumQueries(2):
+            self.client.get(reverse('inicio'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('inicio'))
+
+        with self.assertNumQueries(2):
+            self.client.get(self.url)
+        with self.assertNumQueries(1):
+            respuesta = self.client.get(self.url)
+        self.assertContains(respuesta, 'Kira')
+        # Otros filtros son otro fragmento
+        with self.assertNumQueries(2):
+            self.client.get(self.url, {'especie': 'Gato'})
+
+    def test_parametros_basura_no_crean_variantes(self):
+        self.client.get(self.url, {'especie': 'Perro'})
+        # Parámetros desconocidos, filtros inválidos y cursores rotos dan la misma clave
+        for parametros in ({'especie': 'Perro', 'x': '1'}, {'especie': 'Perro', 'edad_min': 'abc'},
+                           {'especie': 'Perro', 'cursor': 'basura'}, {'x': '2', 'especie': 'Perro'}):
+            with self.assertNumQueries(1):
+                respuesta = self.client.get(self.url, parametros)
+            self.assertContains(respuesta, 'Kira')
+
+    def test_enlace_siguiente_sin_parametros_basura(self):
+        Mascota.objects.bulk_create([
+            Mascota(nombre=f'Mascota {i}', especie='Perro', edad=1, fundacion=self.fundacion)
+            for i in range(30)
+        ])
+        respuesta = self.client.get(self.url, {'especie': 'Perro', 'x': 'basura'})
+        self.assertContains(respuesta, 'especie=Perro')
+        self.assertNotContains(respuesta, 'x=basura')
+
+    def test_invalidacion_por_senales(self):
+        self.client.get(self.url)
+        self.client.get(reverse('inicio'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.mascota.nombre = 'Kiara'
+            self.mascota.save()
+        self.assertContains(self.client.get(self.url), 'Kiara')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fundacion.nombre = 'Nuevo nombre'
+            self.fundacion.save()
+        self.assertContains(self.client.get(reverse('inicio')), 'Nuevo nombre')
+
+        with mock.patch.object(facturas, 'encolar'):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.get(reverse('adoptar_mascota', args=[self.mascota.pk]))
+        self.assertContains(self.client.get(self.url), 'Ya Adoptado')
+
+    def test_estadisticas(self):
+        antes = fragmentos.estadisticas()
+        self.client.get(reverse('inicio'))
+        self.client.get(reverse('inicio'))
+        despues = fragmentos.estadisticas()
+        self.assertEqual(despues['fallos'] - antes['fallos'], 1)
+        self.assertEqual(despues['aciertos'] - antes['aciertos'], 1)
+
+        self.client.force_login(crear_usuario('staff', is_staff=True))
+        datos = self.client.get(reverse('estadisticas_cache')).json()
+        self.assertIn('tasa_aciertos', datos)
+
+
+class SesionesYUsuarioCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario()
+
+    def test_login_y_peticiones_sin_consultas_de_autenticacion(self):
+        respuesta = self.client.post(reverse('login_usuario'), {
+            'email': self.usuario.email, 'password': 'clave-segura-123',
+        })
+        self.assertRedirects(respuesta, reverse('inicio'), fetch_redirect_response=False)
+        self.client.get(reverse('inicio'))
+        with self.assertNumQueries(0):
+            self.client.get(reverse('inicio'))
+
+    def test_guardar_usuario_invalida_la_cache(self):
+        from .backends import EmailBackend
+
+        backend = EmailBackend()
+        self.assertEqual(backend.get_user(self.usuario.pk).telefono, None)
+        with self.assertNumQueries(0):
+            backend.get_user(self.usuario.pk)
+
+        self.usuario.telefono = '3001234567'
+        self.usuario.save()
+        self.assertEqual(backend.get_user(self.usuario.pk).telefono, '3001234567')
+        self.assertIsNone(backend.get_user(999999))
+
+        Usuario.objects.filter(pk=self.usuario.pk).update(is_active=False)
+        self.usuario.refresh_from_db()
+        self.usuario.save()
+        self.assertIsNone(backend.get_user(self.usuario.pk))
+
+    def test_la_cache_no_guarda_la_contrasena(self):
+        from .backends import EmailBackend, clave_usuario
+
+        user = EmailBackend().get_user(self.usuario.pk)
+        self.assertNotIn(self.usuario.password, repr(cache.get(clave_usuario(self.usuario.pk))))
+        self.assertIn('password', user.get_deferred_fields())
+        self.assertEqual(user.get_session_auth_hash(), self.usuario.get_session_auth_hash())
+
+        # Guardar el usuario cacheado no pisa la contraseña
+        user.telefono = '3000000001'
+        user.save()
+        self.assertTrue(Usuario.objects.get(pk=self.usuario.pk).check_password('clave-segura-123'))
+
+    def test_benchmark(self):
+        salida = io.StringIO()
+        call_command('benchmark_sesiones', peticiones=1, stdout=salida)
+        self.assertIn('cached_db', salida.getvalue())
+        self.assertFalse(Usuario.objects.filter(username='benchmark_sesiones').exists())
+
+
+class LoginLimitadoTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario()
+        self.url = reverse('login_usuario')
+
+    def intentar(self, email, password='incorrecta', ip='10.0.0.1'):
+        return self.client.post(self.url, {'email': email, 'password': password}, REMOTE_ADDR=ip)
+
+    def contar_hashes(self):
+        from django.contrib.auth.hashers import PBKDF2PasswordHasher
+
+        return mock.patch.object(
+            PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=PBKDF2PasswordHasher.encode,
+        )
+
+    def test_email_inexistente_cuesta_un_hash(self):
+        with self.contar_hashes() as encode:
+            self.intentar('nadie@example.com')
+        self.assertEqual(encode.call_count, 1)
+
+    def test_contrasena_incorrecta_no_se_repite_en_model_backend(self):
+        with self.contar_hashes() as encode:
+            respuesta = self.intentar(self.usuario.email)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(encode.call_count, 1)
+
+    @override_settings(LOGIN_LIMITE_EMAIL=(3, 300))
+    def test_limite_por_email(self):
+        for _ in range(3):
+            self.assertEqual(self.intentar(self.usuario.email).status_code, 200)
+        with self.contar_hashes() as encode:
+            respuesta = self.intentar(self.usuario.email, password='clave-segura-123', ip='10.0.0.2')
+        self.assertEqual(respuesta.status_code, 429)
+        encode.assert_not_called()
+        # Otra cuenta desde otra IP no se ve afectada
+        self.assertEqual(self.intentar('otra@example.com', ip='10.0.0.3').status_code, 200)
+
+    @override_settings(LOGIN_LIMITE_IP=(2, 60))
+    def test_limite_por_ip(self):
+        self.intentar('a@example.com')
+        self.intentar('b@example.com')
+        self.assertEqual(self.intentar('c@example.com').status_code, 429)
+        self.assertEqual(self.intentar('c@example.com', ip='10.0.0.9').status_code, 200)
+
+    @override_settings(LOGIN_HASHES_ESPERA=0.01)
+    def test_sin_hueco_para_el_hash_es_sobrecarga(self):
+        from . import limites
+
+        with mock.patch.object(limites.limite_hashes, 'adquirir', return_value=False), \
+                mock.patch.object(limites.limite_hashes, 'liberar') as liberar:
+            respuesta = self.intentar(self.usuario.email, password='clave-segura-123')
+        self.assertEqual(respuesta.status_code, 503)
+        self.assertEqual(respuesta['Retry-After'], '1')
+        self.assertContains(respuesta, 'El servidor está ocupado', status_code=503)
+        self.assertNotContains(respuesta, 'Demasiados intentos', status_code=503)
+        liberar.assert_not_called()
+        # No cuenta como intento del cliente: con hueco entra
+        self.assertRedirects(
+            self.intentar(self.usuario.email, password='clave-segura-123'),
+            reverse('inicio'), fetch_redirect_response=False,
+        )
+
+    @override_settings(LOGIN_LIMITE_IP=(2, 60), IP_CLIENTE_PROXIES=1)
+    def test_ip_de_la_cabecera_del_proxy(self):
+        def intentar(email, reenviada):
+            return self.client.post(
+                self.url, {'email': email, 'password': 'x'},
+                REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR=reenviada,
+            )
+
+        # El cliente no puede esquivar el límite inventando direcciones a la izquierda
+        intentar('a@example.com', '1.1.1.1, 10.0.0.1')
+        intentar('b@example.com', '2.2.2.2, 10.0.0.1')
+        self.assertEqual(intentar('c@example.com', '3.3.3.3, 10.0.0.1').status_code, 429)
+        # Detrás del mismo proxy, otro cliente tiene su propio cubo
+        self.assertEqual(intentar('c@example.com', '10.0.0.2').status_code, 200)
+
+    def test_ip_cliente(self):
+        from django.test import RequestFactory
+        from .backends import ip_cliente
+
+        peticion = RequestFactory().get('/', REMOTE_ADDR='127.0.0.1', HTTP_X_FORWARDED_FOR='9.9.9.9, 10.0.0.1, 10.0.0.2')
+        self.assertEqual(ip_cliente(peticion), '127.0.0.1')
+        for proxies, ip in ((1, '10.0.0.2'), (2, '10.0.0.1'), (3, '9.9.9.9'), (4, '127.0.0.1')):
+            with self.settings(IP_CLIENTE_PROXIES=proxies):
+                self.assertEqual(ip_cliente(peticion), ip)
+        peticion.META['HTTP_X_FORWARDED_FOR'] = 'no-es-una-ip'
+        with self.settings(IP_CLIENTE_PROXIES=1):
+            self.assertEqual(ip_cliente(peticion), '127.0.0.1')
+
+    def test_cubo_se_recarga(self):
+        from . import limites
+
+        with mock.patch('core.limites.time.time', return_value=1000.0):
+            self.assertTrue(limites.consumir('prueba', 1, 10))
+            self.assertFalse(limites.consumir('prueba', 1, 10))
+        with mock.patch('core.limites.time.time', return_value=1010.0):
+            self.assertTrue(limites.consumir('prueba', 1, 10))
+
+    def test_login_correcto_y_admin(self):
+        respuesta = self.intentar(self.usuario.email, password='clave-segura-123')
+        self.assertRedirects(respuesta, reverse('inicio'), fetch_redirect_response=False)
+        # El login por username sigue pasando por ModelBackend
+        from django.contrib.auth import authenticate
+        self.assertEqual(authenticate(username='ana', password='clave-segura-123'), self.usuario)
+
+
+class CatalogoImportExportTests(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=os.path.join(self.directorio, 'media'))
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache.clear()
+
+    def archivo(self, nombre, contenido):
+        ruta = os.path.join(self.directorio, nombre)
+        with open(ruta, 'w', encoding='utf-8', newline='') as destino:
+            destino.write(contenido)
+        return ruta
+
+    def importar(self, *args, **opciones):
+        call_command('import_catalogue', *args, stdout=io.StringIO(), **opciones)
+
+    def importar_fundaciones(self):
+        self.importar('fundaciones', self.archivo('fundaciones.csv', (
+            'nombre,direccion,telefono,email,descripcion,capacidad\n'
+            'Huellitas,Calle 1,3000000000,h@example.com,Rescate canino,10\n'
+            'Patitas,Calle 2,3000000001,p@example.com,,5\n'
+        )))
+
+    def test_importa_fundaciones_y_mascotas(self):
+        self.importar_fundaciones()
+        self.importar('mascotas', self.archivo('mascotas.jsonl', (
+            '{"nombre": "Luna", "especie": "Gato", "edad": 2, "fundacion": "Patitas"}\n'
+            '{"nombre": "Rocky", "especie": "Perro", "edad": "4", "disponible": false, "fundacion": "Patitas"}\n'
+            '\n'
+            '{"nombre": "Toby", "especie": "Perro", "edad": 1, "fundacion": "Huellitas"}\n'
+        )), lote=2)
+
+        patitas = Fundacion.objects.get(nombre='Patitas')
+        self.assertIsNone(patitas.descripcion)
+        self.assertEqual(Mascota.objects.filter(fundacion=patitas).count(), 2)
+        self.assertEqual((patitas.total_mascotas, patitas.mascotas_disponibles), (2, 1))
+        # Las operaciones masivas no disparan señales: el índice se actualiza aparte
+        from . import busqueda
+        resultados, _ = busqueda.buscar('toby')
+        self.assertEqual(resultados[0]['id'], Mascota.objects.get(nombre='Toby').pk)
+        # Solo las disponibles
+        self.assertEqual(busqueda.buscar('rocky'), ([], False))
+
+    def test_reimportar_con_id_actualiza(self):
+        self.importar_fundaciones()
+        huellitas = Fundacion.objects.get(nombre='Huellitas')
+        self.importar('fundaciones', self.archivo('cambios.csv', (
+            'id,nombre,direccion,telefono,email,descripcion,capacidad\n'
+            f'{huellitas.pk},Huellitas,Calle 9,3000000000,h@example.com,,30\n'
+        )))
+        huellitas.refresh_from_db()
+        self.assertEqual((huellitas.direccion, huellitas.capacidad), ('Calle 9', 30))
+        self.assertEqual(Fundacion.objects.count(), 2)
+
+    def test_reimportar_parcial_solo_cambia_lo_que_trae(self):
+        self.importar_fundaciones()
+        patitas = Fundacion.objects.get(nombre='Patitas')
+        adopcion = crear_adopciones(crear_usuario(), patitas, 1)[0]
+        Mascota.objects.filter(pk=adopcion.mascota_id).update(foto='mascotas/luna.jpg')
+
+        self.importar('mascotas', self.archivo('edad.csv', f'id,edad,foto\n{adopcion.mascota_id},7,\n'))
+        mascota = Mascota.objects.get()
+        self.assertEqual((mascota.edad, mascota.nombre, mascota.foto.name), (7, 'Mascota 0', 'mascotas/luna.jpg'))
+        self.assertFalse(mascota.disponible)
+
+        # Con una adopción activa, ni siquiera archivada, vuelve a estar disponible
+        historial.archivar_lote(timezone.localdate() + timedelta(days=1))
+        self.importar('mascotas', self.archivo('disponible.csv', f'id,disponible\n{mascota.pk},1\n'))
+        self.assertFalse(Mascota.objects.get().disponible)
+
+    def test_cambio_de_fundacion_recalcula_las_dos(self):
+        self.importar_fundaciones()
+        patitas, huellitas = Fundacion.objects.get(nombre='Patitas'), Fundacion.objects.get(nombre='Huellitas')
+        self.importar('mascotas', self.archivo('luna.csv', 'nombre,especie,edad,fundacion\nLuna,Gato,2,Patitas\n'))
+        luna = Mascota.objects.get()
+
+        self.importar('mascotas', self.archivo('mudanza.csv', f'id,fundacion\n{luna.pk},Huellitas\n'))
+        patitas.refresh_from_db()
+        huellitas.refresh_from_db()
+        self.assertEqual((patitas.total_mascotas, huellitas.total_mascotas), (0, 1))
+        self.assertEqual(busqueda.buscar('luna')[0][0]['url'], reverse('fundacion_detalle', args=[huellitas.pk]))
+
+    def test_ids_de_fundaciones_eliminadas(self):
+        from django.core.management.base import CommandError
+
+        self.importar_fundaciones()
+        patitas = Fundacion.objects.get(nombre='Patitas')
+        luna = Mascota.objects.create(nombre='Luna', especie='Gato', edad=2, fundacion=patitas)
+        with self.captureOnCommitCallbacks(execute=False):
+            borrado.marcar(patitas, programar=False)
+        with self.assertRaisesMessage(CommandError, 'fundaciones eliminadas'):
+            self.importar('mascotas', self.archivo('luna.csv', f'id,nombre\n{luna.pk},Nala\n'))
+        self.assertEqual(Mascota.objects.get().nombre, 'Luna')
+        self.assertEqual(busqueda.buscar('nala')[0], [])
+
+    def test_fundacion_inexistente(self):
+        from django.core.management.base import CommandError
+
+        ruta = self.archivo('mascotas.csv', 'nombre,especie,edad,fundacion\nLuna,Gato,2,Nadie\n')
+        with self.assertRaisesMessage(CommandError, 'Nadie'):
+            self.importar('mascotas', ruta)
+        self.assertFalse(Mascota.objects.exists())
+
+    def test_exportar_e_importar_ida_y_vuelta(self):
+        self.importar_fundaciones()
+        fundacion = Fundacion.objects.get(nombre='Huellitas')
+        Mascota.objects.create(nombre='Luna', especie='Gato', edad=2, fundacion=fundacion)
+        ruta = os.path.join(self.directorio, 'mascotas.jsonl')
+        call_command('export_catalogue', 'mascotas', ruta, stdout=io.StringIO())
+
+        Mascota.objects.all().delete()
+        self.importar('mascotas', ruta)
+        mascota = Mascota.objects.get()
+        self.assertEqual((mascota.nombre, mascota.fundacion_id), ('Luna', fundacion.pk))
+
+    def test_importa_fotos_desde_directorio(self):
+        self.importar_fundaciones()
+        fotos = os.path.join(self.directorio, 'fotos')
+        os.makedirs(fotos)
+        for nombre in ('luna.jpg', 'copia.jpg'):
+            with open(os.path.join(fotos, nombre), 'wb') as destino:
+                destino.write(imagen_de_prueba().read())
+
+        with mock.patch('core.catalogo.imagenes.encolar') as encolar:
+            self.importar('mascotas', self.archivo('mascotas.csv', (
+                'nombre,especie,edad,fundacion,foto\n'
+                'Luna,Gato,2,Huellitas,luna.jpg\n'
+                'Sol,Gato,3,Huellitas,copia.jpg\n'
+            )), fotos=fotos)
+
+        luna, sol = Mascota.objects.order_by('nombre')
+        self.assertEqual(luna.foto.name, sol.foto.name)
+        self.assertEqual(encolar.call_count, 2)
+
+    def test_lote_fallido_borra_sus_fotos(self):
+        self.importar_fundaciones()
+        fotos = os.path.join(self.directorio, 'fotos')
+        os.makedirs(fotos)
+        for nombre, color in (('luna.jpg', 'red'), ('sol.jpg', 'blue')):
+            with open(os.path.join(fotos, nombre), 'wb') as destino:
+                destino.write(imagen_de_prueba(color=color).read())
+        with mock.patch('core.catalogo.imagenes.encolar'):
+            self.importar('mascotas', self.archivo('luna.csv', (
+                'nombre,especie,edad,fundacion,foto\nLuna,Gato,2,Huellitas,luna.jpg\n'
+            )), fotos=fotos)
+        luna = Mascota.objects.get()
+
+        with mock.patch('core.catalogo.busqueda.indexar_varios', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.importar('mascotas', self.archivo('mascotas.csv', (
+                    'nombre,especie,edad,fundacion,foto\n'
+                    'Copia,Gato,2,Huellitas,luna.jpg\n'
+                    'Sol,Gato,3,Huellitas,sol.jpg\n'
+                )), fotos=fotos)
+
+        self.assertEqual(Mascota.objects.count(), 1)
+        # La foto nueva no queda huérfana; la que ya usaba Luna se conserva
+        directorio = os.path.join(self.directorio, 'media', 'mascotas')
+        self.assertEqual(os.listdir(directorio), [os.path.basename(luna.foto.name)])
+
+    def test_ids_explicitos_reinician_la_secuencia(self):
+        from django.db import connection as conexion
+
+        self.importar_fundaciones()
+        fundacion = Fundacion.objects.get(nombre='Huellitas')
+        with mock.patch.object(conexion.ops, 'sequence_reset_sql', wraps=conexion.ops.sequence_reset_sql) as reinicio:
+            self.importar('mascotas', self.archivo('sin_id.csv', 'nombre,especie,edad,fundacion\nLuna,Gato,2,Huellitas\n'))
+            reinicio.assert_not_called()
+            self.importar('mascotas', self.archivo('con_id.csv', (
+                'id,nombre,especie,edad,fundacion\n'
+                '500,Rocky,Perro,4,Huellitas\n'
+                ',Toby,Perro,1,Huellitas\n'
+            )))
+        self.assertEqual(reinicio.call_args.args[1], [Mascota])
+        toby = Mascota.objects.get(nombre='Toby')
+        self.assertGreater(toby.pk, 500)
+        self.assertEqual(Mascota.objects.filter(fundacion=fundacion).count(), 3)
+
+
+class PerfiladoTests(TestCase):
+    def setUp(self):
+        from . import perfilado
+
+        self.perfilado = perfilado
+        perfilado.reiniciar()
+        self.addCleanup(perfilado.reiniciar)
+        ajustes = override_settings(PERFILADO_ACTIVO=True)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        cache.clear()
+        self.usuario = crear_usuario(is_staff=True)
+        self.client.force_login(self.usuario)
+        crear_adopciones(self.usuario, crear_fundacion(), 3)
+
+    def test_agrupa_por_nombre_de_url(self):
+        for _ in range(3):
+            self.client.get(reverse('mis_adopciones'))
+        datos = self.perfilado.informe()['mis_adopciones']
+        self.assertEqual(datos['peticiones'], 3)
+        self.assertGreater(datos['consultas']['p99'], 0)
+        self.assertGreater(datos['plantillas_ms']['p50'], 0)
+        self.assertEqual(set(datos['total_ms']), {'p50', 'p95', 'p99'})
+
+    def test_detecta_consultas_repetidas(self):
+        medicion = self.perfilado.Medicion()
+        with connection.execute_wrapper(medicion.ejecutar):
+            for adopcion in Adopcion.objects.all():
+                adopcion.mascota.nombre
+        self.assertEqual(medicion.duplicadas(), 2)
+        sql, veces = medicion.mas_repetida()
+        self.assertEqual(veces, 3)
+        self.assertIn('core_mascota', sql)
+
+    def test_desactivado_por_defecto(self):
+        with override_settings(PERFILADO_ACTIVO=False):
+            from django.test import Client
+
+            cliente = Client()
+            cliente.force_login(self.usuario)
+            cliente.get(reverse('mis_adopciones'))
+        self.assertEqual(self.perfilado.informe(), {})
+
+    def test_pdf_fuera_de_peticion(self):
+        facturas.render_to_pdf(facturas.PLANTILLA_PDF, {'adopcion': Adopcion.objects.first()})
+        self.assertGreater(self.perfilado.informe()['fondo:pdf']['pdf_ms']['p50'], 0)
+
+    def test_pagina_y_comando(self):
+        ruta = os.path.join(tempfile.mkdtemp(), 'perfilado.jsonl')
+        self.addCleanup(shutil.rmtree, os.path.dirname(ruta), ignore_errors=True)
+        with override_settings(PERFILADO_ARCHIVO=ruta):
+            self.client.get(reverse('inicio'))
+            respuesta = self.client.get(reverse('informe_perfilado'))
+        self.assertContains(respuesta, 'inicio')
+
+        salida = io.StringIO()
+        call_command('informe_perfilado', ruta, '--json', stdout=salida)
+        self.assertEqual(json.loads(salida.getvalue())['inicio']['peticiones'], 1)
+
+
+class BenchmarkVistasTests(TestCase):
+    def test_informe_json_y_presupuestos(self):
+        cache.set('ajena', 1)
+        ruta = os.path.join(tempfile.mkdtemp(), 'benchmark.json')
+        self.addCleanup(shutil.rmtree, os.path.dirname(ruta), ignore_errors=True)
+        call_command(
+            'benchmark_vistas', fundaciones=2, mascotas=10, usuarios=2, adopciones=2,
+            peticiones=3, salida=ruta, forzar=True, stdout=io.StringIO(),
+        )
+        with open(ruta, encoding='utf-8') as origen:
+            informe = json.load(origen)
+
+        self.assertEqual(set(informe['vistas']), {
+            'inicio', 'fundacion_detalle', 'mis_adopciones', 'adoptar_mascota',
+            'factura_html', 'factura_pdf', 'factura_pdf_render',
+        })
+        inicio = informe['vistas']['inicio']['caliente']
+        self.assertLessEqual(inicio['consultas'], inicio['presupuesto'])
+        self.assertLessEqual(inicio['p50_ms'], inicio['p99_ms'])
+        # Medido con un único cliente secuencial, y así se nombra
+        self.assertIn('peticiones_s_secuencial', inicio)
+        self.assertNotIn('peticiones_s', inicio)
+        # Los datos sintéticos se deshacen al terminar
+        self.assertFalse(Fundacion.objects.exists())
+        # Con su propia cache: la configurada no se vacía
+        self.assertEqual(cache.get('ajena'), 1)
+
+    def test_sin_debug_pide_forzar(self):
+        from django.core.management.base import CommandError
+
+        with self.assertRaisesMessage(CommandError, '--forzar'):
+            call_command('benchmark_vistas', fundaciones=1, mascotas=10, usuarios=1, adopciones=1,
+                         peticiones=1, stdout=io.StringIO())
+        self.assertFalse(Fundacion.objects.exists())
+
+    def test_presupuesto_superado_falla(self):
+        from django.core.management.base import CommandError
+
+        with mock.patch.dict(
+            'core.management.commands.benchmark_vistas.PRESUPUESTOS',
+            {'inicio': {'frio': 0, 'caliente': 0}},
+        ):
+            with self.assertRaisesMessage(CommandError, 'inicio (frio)'):
+                call_command(
+                    'benchmark_vistas', fundaciones=1, mascotas=10, usuarios=1, adopciones=1, forzar=True,
+                    peticiones=1, stdout=io.StringIO(),
+                )
+
+
+class AdminTablasGrandesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = crear_usuario('admin', is_staff=True, is_superuser=True)
+        self.client.force_login(self.admin)
+        self.fundacion = crear_fundacion()
+
+    def consultas_listado(self, nombre):
+        url = reverse(f'admin:core_{nombre}_changelist')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as capturadas:
+            respuesta = self.client.get(url)
+        self.assertEqual(respuesta.status_code, 200)
+        return len(capturadas)
+
+    def test_consultas_no_crecen_con_las_filas(self):
+        crear_adopciones(self.admin, self.fundacion, 2)
+        adopciones, mascotas = self.consultas_listado('adopcion'), self.consultas_listado('mascota')
+        crear_adopciones(crear_usuario('otro'), crear_fundacion(nombre='Otra'), 20)
+        self.assertEqual(self.consultas_listado('adopcion'), adopciones)
+        self.assertEqual(self.consultas_listado('mascota'), mascotas)
+
+    def test_paginador_estima_sin_filtros(self):
+        from .admin import PaginadorEstimado
+
+        adopciones = crear_adopciones(self.admin, self.fundacion, 3)
+        with mock.patch.object(PaginadorEstimado, 'UMBRAL', 0):
+            # Sin estadísticas se cuenta de verdad
+            self.assertEqual(PaginadorEstimado(Adopcion.objects.order_by('pk'), 50).count, 3)
+            historial.analizar()
+            Adopcion.objects.filter(pk=adopciones[0].pk).delete()
+            estimado = PaginadorEstimado(Adopcion.objects.order_by('pk'), 50)
+            filtrado = PaginadorEstimado(Adopcion.objects.filter(activa=True).order_by('pk'), 50)
+            with self.assertNumQueries(1):
+                self.assertEqual(estimado.count, 3)
+            self.assertEqual(filtrado.count, 2)
+        # Por debajo del umbral se cuenta de verdad
+        self.assertEqual(PaginadorEstimado(Adopcion.objects.order_by('pk'), 50).count, 2)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Estadísticas de ANALYZE')
+    def test_pagina_fuera_de_rango_devuelve_la_ultima_real(self):
+        from .admin import PaginadorEstimado
+
+        adopciones = crear_adopciones(self.admin, self.fundacion, 4)
+        historial.analizar()
+        Adopcion.objects.filter(pk__in=[a.pk for a in adopciones[:3]]).delete()
+        with mock.patch.object(PaginadorEstimado, 'UMBRAL', 0):
+            paginador = PaginadorEstimado(Adopcion.objects.order_by('pk'), 1)
+            self.assertEqual(paginador.num_pages, 4)
+            pagina = paginador.page(3)
+        self.assertEqual(pagina.number, 1)
+        self.assertEqual([a.pk for a in pagina.object_list], [adopciones[-1].pk])
+        self.assertEqual((paginador.count, paginador.num_pages), (1, 1))
+
+        url = reverse('admin:core_adopcion_changelist')
+        with mock.patch.object(PaginadorEstimado, 'UMBRAL', 0):
+            respuesta = self.client.get(url, {'p': 2})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertContains(respuesta, str(adopciones[-1].mascota))
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Perfil de producción de SQLite')
+class SQLiteProduccionTests(TransactionTestCase):
+    databases = {'default', 'lectura'}
+    LECTORES = 4
+    ESCRITORES = 4
+    RONDAS = 15
+
+    def test_pragmas_y_conexion_de_lectura(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        with self.assertRaises(OperationalError):
+            with connections['lectura'].cursor() as cursor:
+                cursor.execute("UPDATE core_fundacion SET nombre = 'x'")
+
+    def test_lecturas_y_escrituras_concurrentes(self):
+        fundacion = crear_fundacion()
+        mascotas = [
+            Mascota.objects.create(nombre=f'Mascota {i}', especie='Perro', edad=1, fundacion=fundacion)
+            for i in range(self.ESCRITORES * self.RONDAS)
+        ]
+        usuarios = [crear_usuario(f'usuario{i}') for i in range(self.LECTORES + self.ESCRITORES)]
+        errores = []
+        lecturas_replica = []
+        barrera = threading.Barrier(self.LECTORES + self.ESCRITORES)
+
+        def escribir(indice, usuario):
+            from django.contrib.sessions.backends.cached_db import SessionStore
+            try:
+                barrera.wait()
+                for ronda in range(self.RONDAS):
+                    servicios.adoptar(mascotas[indice * self.RONDAS + ronda], usuario)
+                    sesion = SessionStore()
+                    sesion['ronda'] = ronda
+                    sesion.save()
+            except Exception as error:
+                errores.append(error)
+            finally:
+                connections.close_all()
+
+        def leer(usuario):
+            from django.test import Client
+            consultas = []
+            try:
+                cliente = Client()
+                cliente.force_login(usuario)
+                barrera.wait()
+                with connections['lectura'].execute_wrapper(
+                    lambda execute, *args: consultas.append(1) or execute(*args)
+                ):
+                    for _ in range(self.RONDAS):
+                        for url in (reverse('fundacion_detalle', args=[fundacion.pk]), reverse('mis_adopciones')):
+                            cache.clear()
+                            self.assertEqual(cliente.get(url).status_code, 200)
+                lecturas_replica.append(len(consultas))
+            except Exception as error:
+                errores.append(error)
+            finally:
+                connections.close_all()
+
+        hilos = [threading.Thread(target=escribir, args=(i, u)) for i, u in enumerate(usuarios[:self.ESCRITORES])]
+        hilos += [threading.Thread(target=leer, args=(u,)) for u in usuarios[self.ESCRITORES:]]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+
+        self.assertEqual(errores, [])
+        self.assertEqual(Adopcion.objects.count(), self.ESCRITORES * self.RONDAS)
+        # Las vistas @solo_lectura leyeron por la conexión de lectura
+        self.assertEqual(len(lecturas_replica), self.LECTORES)
+        self.assertTrue(all(lecturas_replica))
+
+
+class ConfiguracionPostgresTests(SimpleTestCase):
+    """Las ramas de settings.py que dependen de variables de entorno."""
+
+    def cargar(self, **entorno):
+        import importlib
+        import runpy
+        from django.conf import settings as ajustes
+
+        variables = {'DB_ENGINE': 'postgres', **entorno}
+        with mock.patch.dict(os.environ, variables):
+            for nombre in ('SERVIDOR_WEB', 'DB_POOL', 'DB_LECTURA_HOST', 'DB_STATEMENT_TIMEOUT_MS'):
+                if nombre not in variables:
+                    os.environ.pop(nombre, None)
+            return runpy.run_path(importlib.import_module(ajustes.SETTINGS_MODULE).__file__)['DATABASES']
+
+    def test_sin_limite_fuera_de_la_web(self):
+        bases = self.cargar()
+        self.assertEqual(bases['default']['ENGINE'], 'django.db.backends.postgresql')
+        self.assertNotIn('options', bases['default']['OPTIONS'])
+        self.assertEqual(bases['default']['CONN_MAX_AGE'], 60)
+        self.assertNotIn('lectura', bases)
+
+    def test_limite_en_los_workers_web(self):
+        opciones = self.cargar(SERVIDOR_WEB='1')['default']['OPTIONS']
+        self.assertEqual(opciones['options'], '-c statement_timeout=5000')
+        self.assertNotIn('options', self.cargar(SERVIDOR_WEB='1', DB_STATEMENT_TIMEOUT_MS='0')['default']['OPTIONS'])
+
+    def test_pools(self):
+        psycopg = self.cargar(DB_POOL='psycopg', DB_POOL_MAX='20')['default']
+        self.assertEqual(psycopg['CONN_MAX_AGE'], 0)
+        self.assertEqual(psycopg['OPTIONS']['pool'], {'min_size': 2, 'max_size': 20})
+        pgbouncer = self.cargar(DB_POOL='pgbouncer', SERVIDOR_WEB='1')['default']
+        self.assertTrue(pgbouncer['DISABLE_SERVER_SIDE_CURSORS'])
+        self.assertNotIn('options', pgbouncer['OPTIONS'])
+
+    def test_replica_de_lectura(self):
+        bases = self.cargar(DB_LECTURA_HOST='replica')
+        self.assertEqual(bases['lectura']['HOST'], 'replica')
+        self.assertEqual(bases['lectura']['TEST'], {'MIRROR': 'default'})
+
+
+class VistasAsincronasTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario()
+        self.fundacion = crear_fundacion(nombre='Patitas')
+        crear_adopciones(self.usuario, self.fundacion, 2)
+        Mascota.objects.create(nombre='Kira', especie='Perro', edad=2, fundacion=self.fundacion)
+
+    async def test_vistas_bajo_asgi(self):
+        from django.test import AsyncClient
+
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.usuario)
+        for _ in range(2):  # fallo y acierto de la cache de fragmentos
+            respuesta = await cliente.get(reverse('inicio'))
+            self.assertContains(respuesta, 'Patitas')
+            respuesta = await cliente.get(reverse('fundacion_detalle', args=[self.fundacion.pk]))
+            self.assertContains(respuesta, 'Kira')
+            respuesta = await cliente.get(reverse('mis_adopciones'))
+            self.assertContains(respuesta, 'Mascota 1')
+        respuesta = await cliente.get(reverse('buscar'), {'q': 'kira'})
+        self.assertEqual(respuesta.json()['resultados'][0]['titulo'], 'Kira')
+
+    async def test_anonimo_redirige_al_login(self):
+        from django.test import AsyncClient
+
+        cliente = AsyncClient()
+        for url in (reverse('inicio'), reverse('fundacion_detalle', args=[self.fundacion.pk]),
+                    reverse('mis_adopciones')):
+            respuesta = await cliente.get(url)
+            self.assertEqual(respuesta.status_code, 302, url)
+            self.assertTrue(respuesta['Location'].startswith(reverse('login_usuario')), url)
+
+    async def test_fundacion_inexistente_o_eliminada_da_404(self):
+        from django.test import AsyncClient
+
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.usuario)
+        eliminada = await Fundacion.objects.acreate(
+            nombre='Cerrada', direccion='-', telefono='-', email='c@example.com', eliminada=timezone.now(),
+        )
+        for pk in (eliminada.pk, eliminada.pk + 1000):
+            respuesta = await cliente.get(reverse('fundacion_detalle', args=[pk]))
+            self.assertEqual(respuesta.status_code, 404)
+
+    async def test_mis_adopciones_pagina_con_cursor(self):
+        from django.test import AsyncClient
+
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.usuario)
+        respuesta = await cliente.get(reverse('mis_adopciones'), {'cursor': 'basura'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.context['total_adopciones'], 2)
+
+    async def test_cache_y_render_fuera_del_bucle(self):
+        from django.test import AsyncClient
+        from . import views
+
+        def fuera_del_bucle(funcion):
+            def envoltura(*args, **kwargs):
+                with self.assertRaises(RuntimeError):
+                    asyncio.get_running_loop()
+                return funcion(*args, **kwargs)
+            return envoltura
+
+        cliente = AsyncClient()
+        await cliente.aforce_login(self.usuario)
+        with mock.patch.object(views, 'render', fuera_del_bucle(views.render)), \
+                mock.patch.object(fragmentos, 'obtener', fuera_del_bucle(fragmentos.obtener)):
+            for url in (reverse('inicio'), reverse('fundacion_detalle', args=[self.fundacion.pk]),
+                        reverse('mis_adopciones')):
+                self.assertEqual((await cliente.get(url)).status_code, 200)
+
+    def test_fragmento_precargado_no_se_vuelve_a_leer(self):
+        self.client.force_login(self.usuario)
+        self.client.get(reverse('inicio'))
+        with mock.patch('core.fragmentos.obtener_o_renderizar', wraps=fragmentos.obtener_o_renderizar) as obtener:
+            self.client.get(reverse('inicio'))
+        self.assertIsNotNone(obtener.call_args.kwargs['precargado'])
+
+
+@override_settings(CACHE_FRAGMENTOS_COMPARTIDA=True)
+class APILecturaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario()
+        self.fundacion = crear_fundacion()
+        self.otra = crear_fundacion(nombre='Otra')
+        self.kira = Mascota.objects.create(nombre='Kira', especie='Perro', edad=2, fundacion=self.fundacion)
+        Mascota.objects.create(nombre='Misu', especie='Gato', edad=1, fundacion=self.fundacion)
+
+    def test_fundaciones_y_mascotas_filtradas(self):
+        datos = self.client.get(reverse('api_fundaciones')).json()
+        self.assertEqual([f['nombre'] for f in datos['resultados']], ['Huellitas', 'Otra'])
+        self.assertEqual(datos['resultados'][0]['total_mascotas'], 2)
+
+        datos = self.client.get(reverse('api_mascotas'), {
+            'fundacion': self.fundacion.pk, 'especie': 'Perro', 'disponible': '1',
+        }).json()
+        self.assertEqual(datos['resultados'], [{
+            'id': self.kira.pk, 'nombre': 'Kira', 'especie': 'Perro', 'edad': 2,
+            'disponible': True, 'fundacion_id': self.fundacion.pk, 'foto': None,
+        }])
+        self.assertIsNone(datos['siguiente'])
+
+    @mock.patch('core.api.RESULTADOS_POR_PAGINA', 1)
+    def test_paginacion_por_cursor(self):
+        primera = self.client.get(reverse('api_mascotas')).json()
+        segunda = self.client.get(reverse('api_mascotas'), {'cursor': primera['siguiente']}).json()
+        self.assertEqual([m['nombre'] for m in primera['resultados'] + segunda['resultados']], ['Kira', 'Misu'])
+
+    def test_304_hasta_que_cambia_la_fundacion(self):
+        url = reverse('api_mascotas')
+        parametros = {'fundacion': self.fundacion.pk}
+        respuesta = self.client.get(url, parametros)
+        etag = respuesta['ETag']
+        self.assertIn('Last-Modified', respuesta)
+
+        with self.assertNumQueries(0):
+            respuesta = self.client.get(url, parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+
+        # Cambios en otra fundación no afectan a esta
+        with self.captureOnCommitCallbacks(execute=True):
+            Mascota.objects.create(nombre='Nube', especie='Gato', edad=3, fundacion=self.otra)
+        self.assertEqual(self.client.get(url, parametros, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Mascota.objects.create(nombre='Luna', especie='Gato', edad=3, fundacion=self.fundacion)
+        respuesta = self.client.get(url, parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    @override_settings(CACHE_FRAGMENTOS_COMPARTIDA=None)
+    def test_etag_de_contenido_con_cache_por_proceso(self):
+        self.assertFalse(fragmentos.compartida())
+        url = reverse('api_mascotas')
+        parametros = {'fundacion': self.fundacion.pk}
+        respuesta = self.client.get(url, parametros)
+        etag = respuesta['ETag']
+        # Los sellos de este proceso no sirven como validadores
+        self.assertNotIn('Last-Modified', respuesta)
+
+        respuesta = self.client.get(url, parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 304)
+        self.assertEqual(respuesta['ETag'], etag)
+
+        # update() no pasa por las señales: los sellos siguen igual, el contenido no
+        Mascota.objects.filter(pk=self.kira.pk).update(nombre='Kiara')
+        respuesta = self.client.get(url, parametros, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertNotEqual(respuesta['ETag'], etag)
+
+    def test_sellos_con_caducidad(self):
+        with mock.patch.object(cache, 'add', wraps=cache.add) as add, \
+                mock.patch.object(cache, 'set', wraps=cache.set) as set_:
+            fragmentos.version('prueba')
+            fragmentos.invalidar('prueba')
+        self.assertTrue(add.call_args_list and set_.call_args_list)
+        self.assertTrue(all(llamada.args[2] for llamada in add.call_args_list))
+        self.assertTrue(all(llamada.args[2] for llamada in set_.call_args_list))
+
+    def test_mis_adopciones(self):
+        self.assertEqual(self.client.get(reverse('api_mis_adopciones')).status_code, 401)
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('api_mis_adopciones'))
+        self.assertEqual(respuesta.json()['resultados'], [])
+        etag = respuesta['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True), mock.patch('core.facturas.encolar'):
+            servicios.adoptar(self.kira, self.usuario)
+        respuesta = self.client.get(reverse('api_mis_adopciones'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['resultados'][0]['mascota__nombre'], 'Kira')
+        self.assertIn('private', respuesta['Cache-Control'])
+
+
+class EstaticosTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.raiz = tempfile.mkdtemp(prefix='estaticos-')
+        cls.ajustes = override_settings(STATIC_ROOT=cls.raiz)
+        cls.ajustes.enable()
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.ajustes.disable()
+        shutil.rmtree(cls.raiz, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+
+    def _enlaces(self, respuesta):
+        return re.findall(r'href="(/static/[^"]+\.css)"', respuesta.content.decode())
+
+    def test_plantillas_enlazan_css_con_hash(self):
+        enlaces = self._enlaces(self.client.get(reverse('login_usuario')))
+        self.assertEqual(len(enlaces), 2)
+        for enlace in enlaces:
+            self.assertRegex(enlace, r'^/static/core/css/(base|login)\.[0-9a-f]{12}\.css$')
+            self.assertTrue(os.path.isfile(os.path.join(self.raiz, enlace[len('/static/'):] + '.gz')))
+
+    def test_sirve_variante_comprimida_inmutable(self):
+        enlace = self._enlaces(self.client.get(reverse('login_usuario')))[0]
+        respuesta = self.client.get(enlace, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(respuesta['Content-Encoding'], 'gzip')
+        self.assertEqual(respuesta['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(respuesta['Vary'], 'Accept-Encoding')
+        self.assertEqual(respuesta['Content-Type'], 'text/css; charset=utf-8')
+        self.assertNotIn('Content-Disposition', respuesta)
+        with open(os.path.join(self.raiz, 'core/css/base.css'), 'rb') as original:
+            self.assertEqual(gzip.decompress(b''.join(respuesta.streaming_content)), original.read())
+
+        sin_comprimir = self.client.get(enlace, HTTP_ACCEPT_ENCODING='identity')
+        self.assertNotIn('Content-Encoding', sin_comprimir)
+        b''.join(sin_comprimir.streaming_content)
+
+        revalidada = self.client.get(enlace, HTTP_IF_NONE_MATCH=respuesta['ETag'])
+        self.assertEqual(revalidada.status_code, 304)
+
+    def test_nombre_sin_hash_cache_corta(self):
+        respuesta = self.client.get('/static/core/css/base.css')
+        self.assertEqual(respuesta['Cache-Control'], 'public, max-age=60')
+        self.assertEqual(respuesta['Content-Type'], 'text/css; charset=utf-8')
+        self.assertNotIn('Content-Disposition', respuesta)
+        b''.join(respuesta.streaming_content)
+        self.assertEqual(self.client.get('/static/core/css/no-existe.css').status_code, 404)
+
+
+class EstadisticasAdopcionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fundacion = crear_fundacion()
+        self.usuario = crear_usuario()
+        self.hoy = date.today()
+
+    def _adoptar(self, especie='Perro', edad=2, dias_en_fundacion=None):
+        mascota = Mascota.objects.create(nombre='Kira', especie=especie, edad=edad, fundacion=self.fundacion)
+        if dias_en_fundacion is not None:
+            mascota.fecha_ingreso = self.hoy - timedelta(days=dias_en_fundacion)
+            Mascota.objects.filter(pk=mascota.pk).update(fecha_ingreso=mascota.fecha_ingreso)
+        with mock.patch('core.facturas.encolar'):
+            return servicios.adoptar(mascota, self.usuario)
+
+    def _filas(self):
+        return list(
+            EstadisticaAdopcion.objects.order_by('especie', 'dia')
+            .values_list('especie', 'dia', 'adopciones', 'suma_edades', 'con_fecha_ingreso', 'suma_dias_espera')
+        )
+
+    def test_cada_adopcion_suma_a_su_fila(self):
+        self._adoptar(edad=2, dias_en_fundacion=10)
+        self._adoptar(edad=4, dias_en_fundacion=4)
+        self._adoptar(especie='Gato', edad=1)
+        self.assertEqual(self._filas(), [
+            ('Gato', self.hoy, 1, 1, 1, 0),
+            ('Perro', self.hoy, 2, 6, 2, 14),
+        ])
+
+    def test_recalcular_es_idempotente(self):
+        self._adoptar(edad=3, dias_en_fundacion=20)
+        antigua = self._adoptar(especie='Gato', edad=5, dias_en_fundacion=50)
+        Adopcion.objects.filter(pk=antigua.pk).update(fecha_adopcion=self.hoy - timedelta(days=40))
+        esperadas = [
+            ('Gato', self.hoy - timedelta(days=40), 1, 5, 1, 10),
+            ('Perro', self.hoy, 1, 3, 1, 20),
+        ]
+
+        salida = io.StringIO()
+        call_command('actualizar_estadisticas', '--dias-por-lote', '7', stdout=salida)
+        self.assertEqual(self._filas(), esperadas)
+        self.assertIn('2 adopciones agregadas', salida.getvalue())
+
+        EstadisticaAdopcion.objects.filter(especie='Perro').update(adopciones=99)
+        call_command('actualizar_estadisticas', stdout=io.StringIO())
+        call_command('actualizar_estadisticas', stdout=io.StringIO())
+        self.assertEqual(self._filas(), esperadas)
+
+    def test_recalcular_lee_y_reemplaza_en_la_misma_transaccion(self):
+        self._adoptar(edad=3)
+        fuera = len(connection.savepoint_ids)
+        lecturas = []
+
+        def anotar(ejecutar, sql, params, many, contexto):
+            if sql.startswith('SELECT') and 'core_adopcion' in sql:
+                lecturas.append(len(connection.savepoint_ids))
+            return ejecutar(sql, params, many, contexto)
+
+        with connection.execute_wrapper(anotar):
+            list(estadisticas.recalcular(self.hoy, self.hoy))
+        self.assertTrue(lecturas)
+        self.assertTrue(all(nivel > fuera for nivel in lecturas))
+
+    def test_panel_solo_lee_las_filas_agregadas(self):
+        self.client.force_login(crear_usuario('visitante'))
+        self.assertEqual(self.client.get(reverse('estadisticas_adopciones')).status_code, 302)
+
+        self.client.force_login(crear_usuario('staff', is_staff=True))
+        self._adoptar(edad=2, dias_en_fundacion=6)
+        self.client.get(reverse('estadisticas_adopciones'))  # sesión y usuario en cache
+
+        with CaptureQueriesContext(connection) as consultas:
+            datos = self.client.get(reverse('estadisticas_adopciones'), {'formato': 'json'}).json()
+        self.assertEqual(datos['totales']['adopciones'], 1)
+        self.assertEqual(datos['totales']['dias_espera_medios'], 6.0)
+        self.assertEqual(datos['por_especie'][0]['especie'], 'Perro')
+        self.assertTrue(all('core_adopcion' not in c['sql'] for c in consultas.captured_queries))
+
+        for _ in range(5):
+            self._adoptar(especie='Gato', edad=1)
+        with self.assertNumQueries(len(consultas)):
+            datos = self.client.get(reverse('estadisticas_adopciones'), {'formato': 'json', 'agrupar': 'semana'}).json()
+        self.assertEqual(datos['totales']['adopciones'], 6)
+
+        respuesta = self.client.get(reverse('estadisticas_adopciones'))
+        self.assertContains(respuesta, 'Estadísticas de adopción')
+
+
+class EventosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.fundacion = crear_fundacion()
+
+    async def test_canales_y_cola_acotada(self):
+        todas = eventos.hub.suscribir(eventos.GLOBAL)
+        propia = eventos.hub.suscribir(eventos.canal_fundacion(1), maximo=2)
+        otra = eventos.hub.suscribir(eventos.canal_fundacion(2))
+        try:
+            for i in range(5):
+                eventos.publicar('mascota', {'id': i}, fundacion_id=1)
+            await asyncio.sleep(0)
+
+            self.assertEqual(todas.cola.qsize(), 5)
+            self.assertTrue(otra.cola.empty())
+            # El cliente lento conserva los dos eventos más recientes
+            self.assertEqual(propia.perdidos, 3)
+            self.assertEqual([(await propia.siguiente(1)).datos['id'] for _ in range(2)], [3, 4])
+            self.assertIsNone(await propia.siguiente(0.01))
+        finally:
+            for suscripcion in (todas, propia, otra):
+                eventos.hub.cancelar(suscripcion)
+        self.assertEqual(eventos.hub.estadisticas()['suscriptores'], 0)
+
+    def test_guardar_y_adoptar_publican_al_confirmar(self):
+        with mock.patch('core.eventos.publicar') as publicar:
+            with self.captureOnCommitCallbacks(execute=True):
+                mascota = Mascota.objects.create(nombre='Kira', especie='Perro', edad=2, fundacion=self.fundacion)
+                publicar.assert_not_called()
+            with self.captureOnCommitCallbacks(execute=True):
+                mascota.foto_hash = 'abc'
+                mascota.save(update_fields=['foto_hash'])
+            with self.captureOnCommitCallbacks(execute=True), mock.patch('core.facturas.encolar'):
+                servicios.adoptar(mascota, crear_usuario())
+
+        self.assertEqual([llamada.args[0] for llamada in publicar.call_args_list], ['mascota', 'adopcion'])
+        tipo, datos, fundacion_id = publicar.call_args_list[0].args
+        self.assertEqual(datos, {
+            'id': mascota.pk, 'nombre': 'Kira', 'especie': 'Perro', 'edad': 2,
+            'disponible': True, 'fundacion_id': self.fundacion.pk, 'foto': None,
+        })
+        self.assertEqual(publicar.call_args_list[1].args[1]['disponible'], False)
+
+    async def test_flujo_sse_bajo_asgi(self):
+        from django.test import AsyncClient
+
+        respuesta = await AsyncClient().get(reverse('eventos_mascotas'), {'fundacion': self.fundacion.pk})
+        self.assertEqual(respuesta['Content-Type'], 'text/event-stream')
+        flujo = respuesta.streaming_content
+        self.assertEqual(await anext(flujo), b'retry: 5000\n\n')
+
+        siguiente = asyncio.ensure_future(anext(flujo))
+        await asyncio.sleep(0)
+        evento = eventos.publicar('mascota', {'id': 7, 'nombre': 'Kira'}, fundacion_id=self.fundacion.pk)
+        contenido = (await asyncio.wait_for(siguiente, 1)).decode()
+        self.assertEqual(
+            contenido, f'id: {evento.id}\nevent: mascota\ndata: {{"id":7,"nombre":"Kira"}}\n\n',
+        )
+        await flujo.aclose()
+
+    def test_sin_asgi_no_se_abre_el_flujo(self):
+        self.assertEqual(self.client.get(reverse('eventos_mascotas')).status_code, 501)
+
+
+class ArranqueTests(TestCase):
+    def test_precargar_plantillas_llena_la_cache(self):
+        from django.template import engines
+
+        salida = io.StringIO()
+        call_command('precargar_plantillas', stdout=salida)
+        self.assertRegex(salida.getvalue(), r'^\d+ plantillas compiladas')
+        cargador = engines['django'].engine.template_loaders[0]
+        self.assertIn('core/inicio.html', cargador.get_template_cache)
+        self.assertIn('core/factura_pdf.html', cargador.get_template_cache)
+
+    def test_benchmark_arranque_sin_pila_pdf(self):
+        salida = io.StringIO()
+        call_command('benchmark_arranque', '--repeticiones', '1', '--url', reverse('login_usuario'), stdout=salida)
+        datos = json.loads(salida.getvalue())
+        for modo in ('sin_precarga', 'con_precarga'):
+            self.assertFalse(datos['modos'][modo]['pdf_cargado'])
+            self.assertGreater(datos['modos'][modo]['primera_peticion']['mediana_ms'], 0)
+        self.assertTrue(datos['modulos_lentos_ms'])
+
+
+class ArchivoAdopcionesTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        ajustes = override_settings(MEDIA_ROOT=self.media)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+
+        self.usuario = crear_usuario()
+        self.fundacion = crear_fundacion()
+        self.adopciones = crear_adopciones(self.usuario, self.fundacion, 5)
+        # Las tres primeras tienen más de un año
+        hoy = date.today()
+        for i, adopcion in enumerate(self.adopciones):
+            adopcion.fecha_adopcion = hoy - timedelta(days=400 - i) if i < 3 else hoy - timedelta(days=i)
+            Adopcion.objects.filter(pk=adopcion.pk).update(fecha_adopcion=adopcion.fecha_adopcion)
+        self.antiguas = [a.pk for a in self.adopciones[:3]]
+        self.todas = [a.pk for a in sorted(self.adopciones, key=lambda a: (a.fecha_adopcion, a.pk), reverse=True)]
+
+    def _archivar(self, **opciones):
+        salida = io.StringIO()
+        call_command('archivar_adopciones', stdout=salida, **opciones)
+        return salida.getvalue()
+
+    def test_mueve_las_antiguas_por_lotes_y_es_idempotente(self):
+        salida = self._archivar(lote=2)
+        self.assertIn('2 adopciones archivadas', salida)
+        self.assertIn('3 adopciones anteriores a', salida)
+        self.assertCountEqual(AdopcionArchivada.objects.values_list('pk', flat=True), self.antiguas)
+        self.assertFalse(Adopcion.objects.filter(pk__in=self.antiguas).exists())
+        self.assertEqual(Adopcion.objects.count(), 2)
+
+        self.assertIn('0 adopciones anteriores a', self._archivar())
+        self.assertEqual(AdopcionArchivada.objects.count(), 3)
+
+    def test_historial_recorre_las_dos_tablas(self):
+        self._archivar()
+        vistos = []
+        cursor = None
+        while True:
+            pagina = historial.paginar(self.usuario, cursor, tamano=2)
+            vistos.extend(a.pk for a in pagina)
+            if not pagina.tiene_siguiente:
+                break
+            cursor = pagina.siguiente
+        self.assertEqual(vistos, self.todas)
+        self.assertEqual(historial.contar(self.usuario), 5)
+
+        self.client.force_login(self.usuario)
+        respuesta = self.client.get(reverse('mis_adopciones'))
+        self.assertEqual([a.pk for a in respuesta.context['adopciones']], self.todas)
+        self.assertEqual(respuesta.context['total_adopciones'], 5)
+
+        datos = self.client.get(reverse('api_mis_adopciones')).json()
+        self.assertEqual([a['id'] for a in datos['resultados']], self.todas)
+
+    def test_factura_de_una_adopcion_archivada(self):
+        nombre = facturas.generar_factura(self.antiguas[0])
+        self._archivar()
+        self.assertEqual(AdopcionArchivada.objects.get(pk=self.antiguas[0]).factura_pdf.name, nombre)
+
+        self.client.force_login(self.usuario)
+        url = reverse('factura_adopcion', args=[self.antiguas[0]])
+        self.assertEqual(self.client.get(url).status_code, 200)
+        respuesta = self.client.get(url, {'descargar': 'pdf'})
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(b''.join(respuesta.streaming_content).startswith(b'%PDF'))
+
+        # Las que no tenían factura se generan en su tabla
+        self.assertTrue(facturas.generar_factura(self.antiguas[1]))
+        self.assertTrue(AdopcionArchivada.objects.get(pk=self.antiguas[1]).factura_pdf)
+        self.assertEqual(self.client.get(reverse('factura_adopcion', args=[999999])).status_code, 404)
+
+    def test_no_se_adopta_otra_vez_una_mascota_con_adopcion_archivada(self):
+        self._archivar()
+        archivada = AdopcionArchivada.objects.get(pk=self.antiguas[0])
+        # Marcada como disponible a mano (update() no pasa por las señales)
+        Mascota.objects.filter(pk=archivada.mascota_id).update(disponible=True)
+        contadores.recalcular()
+        mascota = Mascota.objects.get(pk=archivada.mascota_id)
+
+        otro = crear_usuario('luis')
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(servicios.MascotaYaAdoptada):
+                servicios.adoptar(mascota, otro)
+        self.assertFalse(Adopcion.objects.filter(mascota=mascota).exists())
+        # Queda corregida: ya no figura como disponible y los contadores cuadran
+        self.assertFalse(Mascota.objects.get(pk=mascota.pk).disponible)
+        self.assertEqual(contadores.recalcular(), 0)
+
+        # Una adopción archivada inactiva no impide adoptar de nuevo
+        AdopcionArchivada.objects.filter(pk=archivada.pk).update(activa=False)
+        Mascota.objects.filter(pk=mascota.pk).update(disponible=True)
+        contadores.recalcular()
+        with mock.patch.object(facturas, 'encolar'):
+            adopcion = servicios.adoptar(mascota, otro)
+        self.assertEqual(adopcion.usuario, otro)
+
+    def test_exportacion_y_estadisticas_incluyen_el_archivo(self):
+        self._archivar()
+        exportadas = [a.pk for a in exportacion.adopciones_para_exportar(self.fundacion)]
+        self.assertEqual(exportadas, self.todas[::-1])
+
+        # Hasta hoy: las filas de hoy son de antes de cambiar las fechas
+        call_command('actualizar_estadisticas', '--hasta', date.today().isoformat(), stdout=io.StringIO())
+        self.assertEqual(sum(EstadisticaAdopcion.objects.values_list('adopciones', flat=True)), 5)
+
+
+class BorradoFundacionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.usuario = crear_usuario()
+        self.fundacion = crear_fundacion()
+        self.otra = crear_fundacion(nombre='Patitas', email='patitas@example.com')
+        crear_adopciones(self.usuario, self.fundacion, 3)
+        for i in range(2):
+            Mascota.objects.create(nombre=f'Libre {i}', especie='Gato', edad=1, fundacion=self.fundacion)
+        self.ajena = crear_adopciones(self.usuario, self.otra, 1)[0]
+
+    def test_eliminar_marca_al_instante_y_programa_el_borrado(self):
+        self.client.force_login(self.usuario)
+        with mock.patch.object(borrado, 'encolar') as encolar:
+            with self.captureOnCommitCallbacks(execute=True):
+                respuesta = self.client.post(reverse('fundacion_delete', args=[self.fundacion.pk]))
+        self.assertRedirects(respuesta, reverse('fundacion_list'), fetch_redirect_response=False)
+        encolar.assert_called_once_with(self.fundacion.pk)
+
+        # Nada se ha borrado todavía, pero ya no se muestra
+        self.fundacion.refresh_from_db()
+        self.assertIsNotNone(self.fundacion.eliminada)
+        self.assertEqual(Mascota.objects.filter(fundacion=self.fundacion).count(), 5)
+        self.assertEqual(self.client.get(reverse('fundacion_detalle', args=[self.fundacion.pk])).status_code, 404)
+        ids = [f['id'] for f in self.client.get(reverse('api_fundaciones')).json()['resultados']]
+        self.assertEqual(ids, [self.otra.pk])
+        self.assertEqual(
+            {m['fundacion_id'] for m in self.client.get(reverse('api_mascotas')).json()['resultados']},
+            {self.otra.pk},
+        )
+        self.assertEqual(self.client.get(reverse('buscar'), {'q': 'Libre'}).json()['resultados'], [])
+        # Un segundo envío ya no la encuentra
+        self.assertEqual(self.client.post(reverse('fundacion_delete', args=[self.fundacion.pk])).status_code, 404)
+
+    def test_borra_por_lotes_con_progreso(self):
+        with mock.patch.object(borrado, 'encolar'):
+            borrado.marcar(self.fundacion)
+        pasos = [dict(p) for p in borrado.borrar(self.fundacion.pk, tamano=2)]
+
+        # 3 adopciones y 5 mascotas de dos en dos, una fila de estadísticas y el final
+        self.assertEqual(len(pasos), 2 + 3 + 1 + 1)
+        self.assertEqual(pasos[-1], {
+            'estado': 'terminado', 'adopciones': 3, 'archivadas': 0, 'mascotas': 5, 'estadisticas': 1,
+        })
+        # En la base, no en la cache del proceso
+        cache.clear()
+        self.assertEqual(borrado.progreso(self.fundacion.pk), pasos[-1])
+        self.assertFalse(Fundacion.objects.filter(pk=self.fundacion.pk).exists())
+        self.assertTrue(Adopcion.objects.filter(pk=self.ajena.pk).exists())
+        self.otra.refresh_from_db()
+        self.assertEqual(self.otra.total_mascotas, 1)
+
+        self.client.force_login(crear_usuario('staff', is_staff=True))
+        datos = self.client.get(reverse('progreso_borrado', args=[self.fundacion.pk])).json()
+        self.assertEqual(datos['estado'], 'terminado')
+        self.assertEqual(self.client.get(reverse('progreso_borrado', args=[self.otra.pk])).status_code, 404)
+
+    def test_comando_retoma_las_marcadas(self):
+        Fundacion.objects.filter(pk=self.fundacion.pk).update(eliminada=timezone.now())
+        salida = io.StringIO()
+        call_command('borrar_fundaciones', lote=2, stdout=salida)
+        self.assertIn(f'Fundación {self.fundacion.pk}: 2 adopciones', salida.getvalue())
+        self.assertIn('1 fundaciones borradas', salida.getvalue())
+        self.assertEqual(list(Fundacion.objects.values_list('pk', flat=True)), [self.otra.pk])
+        self.assertEqual(Mascota.objects.count(), 1)
+
+    def test_comando_con_ids_no_encola_otro_borrado(self):
+        with mock.patch.object(borrado, 'encolar') as encolar, self.captureOnCommitCallbacks(execute=True):
+            call_command('borrar_fundaciones', self.fundacion.pk, stdout=io.StringIO())
+        encolar.assert_not_called()
+        self.assertFalse(Fundacion.objects.filter(pk=self.fundacion.pk).exists())
+        self.assertEqual(borrado.progreso(self.fundacion.pk)['estado'], 'terminado')
@@ -1,4 +1,5 @@
 from django.urls import path
+from . import api
 from . import views
 
 urlpatterns = [
@@ -12,6 +13,8 @@ urlpatterns = [
     path('inicio/', views.inicio, name='inicio'),
     path('fundacion/<int:fundacion_id>/', views.fundacion_detalle, name='fundacion_detalle'),
     path('adoptar/<int:mascota_id>/', views.adoptar_mascota, name='adoptar_mascota'),
+    path('buscar/', views.buscar, name='buscar'),
+    path('eventos/', views.eventos_mascotas, name='eventos_mascotas'),
     
     # Nueva ruta para factura
     path('factura/<int:adopcion_id>/', views.factura_adopcion, name='factura_adopcion'),
@@ -19,11 +22,23 @@ urlpatterns = [
     # Nueva ruta para ver mis adopciones
     path('mis-adopciones/', views.mis_adopciones, name='mis_adopciones'),
     
+    # Exportación masiva de facturas (personal)
+    path('facturas/exportar/', views.exportar_facturas, name='exportar_facturas'),
+    path('cache/estadisticas/', views.estadisticas_cache, name='estadisticas_cache'),
+    path('perfilado/', views.informe_perfilado, name='informe_perfilado'),
+    path('estadisticas/', views.estadisticas_adopciones, name='estadisticas_adopciones'),
+    
+    # API de solo lectura (JSON con ETag)
+    path('api/fundaciones/', api.fundaciones, name='api_fundaciones'),
+    path('api/mascotas/', api.mascotas, name='api_mascotas'),
+    path('api/mis-adopciones/', api.mis_adopciones, name='api_mis_adopciones'),
+    
     # CRUD Fundaciones
     path('fundaciones/', views.FundacionListView.as_view(), name='fundacion_list'),
     path('fundaciones/nueva/', views.FundacionCreateView.as_view(), name='fundacion_create'),
     path('fundaciones/<int:pk>/editar/', views.FundacionUpdateView.as_view(), name='fundacion_update'),
     path('fundaciones/<int:pk>/eliminar/', views.FundacionDeleteView.as_view(), name='fundacion_delete'),
+    path('fundaciones/<int:pk>/eliminar/progreso/', views.progreso_borrado, name='progreso_borrado'),
     
     # CRUD Mascotas
     path('mascotas/', views.MascotaListView.as_view(), name='mascota_list'),
@@ -1,15 +1,74 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.http import HttpResponse
-from django.template.loader import get_template
-from xhtml2pdf import pisa
+from django.utils.functional import SimpleLazyObject
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import transaction
 from datetime import datetime
-from .models import Fundacion, Mascota, Adopcion
-from .forms import RegistroUsuarioForm
+from .models import Fundacion, Mascota
+from .forms import RegistroUsuarioForm, ExportarFacturasForm, EstadisticasForm, FiltroMascotasForm
+from .basedatos import solo_lectura
+from .paginacion import apaginar_por_cursor, cursor_normalizado, paginar_por_cursor
+from . import servicios
+from . import facturas
+from . import exportacion
+from . import borrado
+from . import busqueda
+from . import estadisticas
+from . import eventos
+from . import fragmentos
+from . import historial
+from . import limites
+from . import perfilado
+
+
+# Orden del catálogo: primero las disponibles; ``id`` hace único el cursor.
+# Lo siguen los índices de Mascota (mascota_catalogo_idx y los de filtros)
+ORDEN_CATALOGO = ('-disponible', 'id')
+MASCOTAS_POR_PAGINA = 24
+
+
+def pagina_catalogo(request, mascotas):
+    """Filtra ``mascotas`` según ``request.GET`` y devuelve (filtros, página).
+
+    La página es perezosa: solo se consulta si la plantilla la usa, así que
+    un acierto de la cache de fragmentos evita la consulta.
+    """
+    filtros = FiltroMascotasForm(request.GET)
+    pagina = SimpleLazyObject(lambda: paginar_por_cursor(
+        filtros.filtrar(mascotas),
+        cursor=request.GET.get('cursor'),
+        orden=ORDEN_CATALOGO,
+        tamano=MASCOTAS_POR_PAGINA,
+    ))
+    return filtros, pagina
+
+
+async def usuario_actual(request):
+    """Carga el usuario sin bloquear y lo deja en ``request.user``.
+
+    Las plantillas leen ``user``; resuelto de forma perezosa durante el
+    render consultaría la base desde el bucle de eventos.
+    """
+    request.user = await request.auser()
+    return request.user
+
+
+async def arender(request, plantilla, contexto):
+    """``render`` desde una vista asíncrona.
+
+    Renderizar es síncrono y el tag ``fragmento`` lee y escribe la cache:
+    se hace en el hilo de sync_to_async para no parar el bucle de eventos.
+    """
+    return await sync_to_async(render)(request, plantilla, contexto)
 
 
 # Vista de index/landing page (sin login requerido)
@@ -21,31 +80,134 @@ def index(request):
 
 # Vista de inicio después de login
 @login_required(login_url='login_usuario')
-def inicio(request):
+@solo_lectura
+async def inicio(request):
     """Dashboard/inicio para usuarios autenticados"""
-    usuario = request.user
-    fundaciones = Fundacion.objects.all()
-    mascotas_disponibles = Mascota.objects.filter(disponible=True)
+    usuario = await usuario_actual(request)
+    # Las fundaciones solo se consultan si el fragmento no está en cache
+    tarjetas = await fragmentos.aobtener('tarjetas_fundaciones', fragmentos.GLOBAL)
+    fundaciones = [] if tarjetas is not None else [f async for f in Fundacion.objects.activas()]
 
     context = {
         'usuario': usuario,
         'fundaciones': fundaciones,
-        'mascotas_disponibles': mascotas_disponibles
+        'fragmentos_precargados': {'tarjetas_fundaciones': tarjetas},
     }
-    return render(request, 'core/inicio.html', context)
+    return await arender(request, 'core/inicio.html', context)
 
 @login_required
-def fundacion_detalle(request, fundacion_id):
+@solo_lectura
+async def fundacion_detalle(request, fundacion_id):
     """Vista para mostrar todos los animales de una fundación"""
-    fundacion = get_object_or_404(Fundacion, id=fundacion_id)
-    mascotas = Mascota.objects.filter(fundacion=fundacion)
+    usuario = await usuario_actual(request)
+    fundacion = await aget_object_or_404(Fundacion.objects.activas(), id=fundacion_id)
+    filtros = FiltroMascotasForm(request.GET)
+    # Solo filtros válidos y cursor normalizado: parámetros basura no
+    # generan entradas nuevas en la caché
+    cursor = cursor_normalizado(Mascota, request.GET.get('cursor'), ORDEN_CATALOGO)
+    parametros = filtros.parametros()
+    variacion = filtros.parametros(cursor=cursor).urlencode()
+    # Misma clave que {% fragmento 'animales_fundacion' ... %} en la plantilla
+    animales = await fragmentos.aobtener(
+        'animales_fundacion', fragmentos.ambito_fundacion(fundacion.id), variacion,
+    )
+    mascotas = None
+    if animales is None:
+        mascotas = await apaginar_por_cursor(
+            filtros.filtrar(Mascota.objects.filter(fundacion=fundacion)),
+            cursor=cursor,
+            orden=ORDEN_CATALOGO,
+            tamano=MASCOTAS_POR_PAGINA,
+        )
     
     context = {
         'fundacion': fundacion,
         'mascotas': mascotas,
-        'usuario': request.user,
+        'filtros': filtros,
+        'parametros': parametros,
+        'variacion': variacion,
+        'usuario': usuario,
+        'fragmentos_precargados': {'animales_fundacion': animales},
     }
-    return render(request, 'core/fundacion_detalle.html', context)
+    return await arender(request, 'core/fundacion_detalle.html', context)
+
+
+# Búsqueda de mascotas y fundaciones (JSON)
+@login_required(login_url='login_usuario')
+async def buscar(request):
+    """Resultados ordenados por relevancia desde el índice de texto completo"""
+    texto = request.GET.get('q', '').strip()
+    try:
+        pagina = max(int(request.GET.get('pagina', 1)), 1)
+    except ValueError:
+        pagina = 1
+
+    # SQL crudo sobre el índice: no hay API asíncrona para cursores
+    resultados, hay_mas = await sync_to_async(busqueda.buscar)(texto, pagina=pagina)
+    return JsonResponse({
+        'q': texto,
+        'pagina': pagina,
+        'siguiente': pagina + 1 if hay_mas else None,
+        'resultados': resultados,
+    })
+
+
+# Avisos en vivo de mascotas nuevas y adopciones (Server-Sent Events). Una
+# conexión abierta por navegador: solo tiene sentido con el servidor ASGI
+async def eventos_mascotas(request):
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(
+            'Los avisos en vivo requieren el servidor ASGI (mascotas.asgi:application).',
+            status=501, content_type='text/plain; charset=utf-8',
+        )
+    fundacion = request.GET.get('fundacion', '')
+    canal = eventos.canal_fundacion(fundacion) if fundacion.isdigit() else eventos.GLOBAL
+    response = StreamingHttpResponse(eventos.flujo(canal), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # que nginx no acumule el flujo
+    return response
+
+
+# Estadísticas de la cache de fragmentos (monitorización)
+@staff_member_required(login_url='login_usuario')
+async def estadisticas_cache(request):
+    return JsonResponse(fragmentos.estadisticas())
+
+
+# Informe del perfilado por vista (PERFILADO_ACTIVO)
+@staff_member_required(login_url='login_usuario')
+def informe_perfilado(request):
+    informe = perfilado.informe()
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(informe)
+    filas = [
+        {
+            'vista': vista,
+            'peticiones': datos['peticiones'],
+            'metricas': [datos[metrica] for metrica in perfilado.METRICAS],
+            'repetida': datos['consulta_mas_repetida'],
+        }
+        for vista, datos in informe.items()
+    ]
+    return render(request, 'core/perfilado.html', {
+        'activo': settings.PERFILADO_ACTIVO,
+        'filas': filas,
+        'metricas': perfilado.METRICAS,
+    })
+
+
+# Panel de estadísticas de adopción (solo lee las filas precalculadas)
+@staff_member_required(login_url='login_usuario')
+@solo_lectura
+def estadisticas_adopciones(request):
+    form = EstadisticasForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+    datos = form.cleaned_data
+    resumen = estadisticas.resumen(datos['desde'], datos['hasta'], datos['fundacion'], datos['agrupar'])
+    if request.GET.get('formato') == 'json':
+        return JsonResponse(resumen)
+    return render(request, 'core/estadisticas.html', {'form': form, 'resumen': resumen})
 
 
 # Login
@@ -66,6 +228,14 @@ def login_usuario(request):
             login(request, usuario)
             messages.success(request, f'¡Bienvenido {usuario.username}!')
             return redirect('inicio')
+        elif getattr(request, 'login_limitado', False):
+            messages.error(request, 'Demasiados intentos. Espera unos minutos antes de volver a intentarlo.')
+            return render(request, 'core/login.html', status=429)
+        elif getattr(request, 'login_sobrecargado', False):
+            messages.error(request, 'El servidor está ocupado. Vuelve a intentarlo en unos segundos.')
+            respuesta = render(request, 'core/login.html', status=503)
+            respuesta['Retry-After'] = limites.limite_hashes.reintentar_en()
+            return respuesta
         else:
             messages.error(request, 'Correo o contraseña incorrectos.')
     
@@ -100,37 +270,20 @@ def logout_usuario(request):
     return redirect('index')  # Cambio aquí: ahora va a index en lugar de login
 
 
-# Función auxiliar para generar PDF
-def render_to_pdf(template_src, context_dict={}):
-    template = get_template(template_src)
-    html = template.render(context_dict)
-    response = HttpResponse(content_type='application/pdf')
-    pisa_status = pisa.CreatePDF(html, dest=response)
-    if pisa_status.err:
-        return HttpResponse('Error al generar PDF', status=500)
-    return response
-
-
 # Adoptar mascota - MEJORADO CON FACTURA
 @login_required(login_url='login_usuario')
 def adoptar_mascota(request, mascota_id):
     """Permite a un usuario adoptar una mascota disponible y genera factura."""
-    mascota = get_object_or_404(Mascota, id=mascota_id)
+    mascota = get_object_or_404(Mascota.objects.activas(), id=mascota_id)
 
-    if not mascota.disponible:
-        messages.error(request, f"La mascota {mascota.nombre} ya fue adoptada.")
+    try:
+        adopcion = servicios.adoptar(mascota, request.user)
+    except servicios.MascotaYaAdoptada as error:
+        messages.error(request, str(error))
         return redirect('inicio')
 
-    # Crear adopción
-    adopcion = Adopcion.objects.create(
-        mascota=mascota,
-        usuario=request.user,
-        fundacion=mascota.fundacion
-    )
-
-    # Marcar mascota como no disponible
-    mascota.disponible = False
-    mascota.save()
+    # La factura PDF se genera en segundo plano una vez confirmada la adopción
+    transaction.on_commit(lambda: facturas.encolar(adopcion.pk))
 
     messages.success(request, f"¡Has adoptado a {mascota.nombre} correctamente!")
     
@@ -140,39 +293,104 @@ def adoptar_mascota(request, mascota_id):
 
 # Nueva vista para mostrar y descargar factura
 @login_required(login_url='login_usuario')
+@solo_lectura
 def factura_adopcion(request, adopcion_id):
     """Genera y muestra la factura de adopción"""
-    adopcion = get_object_or_404(Adopcion, id=adopcion_id)
+    # Puede estar ya archivada: se busca en todo el historial
+    adopcion = historial.obtener(adopcion_id)
+    if adopcion is None:
+        raise Http404('No existe la adopción')
     
     # Verificar que el usuario sea el dueño de la adopción
-    if adopcion.usuario != request.user:
+    if adopcion.usuario_id != request.user.pk:
         messages.error(request, 'No tienes permiso para ver esta factura.')
         return redirect('inicio')
     
+    # Si se solicita descarga PDF se sirve el archivo ya generado
+    if request.GET.get('descargar') == 'pdf':
+        if facturas.factura_disponible(adopcion):
+            return FileResponse(
+                adopcion.factura_pdf.open('rb'),
+                content_type='application/pdf',
+                filename=f'factura_{adopcion.pk:05d}.pdf',
+            )
+        if request.GET.get('reintentar'):
+            # Sin el parámetro: la recarga automática no debe reiniciar la cuenta
+            facturas.olvidar_fallos(adopcion.pk)
+            return redirect(f"{request.path}?descargar=pdf")
+        if facturas.agotada(adopcion.pk):
+            contexto = {'adopcion': adopcion, 'error': facturas.fallo(adopcion.pk)['error']}
+            return render(request, 'core/factura_generando.html', contexto, status=500)
+        facturas.encolar(adopcion.pk)
+        return render(request, 'core/factura_generando.html', {'adopcion': adopcion}, status=202)
+    
     context = {
         'adopcion': adopcion,
         'fecha_actual': datetime.now(),
     }
     
-    # Si se solicita descarga PDF
-    if request.GET.get('descargar') == 'pdf':
-        return render_to_pdf('core/factura_pdf.html', context)
-    
     # Mostrar página HTML de factura
     return render(request, 'core/factura_adopcion.html', context)
 
 
 # Nueva vista para ver todas las adopciones del usuario
 @login_required(login_url='login_usuario')
-def mis_adopciones(request):
+@solo_lectura
+async def mis_adopciones(request):
     """Muestra todas las adopciones del usuario actual"""
-    adopciones = Adopcion.objects.filter(usuario=request.user).order_by('-fecha_adopcion')
+    usuario = await usuario_actual(request)
+    adopciones = await historial.apaginar(usuario, cursor=request.GET.get('cursor'))
     
     context = {
         'adopciones': adopciones,
-        'usuario': request.user,
+        'total_adopciones': await historial.acontar(usuario),
+        'usuario': usuario,
     }
-    return render(request, 'core/mis_adopciones.html', context)
+    return await arender(request, 'core/mis_adopciones.html', context)
+
+
+# Exportación masiva de facturas (solo personal)
+@staff_member_required(login_url='login_usuario')
+def exportar_facturas(request):
+    """Descarga todas las facturas de una fundación en un rango de fechas"""
+    form = ExportarFacturasForm(request.GET)
+    if not form.is_valid():
+        return HttpResponseBadRequest(form.errors.as_text())
+
+    datos = form.cleaned_data
+    nombre = f"facturas_fundacion_{datos['fundacion'].pk}"
+
+    if datos['formato'] == 'pdf':
+        return _pdf_exportado(request, datos, nombre)
+
+    adopciones = exportacion.adopciones_para_exportar(
+        datos['fundacion'], datos['desde'], datos['hasta']
+    )
+    pares = exportacion.iterar_facturas(adopciones)
+    response = StreamingHttpResponse(exportacion.flujo_zip(pares), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{nombre}.zip"'
+    return response
+
+
+def _pdf_exportado(request, datos, nombre):
+    # El PDF combinado no se puede generar por partes: se prepara en el pool
+    # de fondo y esta misma URL lo sirve cuando está listo
+    archivo = exportacion.nombre_pdf(datos['fundacion'], datos['desde'], datos['hasta'])
+    try:
+        return FileResponse(
+            default_storage.open(archivo, 'rb'),
+            content_type='application/pdf',
+            as_attachment=True,
+            filename=f'{nombre}.pdf',
+        )
+    except FileNotFoundError:
+        # Aún no generado, o caducado y borrado (exportacion.limpiar_caducados)
+        pass
+    contexto = {'fundacion': datos['fundacion'], 'error': exportacion.error_pdf(archivo)}
+    if contexto['error']:
+        return render(request, 'core/exportacion_generando.html', contexto, status=500)
+    exportacion.encolar_pdf(archivo, datos['fundacion'].pk, datos['desde'], datos['hasta'])
+    return render(request, 'core/exportacion_generando.html', contexto, status=202)
 
 
 # -------- FUNDACIONES --------
@@ -181,6 +399,9 @@ class FundacionListView(ListView):
     template_name = 'core/fundacion_list.html'
     context_object_name = 'fundaciones'
 
+    def get_queryset(self):
+        return Fundacion.objects.activas()
+
 
 class FundacionCreateView(CreateView):
     model = Fundacion
@@ -195,12 +416,34 @@ class FundacionUpdateView(UpdateView):
     template_name = 'core/fundacion_form.html'
     success_url = reverse_lazy('fundacion_list')
 
+    def get_queryset(self):
+        return Fundacion.objects.activas()
+
 
 class FundacionDeleteView(DeleteView):
     model = Fundacion
     template_name = 'core/fundacion_confirm_delete.html'
     success_url = reverse_lazy('fundacion_list')
 
+    def get_queryset(self):
+        return Fundacion.objects.activas()
+
+    def form_valid(self, form):
+        # Se marca al instante; mascotas y adopciones se borran por lotes en
+        # segundo plano (core.borrado) sin bloquear la base en esta petición
+        borrado.marcar(self.object)
+        messages.success(self.request, f'La fundación {self.object.nombre} se está eliminando.')
+        return redirect(self.get_success_url())
+
+
+# Progreso del borrado en segundo plano de una fundación (solo personal)
+@staff_member_required(login_url='login_usuario')
+def progreso_borrado(request, pk):
+    progreso = borrado.progreso(pk)
+    if progreso is None:
+        raise Http404('No hay ningún borrado de esa fundación')
+    return JsonResponse(progreso)
+
 
 # -------- MASCOTAS --------
 class MascotaListView(ListView):
@@ -208,6 +451,14 @@ class MascotaListView(ListView):
     template_name = 'core/mascota_list.html'
     context_object_name = 'mascotas'
 
+    def get_queryset(self):
+        return Mascota.objects.activas().select_related('fundacion')
+
+    def get_context_data(self, **kwargs):
+        filtros, pagina = pagina_catalogo(self.request, self.object_list)
+        kwargs.update(object_list=pagina, filtros=filtros)
+        return super().get_context_data(**kwargs)
+
 
 class MascotaCreateView(CreateView):
     model = Mascota
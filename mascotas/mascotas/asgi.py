@@ -5,6 +5,10 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+Los avisos en vivo de /eventos/ (core.eventos) mantienen una conexión
+abierta por navegador y solo se sirven desde esta aplicación, p. ej.:
+    uvicorn mascotas.asgi:application --workers 1
 """
 
 import os
@@ -12,5 +16,18 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mascotas.settings')
+# Activa DB_STATEMENT_TIMEOUT_MS (solo para peticiones web, no para comandos)
+os.environ.setdefault('SERVIDOR_WEB', '1')
+# Sin conexiones persistentes bajo ASGI (lo que recomienda Django): el
+# trabajo síncrono de cada petición pasa por hilos de asgiref y una conexión
+# con CONN_MAX_AGE se quedaría abierta en cada uno. Para reutilizarlas en
+# PostgreSQL, DB_POOL=psycopg o pgbouncer.
+os.environ['DB_CONN_MAX_AGE'] = '0'
 
 application = get_asgi_application()
+
+# Con PRECARGAR_PLANTILLAS=1 el worker compila las plantillas antes de
+# aceptar peticiones
+from core.arranque import preparar_worker  # noqa: E402
+
+preparar_worker()
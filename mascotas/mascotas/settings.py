@@ -29,7 +29,11 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Se descarta solo si PERFILADO_ACTIVO es False
+    'core.perfilado.PerfiladoMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    # Sirve STATIC_ROOT (tras collectstatic) antes de tocar sesión o base de datos
+    'core.estaticos.EstaticosMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -42,12 +46,20 @@ MIDDLEWARE = [
 ROOT_URLCONF = 'mascotas.urls'
 WSGI_APPLICATION = 'mascotas.wsgi.application'
 
+# Plantillas compiladas una vez por proceso (cached.Loader). Con DEBUG el
+# autoreload vacía la cache al editar una plantilla. PRECARGAR_PLANTILLAS=1
+# las compila todas al arrancar el worker (core.arranque).
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -60,13 +72,142 @@ TEMPLATES = [
 
 
 # Database
-DATABASES = {
+# Se configura por variables de entorno. Sin DB_ENGINE=postgres se usa
+# SQLite (db.sqlite3), así que el proyecto funciona sin configurar nada.
+#
+#   DB_ENGINE                sqlite | postgres
+#   DB_NAME, DB_USER, DB_PASSWORD, DB_HOST, DB_PORT
+#   DB_CONN_MAX_AGE          segundos que se reutiliza una conexión (60; 0
+#                            forzado en mascotas/asgi.py)
+#   DB_CONN_HEALTH_CHECKS    1 para comprobarla antes de reutilizarla (1)
+#   DB_POOL                  '' | psycopg | pgbouncer
+#   DB_POOL_MIN, DB_POOL_MAX tamaño del pool de psycopg (2, 10)
+#   DB_STATEMENT_TIMEOUT_MS  corta consultas más largas (5000; 0 = sin límite).
+#                            Solo en los workers web (wsgi.py y asgi.py
+#                            marcan SERVIDOR_WEB=1): migrate y los comandos
+#                            de mantenimiento no tienen límite
+#   DB_LECTURA_HOST          réplica para las vistas @solo_lectura (opcional)
+#
+# Para Postgres hace falta `pip install -r requirements-postgres.txt`
+# (requirements-opcional.txt lo incluye junto con brotli). Para probarlo
+# con una base desechable:
+#   docker run --rm -e POSTGRES_PASSWORD=mascotas -p 5432:5432 postgres:16
+#   DB_ENGINE=postgres DB_PASSWORD=mascotas python manage.py test core
+
+
+def _entero_entorno(nombre, defecto):
+    return int(os.environ.get(nombre, defecto))
+
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+# Perfil de producción de SQLite: WAL permite leer mientras se escribe,
+# busy_timeout espera al candado en vez de fallar con "database is locked"
+# y synchronous=NORMAL es seguro con WAL. Se aplica a cada conexión nueva;
+# journal_mode queda grabado en el archivo, que por eso (y por sus -wal y
+# -shm) no va al repositorio: se crea con ``migrate``.
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA mmap_size=268435456',  # 256 MiB
+    'PRAGMA cache_size=-20000',    # 20 MiB por conexión
+    'PRAGMA temp_store=MEMORY',
+]
+
+if DB_ENGINE == 'postgres':
+    DB_POOL = os.environ.get('DB_POOL', '')
+    DB_STATEMENT_TIMEOUT_MS = _entero_entorno('DB_STATEMENT_TIMEOUT_MS', 5000)
+    _opciones = {}
+    if DB_STATEMENT_TIMEOUT_MS and DB_POOL != 'pgbouncer' and os.environ.get('SERVIDOR_WEB') == '1':
+        # pgbouncer rechaza el parámetro de arranque "options": en ese modo
+        # el límite se fija en el rol de la web (ALTER ROLE ... SET
+        # statement_timeout), con otro rol sin límite para los comandos
+        _opciones['options'] = f'-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}'
+    if DB_POOL == 'psycopg':
+        _opciones['pool'] = {
+            'min_size': _entero_entorno('DB_POOL_MIN', 2),
+            'max_size': _entero_entorno('DB_POOL_MAX', 10),
+        }
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'mascotas'),
+            'USER': os.environ.get('DB_USER', 'postgres'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # Con el pool de psycopg las conexiones ya se reutilizan: Django
+            # exige CONN_MAX_AGE = 0 en ese caso
+            'CONN_MAX_AGE': 0 if DB_POOL == 'psycopg' else _entero_entorno('DB_CONN_MAX_AGE', 60),
+            'CONN_HEALTH_CHECKS': os.environ.get('DB_CONN_HEALTH_CHECKS', '1') == '1',
+            # En modo transacción de pgbouncer los cursores con nombre no
+            # sobreviven entre transacciones
+            'DISABLE_SERVER_SIDE_CURSORS': DB_POOL == 'pgbouncer',
+            'OPTIONS': _opciones,
+        },
+    }
+    # La réplica debe ir casi al día: factura_adopcion se lee justo después
+    # de adoptar
+    if os.environ.get('DB_LECTURA_HOST'):
+        DATABASES['lectura'] = {
+            **DATABASES['default'],
+            'HOST': os.environ['DB_LECTURA_HOST'],
+            'TEST': {'MIRROR': 'default'},
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                'init_command': ';'.join(SQLITE_PRAGMAS),
+                # Las transacciones piden el candado de escritura al empezar:
+                # evita el "database is locked" al promocionar una lectura
+                'transaction_mode': 'IMMEDIATE',
+            },
+            # Base de pruebas en archivo: la de memoria compartida no admite
+            # escrituras concurrentes (las pruebas de concurrencia la necesitan)
+            'TEST': {
+                'NAME': BASE_DIR / 'test_db.sqlite3',
+            },
+        },
+    }
+    # Conexión solo de lectura al mismo archivo, para las vistas @solo_lectura
+    # (core.basedatos). En pruebas apunta a la misma base que 'default'.
+    DATABASES['lectura'] = {
+        **DATABASES['default'],
+        'OPTIONS': {'init_command': ';'.join(SQLITE_PRAGMAS + ['PRAGMA query_only=ON'])},
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['core.basedatos.RouterLecturaEscritura']
+# Desactívalo para que todas las consultas usen 'default'
+BD_LECTURA_SEPARADA = True
+
+
+# Cache
+# Por defecto en memoria local (por proceso). Para compartirla entre
+# workers basta con cambiar el backend, p. ej. a
+# 'django.core.cache.backends.redis.RedisCache' con su LOCATION.
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'centro-mascotas',
     }
 }
 
+# Cache de fragmentos de plantilla (core.fragmentos)
+CACHE_FRAGMENTOS_ALIAS = 'default'
+CACHE_FRAGMENTOS_TIMEOUT = 600  # segundos
+# Caducidad de los sellos de versión de cada ámbito
+CACHE_SELLOS_TIMEOUT = 24 * 60 * 60  # segundos
+# Si la cache la comparten todos los workers; sin definir se deduce del
+# backend (locmem no). Con cache compartida los 304 de la API (core.api)
+# salen de los sellos sin consultar la base; con locmem el ETag se calcula
+# del contenido y cada 304 sigue haciendo las consultas
+# CACHE_FRAGMENTOS_COMPARTIDA = True
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -115,6 +256,21 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Límites de login (core.limites): (intentos, periodo en segundos) por cubo
+LOGIN_LIMITE_IP = (20, 60)
+LOGIN_LIMITE_EMAIL = (5, 300)
+LOGIN_LIMITES_CACHE = 'default'
+# Hashes de contraseña simultáneos por proceso y segundos de espera por un
+# hueco; sin hueco el login responde 503 con Retry-After
+LOGIN_HASHES_CONCURRENTES = 4
+LOGIN_HASHES_ESPERA = 2.0
+# IP del cliente para los límites: con N proxies de confianza delante
+# (nginx, balanceador) se toma la N-ésima dirección por la derecha de la
+# cabecera, la que añadió el primero de ellos; lo que el cliente ponga más a
+# la izquierda se ignora. Con 0 se usa REMOTE_ADDR.
+IP_CLIENTE_CABECERA = 'HTTP_X_FORWARDED_FOR'
+IP_CLIENTE_PROXIES = 0
+
 # URLs de autenticación
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/inicio/'
@@ -126,7 +282,17 @@ SESSION_SAVE_EVERY_REQUEST = False
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SECURE = False  # True solo en HTTPS
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Sesiones leídas desde la cache y escritas también en la base de datos.
+# Para no tocar la base en absoluto: 'django.contrib.sessions.backends.signed_cookies'
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+SESSION_CACHE_ALIAS = 'default'
+
+# Segundos que EmailBackend.get_user guarda el usuario (sin contraseña) en
+# cache. Guardar el usuario lo invalida, pero con la cache por proceso solo
+# en el worker que lo guarda: en los demás, desactivar una cuenta o cambiar
+# su contraseña tarda hasta este tiempo en surtir efecto. Con una cache
+# compartida (Redis, Memcached) es inmediato
+USUARIO_CACHE_TIMEOUT = 60
 
 # Configuración CSRF
 CSRF_COOKIE_HTTPONLY = False
@@ -138,12 +304,16 @@ CSRF_COOKIE_SAMESITE = 'Lax'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
-# Configuración de archivos estáticos
+# Configuración de archivos estáticos. Cada app guarda los suyos en
+# <app>/static/; collectstatic los copia a STATIC_ROOT con el hash del
+# contenido en el nombre y copias .gz/.br (core.almacenamiento), y
+# core.estaticos.EstaticosMiddleware los sirve con cache inmutable.
 STATIC_URL = '/static/'
-STATICFILES_DIRS = [
-    os.path.join(BASE_DIR, 'static'),
-]
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'core.almacenamiento.AlmacenamientoEstatico'},
+}
 
 # Asegúrate de tener esto para el backend de autenticación
 AUTHENTICATION_BACKENDS = [
@@ -158,3 +328,36 @@ AUTH_USER_MODEL = 'core.Usuario'  # Asume que tu app se llama 'core'
 LOGIN_URL = 'login_usuario'
 LOGIN_REDIRECT_URL = 'inicio'
 LOGOUT_REDIRECT_URL = 'index'
+
+# Hilos del pool de tareas en segundo plano (facturas PDF, fotos)
+TAREAS_WORKERS = 2
+# Intentos fallidos de generar una factura antes de mostrar el error en vez
+# de seguir reintentando con cada recarga de la página de espera
+FACTURA_INTENTOS = 3
+# Procesos para la exportación masiva de facturas (por defecto, uno por CPU)
+FACTURAS_EXPORT_WORKERS = os.cpu_count() or 1
+# Segundos que se guardan los PDF combinados de media/exportaciones; los
+# caducados se borran al pedir una exportación nueva
+EXPORTACIONES_CADUCIDAD = 24 * 60 * 60
+# Filas por transacción al borrar una fundación en segundo plano (core.borrado)
+BORRADO_LOTE = 500
+# Días tras los que `archivar_adopciones` mueve una adopción a AdopcionArchivada
+ADOPCIONES_DIAS_ARCHIVO = 365
+
+# Avisos en vivo por Server-Sent Events (core.eventos). BackendLocal solo
+# reparte dentro de cada proceso; con varios workers hace falta un backend
+# con broker que implemente publicar(canales, evento)
+EVENTOS_BACKEND = 'core.eventos.BackendLocal'
+# Eventos pendientes por cliente antes de descartar los más antiguos
+EVENTOS_COLA_MAXIMA = 100
+EVENTOS_LATIDO = 15  # segundos
+
+# Compila las plantillas de core y carga las URLs al arrancar cada worker
+PRECARGAR_PLANTILLAS = os.environ.get('PRECARGAR_PLANTILLAS') == '1'
+
+# Perfilado de consultas y tiempos por vista (core.perfilado); informe en /perfilado/
+PERFILADO_ACTIVO = os.environ.get('PERFILADO_ACTIVO') == '1'
+# Muestras que se guardan por vista en cada proceso
+PERFILADO_MUESTRAS = 1000
+# JSONL donde además se añaden las muestras, para `informe_perfilado` entre procesos
+PERFILADO_ARCHIVO = os.environ.get('PERFILADO_ARCHIVO')
@@ -27,7 +27,9 @@ urlpatterns = [
     
 ]
 
-# Esto es ESENCIAL para que las fotos se vean
+# Esto es ESENCIAL para que las fotos se vean. Con STATIC_ROOT recogido los
+# estáticos los sirve core.estaticos.EstaticosMiddleware (también con
+# DEBUG = False); si no, en desarrollo quedan estas rutas de respaldo
 if settings.DEBUG:
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
@@ -12,5 +12,13 @@ import os
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mascotas.settings')
+# Activa DB_STATEMENT_TIMEOUT_MS (solo para peticiones web, no para comandos)
+os.environ.setdefault('SERVIDOR_WEB', '1')
 
 application = get_wsgi_application()
+
+# Con PRECARGAR_PLANTILLAS=1 el worker compila las plantillas antes de
+# aceptar peticiones
+from core.arranque import preparar_worker  # noqa: E402
+
+preparar_worker()